@@ -0,0 +1,401 @@
+"""
+In-process benchmark for the dummy backend.
+
+Builds a synthetic corpus (posts x topics x users) in a temporary directory,
+then drives a weighted request mix either straight through the Store methods
+("store"), through the FastAPI app via an in-process ASGI client ("api"), or
+both. Reports throughput and p50/p95/p99 latency per operation, peak RSS and
+the size of the persisted state, as JSON on stdout (or --out) so runs can be
+diffed between versions; a short table goes to stderr.
+
+    python bench.py --posts 20000 --users 2000 --ops 20000 --mode both
+    python bench.py --mix "list=60,vote=30,power=10" --persist-mode write_behind --out before.json
+
+Nothing in the working tree is touched: state files live in a temp dir.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote_plus
+
+DEFAULT_MIX = "list=40,mixed=10,ranked=10,get=10,vote=15,react=8,power=5,expand=2"
+OPS = ("list", "mixed", "ranked", "search", "get", "vote", "react", "power", "expand")
+# Words of the synthetic post texts (Store._dummy_post_text), for search queries.
+SEARCH_QUERIES = ("note", "idea", "invariants domains", "quick experiment", "metadata optional", "treat ui evolve")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not name:
+            continue
+        if name not in OPS:
+            raise SystemExit(f"unknown op {name!r} in --mix; choose from {', '.join(OPS)}")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise SystemExit("--mix needs at least one op with a positive weight")
+    return mix
+
+
+def percentile(sorted_ns: List[int], q: float) -> float:
+    if not sorted_ns:
+        return 0.0
+    i = min(len(sorted_ns) - 1, max(0, round(q * (len(sorted_ns) - 1))))
+    return sorted_ns[i] / 1e6
+
+
+def summarize(samples: Dict[str, List[int]], wall_s: float) -> Dict[str, Any]:
+    ops: Dict[str, Any] = {}
+    total = 0
+    for name, lat in sorted(samples.items()):
+        lat.sort()
+        total += len(lat)
+        ops[name] = {
+            "count": len(lat),
+            "mean_ms": round(sum(lat) / len(lat) / 1e6, 4) if lat else 0.0,
+            "p50_ms": round(percentile(lat, 0.50), 4),
+            "p95_ms": round(percentile(lat, 0.95), 4),
+            "p99_ms": round(percentile(lat, 0.99), 4),
+            "max_ms": round(lat[-1] / 1e6, 4) if lat else 0.0,
+        }
+    return {
+        "ops": ops,
+        "total_ops": total,
+        "wall_s": round(wall_s, 4),
+        "throughput_ops_s": round(total / wall_s, 1) if wall_s > 0 else 0.0,
+    }
+
+
+def peak_rss_bytes() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+# -------------------------
+# Synthetic population
+# -------------------------
+
+class SyntheticCorpus:
+    """
+    Stands in for posts_seed.json: load(store) fills a Store with args.posts
+    posts spread over args.topics topics and the last 30 days. Also usable as
+    SqliteBackend's / BinaryBackend's migrate_from source, so every backend
+    starts identical.
+    """
+
+    def __init__(self, main: Any, args: argparse.Namespace) -> None:
+        self.main = main
+        self.args = args
+
+    def load(self, store: Any) -> int:
+        main, args = self.main, self.args
+        rng = random.Random(args.seed)
+        topics = [f"topic{i:02d}" for i in range(args.topics)]
+        start = datetime.now(timezone.utc) - timedelta(days=30)
+        step = 30 * 86400 / max(1, args.posts)
+        for pid in range(1, args.posts + 1):
+            topic = topics[pid % len(topics)]
+            ts = (start + timedelta(seconds=int(pid * step))).replace(microsecond=0)
+            store._add_post(main.Post(
+                id=pid,
+                topic=topic,
+                text=main.Store._dummy_post_text(topic, pid),
+                timestamp=ts.isoformat().replace("+00:00", "Z"),
+                upvotes=rng.randint(0, 50),
+                downvotes=rng.randint(0, 20),
+                learned_count=rng.randint(0, 10),
+                surprised_count=rng.randint(0, 6),
+                power_count=0,
+                source={"kind": "bench", "model": None},
+                author={"id": f"agent_{topic}", "display_name": f"@/{topic}"},
+            ))
+        store.next_id = args.posts + 1
+        return 0
+
+
+def build_store(main: Any, args: argparse.Namespace, workdir: Path) -> Any:
+    """A Store persisting into `workdir`, filled with the synthetic corpus."""
+    from storage import BinaryBackend, JsonBackend, SqliteBackend
+
+    corpus = SyntheticCorpus(main, args)
+    if args.storage in ("sqlite", "binary"):
+        if args.storage == "sqlite":
+            backend = SqliteBackend(workdir / "state.sqlite3", migrate_from=corpus)
+        else:
+            backend = BinaryBackend(workdir / "state.fathom", migrate_from=corpus)
+        store = main.Store(backend=backend, persist_mode=args.persist_mode, expansions_path=workdir / "state.expansions.jsonl")
+        store.load()
+        store.wait_search_index()
+        return store
+    backend = JsonBackend(workdir / "state.json", workdir / "state.journal", journal=(args.persist_mode == "journal"))
+    store = main.Store(backend=backend, persist_mode=args.persist_mode, expansions_path=workdir / "state.expansions.jsonl")
+    corpus.load(store)  # instead of store.load(), which would read the real seed file
+    store.start_flusher()
+    store.build_search_index(background=False)
+    return store
+
+
+class Workload:
+    """Deterministic stream of (op, kwargs) drawn from the mix."""
+
+    def __init__(self, args: argparse.Namespace, mix: Dict[str, float], worker: int) -> None:
+        self.rng = random.Random(f"{args.seed}:{worker}")
+        self.names = list(mix)
+        self.weights = [mix[n] for n in self.names]
+        self.posts = args.posts
+        self.users = [f"bench-u{i}" for i in range(args.users)]
+        self.topics = [None] + [f"topic{i:02d}" for i in range(args.topics)]
+        self.policies = ["hot", "engagement", "novelty", "controversial"]
+
+    def next(self) -> Tuple[str, Dict[str, Any]]:
+        r = self.rng
+        op = r.choices(self.names, self.weights)[0]
+        kw: Dict[str, Any] = {"user": r.choice(self.users), "post_id": r.randint(1, self.posts)}
+        if op in ("list", "ranked"):
+            kw["topic"] = r.choice(self.topics)
+            kw["offset"] = r.choice((0, 0, 0, 30, 60, 300))
+            kw["policy"] = r.choice(self.policies)
+        elif op == "search":
+            kw["query"] = r.choice(SEARCH_QUERIES)
+            kw["topic"] = r.choice(self.topics)
+            kw["sort"] = r.choice(("relevance", "relevance", "hot"))
+        elif op == "vote":
+            kw["value"] = r.choice((-1, 0, 1))
+        elif op == "react":
+            kw["kind"] = r.choice(("learned", "surprised"))
+            kw["value"] = r.random() < 0.7
+        elif op == "power":
+            kw["value"] = r.random() < 0.8
+        return op, kw
+
+
+# -------------------------
+# Drivers
+# -------------------------
+
+def store_call(store: Any, op: str, kw: Dict[str, Any]) -> Callable[[], Any]:
+    pid, uid = kw["post_id"], kw["user"]
+    if op == "list":
+        return lambda: store.list_posts(kw["topic"], 30, kw["offset"])
+    if op == "mixed":
+        return lambda: store.mixed_posts(20, seed=uid)
+    if op == "ranked":
+        return lambda: store.ranked_posts(kw["policy"], 30, kw["offset"], kw["topic"])
+    if op == "search":
+        return lambda: store.search_posts(kw["query"], [], kw["topic"], 20, 0, kw["sort"])
+    if op == "get":
+        return lambda: store.get_post(pid)
+    if op == "vote":
+        return lambda: store.set_vote(uid, pid, kw["value"])
+    if op == "react":
+        learned = kw["value"] if kw["kind"] == "learned" else None
+        surprised = kw["value"] if kw["kind"] == "surprised" else None
+        return lambda: store.toggle_react(uid, pid, learned, surprised)
+    if op == "power":
+        return lambda: store.set_power(uid, pid, kw["value"])
+    return lambda: store.expand_post(pid)
+
+
+STORE_METHOD = {
+    "list": "list_posts", "mixed": "mixed_posts", "ranked": "ranked_posts", "search": "search_posts", "get": "get_post",
+    "vote": "set_vote", "react": "toggle_react", "power": "set_power", "expand": "expand_post",
+}
+
+
+def run_store(store: Any, args: argparse.Namespace, mix: Dict[str, float]) -> Dict[str, Any]:
+    samples: Dict[str, List[int]] = {}
+    lock = threading.Lock()
+    per_worker = args.ops // args.concurrency
+
+    def worker(w: int) -> None:
+        wl = Workload(args, mix, w)
+        local: Dict[str, List[int]] = {}
+        for _ in range(per_worker):
+            op, kw = wl.next()
+            call = store_call(store, op, kw)
+            t0 = time.perf_counter_ns()
+            call()
+            local.setdefault(STORE_METHOD[op], []).append(time.perf_counter_ns() - t0)
+        with lock:
+            for k, v in local.items():
+                samples.setdefault(k, []).extend(v)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(args.concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(samples, time.perf_counter() - t0)
+
+
+def api_request(op: str, kw: Dict[str, Any]) -> Tuple[str, str, str, Optional[Dict[str, Any]]]:
+    """(label, method, url, json body) for one workload item."""
+    pid = kw["post_id"]
+    topic = f"&topic={kw['topic']}" if kw.get("topic") else ""
+    if op == "list":
+        return "GET /posts", "GET", f"/posts?limit=30&offset={kw['offset']}{topic}", None
+    if op == "mixed":
+        return "GET /posts/mixed", "GET", f"/posts/mixed?count=20&seed={kw['user']}", None
+    if op == "ranked":
+        return "GET /posts/ranked", "GET", f"/posts/ranked?limit=30&policy={kw['policy']}&offset={kw['offset']}{topic}", None
+    if op == "search":
+        return "GET /search", "GET", f"/search?limit=20&q={quote_plus(kw['query'])}&sort={kw['sort']}{topic}", None
+    if op == "get":
+        return "GET /posts/{id}", "GET", f"/posts/{pid}", None
+    if op == "vote":
+        return "POST /posts/{id}/vote", "POST", f"/posts/{pid}/vote", {"value": kw["value"]}
+    if op == "react":
+        return "POST /posts/{id}/react", "POST", f"/posts/{pid}/react", {kw["kind"]: kw["value"]}
+    if op == "power":
+        return "POST /posts/{id}/power", "POST", f"/posts/{pid}/power", {"enabled": kw["value"]}
+    return "POST /posts/{id}/expand", "POST", f"/posts/{pid}/expand", None
+
+
+async def run_api_async(app: Any, args: argparse.Namespace, mix: Dict[str, float]) -> Dict[str, Any]:
+    import httpx
+
+    samples: Dict[str, List[int]] = {}
+    errors: Dict[str, int] = {}
+    per_worker = args.ops // args.concurrency
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker(w: int) -> None:
+            wl = Workload(args, mix, w)
+            # (user, url) -> last ETag, replayed as If-None-Match with --conditional.
+            etags: Dict[Tuple[str, str], str] = {}
+            for _ in range(per_worker):
+                op, kw = wl.next()
+                label, method, url, body = api_request(op, kw)
+                # The backend reads the user from a literal "x_user_id" header.
+                headers = {"x_user_id": kw["user"]}
+                tag = etags.get((kw["user"], url)) if args.conditional else None
+                if tag:
+                    headers["If-None-Match"] = tag
+                t0 = time.perf_counter_ns()
+                resp = await client.request(method, url, json=body, headers=headers)
+                await resp.aread()
+                if resp.status_code == 304:
+                    label += " (304)"
+                samples.setdefault(label, []).append(time.perf_counter_ns() - t0)
+                if args.conditional and "etag" in resp.headers:
+                    etags[(kw["user"], url)] = resp.headers["etag"]
+                if resp.status_code >= 400:
+                    errors[label] = errors.get(label, 0) + 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(w) for w in range(args.concurrency)))
+        wall = time.perf_counter() - t0
+    out = summarize(samples, wall)
+    out["errors"] = errors
+    return out
+
+
+def state_sizes(workdir: Path) -> Dict[str, int]:
+    return {p.name: p.stat().st_size for p in sorted(workdir.iterdir()) if p.is_file()}
+
+
+def run_phase(main: Any, args: argparse.Namespace, mix: Dict[str, float], phase: str) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix=f"fathom-bench-{phase}-") as tmp:
+        workdir = Path(tmp)
+        t0 = time.perf_counter()
+        store = build_store(main, args, workdir)
+        build_s = time.perf_counter() - t0
+        # Pre-register the population so per-user state exists for every read.
+        for i in range(args.users):
+            store.ensure_user(f"bench-u{i}")
+        store.save()
+
+        if phase == "store":
+            result = run_store(store, args, mix)
+        else:
+            main.store, main.hub.store, saved = store, store, main.store
+            try:
+                result = asyncio.run(run_api_async(main.app, args, mix))
+            finally:
+                main.store = main.hub.store = saved
+
+        t0 = time.perf_counter()
+        store.close()
+        result["final_flush_s"] = round(time.perf_counter() - t0, 4)
+        result["build_s"] = round(build_s, 4)
+        result["state_bytes"] = state_sizes(workdir)
+        return result
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--posts", type=int, default=10_000)
+    ap.add_argument("--topics", type=int, default=9)
+    ap.add_argument("--users", type=int, default=1_000)
+    ap.add_argument("--ops", type=int, default=10_000, help="operations per phase (split across workers)")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted op mix (default {DEFAULT_MIX!r})")
+    ap.add_argument("--mode", choices=("store", "api", "both"), default="both")
+    ap.add_argument("--concurrency", type=int, default=1, help="threads (store) / client tasks (api)")
+    ap.add_argument("--persist-mode", choices=("sync", "write_behind", "journal"), default="write_behind")
+    ap.add_argument("--storage", choices=("json", "sqlite", "binary"), default="json")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--conditional", action="store_true", help="api: revalidate repeated GETs with If-None-Match")
+    ap.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = ap.parse_args(argv)
+    args.concurrency = max(1, args.concurrency)
+    args.topics = max(1, args.topics)
+    args.users = max(1, args.users)
+    mix = parse_mix(args.mix)
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import main
+
+    from counters import np
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np is not None,
+        },
+        "config": {k: v for k, v in vars(args).items() if k != "out"} | {"mix": mix},
+    }
+    phases = ("store", "api") if args.mode == "both" else (args.mode,)
+    for phase in phases:
+        report[phase] = run_phase(main, args, mix, phase)
+    report["peak_rss_bytes"] = peak_rss_bytes()
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    for phase in phases:
+        r = report[phase]
+        print(f"\n[{phase}] {r['total_ops']} ops in {r['wall_s']}s = {r['throughput_ops_s']} ops/s", file=sys.stderr)
+        print(f"  {'operation':<26}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}", file=sys.stderr)
+        for name, o in r["ops"].items():
+            print(f"  {name:<26}{o['count']:>8}{o['p50_ms']:>10}{o['p95_ms']:>10}{o['p99_ms']:>10}", file=sys.stderr)
+        print(f"  state files: {r['state_bytes']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
@@ -0,0 +1,164 @@
+"""
+Response compression with Accept-Encoding negotiation.
+
+CompressionMiddleware is pure ASGI, like metrics.MetricsMiddleware. It
+compresses JSON, NDJSON and plain-text responses with zstd or gzip, whichever
+the client prefers (zstd on a tie). Event streams and websockets are left
+alone. Streaming bodies are compressed chunk by chunk, and each chunk is
+flushed, so a client reading an NDJSON export sees every chunk as soon as the
+server produces it. Large chunks are compressed on a worker thread to keep
+the event loop free.
+
+zstd needs the optional `zstandard` package (or Python 3.14's compression.zstd);
+without it only gzip is offered.
+"""
+
+from __future__ import annotations
+
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:  # optional: zstd content encoding
+    from compression import zstd as _zstd_std  # Python 3.14+
+except ImportError:
+    _zstd_std = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - exercised only without zstandard
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/plain")
+
+# Chunks at least this big are compressed off the event loop.
+THREAD_THRESHOLD = 64 * 1024
+
+
+class _Gzip:
+    def __init__(self, level: int) -> None:
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def chunk(self, data: bytes, final: bool) -> bytes:
+        out = self._z.compress(data)
+        return out + self._z.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Zstd:
+    def __init__(self, level: int) -> None:
+        if zstandard is not None:
+            self._z = zstandard.ZstdCompressor(level=level).compressobj()
+            self._block, self._end = zstandard.COMPRESSOBJ_FLUSH_BLOCK, zstandard.COMPRESSOBJ_FLUSH_FINISH
+        else:
+            self._z = _zstd_std.ZstdCompressor(level=level)
+            self._block, self._end = _zstd_std.ZstdCompressor.FLUSH_BLOCK, _zstd_std.ZstdCompressor.FLUSH_FRAME
+
+    def chunk(self, data: bytes, final: bool) -> bytes:
+        out = self._z.compress(data)
+        return out + self._z.flush(self._end if final else self._block)
+
+
+ENCODERS: Dict[str, Callable[[int], Any]] = {"gzip": _Gzip}
+if zstandard is not None or _zstd_std is not None:
+    ENCODERS["zstd"] = _Zstd
+
+
+def choose_encoding(accept_encoding: Optional[str], available: Tuple[str, ...] = ("zstd", "gzip")) -> Optional[str]:
+    """Best encoding of `available` that `accept_encoding` allows (q > 0); None means identity."""
+    if not accept_encoding:
+        return None
+    q: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            q[name] = weight
+    best: Optional[str] = None
+    best_q = 0.0
+    for name in available:  # in order of preference, so ties keep the earlier one
+        weight = q.get(name, q.get("*", 0.0))
+        if weight > best_q:
+            best, best_q = name, weight
+    return best
+
+
+class CompressionMiddleware:
+    """Compresses eligible HTTP responses of `minimum_size` bytes or more (streams always)."""
+
+    def __init__(self, app: Any, minimum_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "zstd": zstd_level}
+        self.available = tuple(name for name in ("zstd", "gzip") if name in ENCODERS)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"), self.available)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: List[Dict[str, Any]] = []
+        encoder: List[Any] = []  # [compressor] once compressing, [None] when passing through
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            kind = message["type"]
+            if kind == "http.response.start":
+                start.append(message)  # held until the first body chunk decides
+                return
+            if kind != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if not encoder:
+                head = start[0]
+                if not self._eligible(head, body, more):
+                    encoder.append(None)
+                    await send(head)
+                    await send(message)
+                    return
+                encoder.append(ENCODERS[encoding](self.levels[encoding]))
+                headers = MutableHeaders(scope=head)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # Byte-different from the identity body: only weakly the same.
+                    headers["ETag"] = "W/" + etag
+                await send(head)
+            z = encoder[0]
+            if z is None:
+                await send(message)
+                return
+            if len(body) >= THREAD_THRESHOLD:
+                out = await run_in_threadpool(z.chunk, body, not more)
+            else:
+                out = z.chunk(body, not more)
+            await send({"type": "http.response.body", "body": out, "more_body": more})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _eligible(self, head: Dict[str, Any], body: bytes, more: bool) -> bool:
+        if head["status"] < 200 or head["status"] in (204, 304):
+            return False
+        headers = Headers(raw=head["headers"])
+        if "content-encoding" in headers:
+            return False
+        ctype = headers.get("content-type", "").split(";")[0].strip().lower()
+        if ctype not in COMPRESSIBLE_TYPES:
+            return False
+        # A streamed body is compressed whatever its first chunk's size.
+        return more or len(body) >= self.minimum_size
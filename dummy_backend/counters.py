@@ -0,0 +1,170 @@
+"""
+Columnar engagement counters.
+
+Every post attached to a Store owns a dense "slot"; its five aggregate
+counters live at that slot in contiguous int64 arrays (stdlib array.array)
+instead of in per-object attributes. Whole-corpus work -- scoring, snapshots,
+"what changed since the last save" -- then runs over a handful of flat
+buffers. When NumPy is installed those buffers are viewed zero-copy as
+ndarrays and the bulk operations are vectorised; without it the same
+methods fall back to plain loops.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+try:  # optional: vectorised bulk operations
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+COUNTER_FIELDS = ("upvotes", "downvotes", "learned_count", "surprised_count", "power_count")
+FIELD_INDEX = {name: i for i, name in enumerate(COUNTER_FIELDS)}
+
+CounterSnapshot = List[array]
+
+
+class CounterColumns:
+    """Counter arrays indexed by dense post slot, plus the slot <-> post id mapping."""
+
+    def __init__(self) -> None:
+        self.columns: List[array] = [array("q") for _ in COUNTER_FIELDS]
+        self.post_ids = array("q")
+        self.slot_of: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.post_ids)
+
+    def allocate(self, post_id: int, values: Sequence[int]) -> int:
+        """Return the slot for post_id (reusing an existing one) holding `values`."""
+        slot = self.slot_of.get(post_id)
+        if slot is None:
+            slot = len(self.post_ids)
+            self.post_ids.append(post_id)
+            for col, v in zip(self.columns, values):
+                col.append(int(v))
+            self.slot_of[post_id] = slot
+        else:
+            for col, v in zip(self.columns, values):
+                col[slot] = int(v)
+        return slot
+
+    def extend(self, post_ids: array, columns: Sequence[array]) -> int:
+        """Slots for many new posts at once (one copy per column); returns the first slot."""
+        first = len(self.post_ids)
+        self.post_ids.extend(post_ids)
+        for col, values in zip(self.columns, columns):
+            col.extend(values)
+        self.slot_of.update(zip(post_ids, range(first, first + len(post_ids))))
+        return first
+
+    def column(self, name: str) -> array:
+        return self.columns[FIELD_INDEX[name]]
+
+    def view(self, name: str) -> Any:
+        """
+        Zero-copy int64 ndarray over one column (requires NumPy).
+
+        Only valid until the next allocate(): growing an array may move its buffer.
+        """
+        if np is None:
+            raise RuntimeError("numpy is not installed")
+        col = self.column(name)
+        if not len(col):
+            return np.zeros(0, dtype=np.int64)
+        return np.frombuffer(col, dtype=np.int64)
+
+    def scores(self) -> Sequence[int]:
+        """upvotes - downvotes for every slot."""
+        if np is not None:
+            return self.view("upvotes") - self.view("downvotes")
+        return [u - d for u, d in zip(self.column("upvotes"), self.column("downvotes"))]
+
+    def snapshot(self) -> CounterSnapshot:
+        """Copy of every column (a memcpy per column)."""
+        return [array("q", col) for col in self.columns]
+
+    def changed_slots(self, since: CounterSnapshot) -> List[int]:
+        """Slots whose counters differ from `since`, plus slots allocated after it."""
+        n = len(self.post_ids)
+        old_n = len(since[0]) if since else 0
+        if np is not None and n:
+            changed = np.zeros(n, dtype=bool)
+            changed[old_n:] = True
+            for i, col in enumerate(self.columns):
+                if old_n:
+                    cur = np.frombuffer(col, dtype=np.int64)[:old_n]
+                    changed[:old_n] |= cur != np.frombuffer(since[i], dtype=np.int64)
+            return np.flatnonzero(changed).tolist()
+
+        out = [s for s in range(old_n) if any(col[s] != old[s] for col, old in zip(self.columns, since))]
+        out.extend(range(old_n, n))
+        return out
+
+    def row(self, slot: int) -> List[int]:
+        return [col[slot] for col in self.columns]
+
+
+def _counter_property(name: str) -> property:
+    idx = FIELD_INDEX[name]
+
+    def fget(self: Any) -> int:
+        cols: Optional[CounterColumns] = self._cols
+        if cols is None:
+            return self._detached[idx]
+        return cols.columns[idx][self._slot]
+
+    def fset(self: Any, value: int) -> None:
+        cols: Optional[CounterColumns] = self._cols
+        if cols is None:
+            self._detached[idx] = int(value)
+        else:
+            cols.columns[idx][self._slot] = int(value)
+
+    return property(fget, fset, doc=f"{name} (stored in CounterColumns when attached)")
+
+
+class CounterView:
+    """
+    Mixin giving a __slots__ class the five counter attributes.
+
+    A fresh object keeps its counters in a small private list ("detached");
+    attach_counters() moves them into a CounterColumns, after which the
+    attributes read and write the shared arrays.
+    """
+
+    __slots__ = ("_cols", "_slot", "_detached")
+
+    upvotes = _counter_property("upvotes")
+    downvotes = _counter_property("downvotes")
+    learned_count = _counter_property("learned_count")
+    surprised_count = _counter_property("surprised_count")
+    power_count = _counter_property("power_count")
+
+    def _init_counters(self, values: Sequence[int]) -> None:
+        self._cols: Optional[CounterColumns] = None
+        self._slot = -1
+        self._detached = [int(v) for v in values]
+
+    @property
+    def slot(self) -> int:
+        """Dense counter slot (-1 while detached)."""
+        return self._slot
+
+    def counter_values(self) -> List[int]:
+        if self._cols is None:
+            return list(self._detached)
+        return self._cols.row(self._slot)
+
+    def attach_counters(self, cols: CounterColumns, post_id: int) -> None:
+        self._slot = cols.allocate(post_id, self.counter_values())
+        self._cols = cols
+        self._detached = []
+
+    def bind_counters(self, cols: CounterColumns, slot: int) -> None:
+        """Use a slot already filled by CounterColumns.extend()."""
+        self._cols = cols
+        self._slot = slot
+        self._detached = []
@@ -0,0 +1,252 @@
+"""
+Post expansion pipeline.
+
+An expander is any async callable taking a small post dict
+({"id", "topic", "text", "parent_id"}) and returning the expanded body:
+
+    async def my_expander(post: dict) -> str: ...
+
+Set FATHOM_EXPANDER="package.module:function" to plug one in; the default is
+the deterministic template the dummy backend always used.
+
+Expander runs expanders on its own event loop thread with at most `workers`
+in flight, and deduplicates concurrent requests for the same post
+(single-flight): every caller gets the same Future. Finished bodies go into an
+ExpansionCache -- an LRU capped at `capacity` posts and persisted as its own
+append-only JSONL log, separate from state.json and the counters.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import importlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from storage import write_text_atomic
+
+ExpandFn = Callable[[Dict[str, Any]], Awaitable[str]]
+DoneFn = Callable[[int, Optional[str], Optional[BaseException]], None]
+
+
+class ExpansionError(RuntimeError):
+    """The expander failed or timed out."""
+
+
+async def template_expander(post: Dict[str, Any]) -> str:
+    # Simple deterministic expansion; no OpenAI dependency.
+    return (
+        f"{post['text']}\n\n"
+        f"— Expanded context —\n"
+        f"This is dummy expanded text for post #{post['id']} in topic '{post['topic']}'.\n"
+        f"It exists to exercise your modal UI, scrolling, and reaction/vote syncing.\n\n"
+        f"Potential directions:\n"
+        f"- Add tags for multi-axis organization beyond topic.\n"
+        f"- Track parent/child lineage for 'power spawn' and visible legacy.\n"
+        f"- Store per-user state keyed by X-User-Id.\n"
+    )
+
+
+def load_expander(spec: str) -> ExpandFn:
+    """Resolve "module:function" (empty -> template_expander)."""
+    if not spec:
+        return template_expander
+    module, _, attr = spec.partition(":")
+    fn = getattr(importlib.import_module(module), attr or "expand")
+    if not callable(fn):
+        raise TypeError(f"{spec} is not callable")
+    return fn
+
+
+class ExpansionCache:
+    """
+    post id -> (expanded text, expanded_at), least recently used first.
+
+    put() appends one line to the log and returns the ids it evicted. load()
+    replays the log (last line per post wins, newest `capacity` kept); the log
+    is rewritten compactly once it holds twice as many lines as entries.
+    """
+
+    def __init__(self, path: Optional[Path], capacity: int) -> None:
+        self.path = path
+        self.capacity = max(1, capacity)
+        self._entries: "OrderedDict[int, Tuple[str, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._fh: Optional[Any] = None
+        self._log_lines = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, post_id: int) -> bool:
+        return post_id in self._entries
+
+    def load(self) -> None:
+        if self.path is None or not self.path.exists():
+            return
+        with self.path.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                    pid = int(rec["p"])
+                except Exception:
+                    continue  # torn final line
+                self._log_lines += 1
+                self._entries.pop(pid, None)
+                if rec.get("text") is not None:
+                    self._entries[pid] = (rec["text"], rec.get("at"))
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def get(self, post_id: int) -> Optional[Tuple[str, Optional[str]]]:
+        """Look up and mark as recently used."""
+        with self._lock:
+            hit = self._entries.get(post_id)
+            if hit is not None:
+                self._entries.move_to_end(post_id)
+            return hit
+
+    def items(self) -> List[Tuple[int, Tuple[str, Optional[str]]]]:
+        with self._lock:
+            return list(self._entries.items())
+
+    def put(self, post_id: int, text: str, expanded_at: Optional[str]) -> List[int]:
+        evicted: List[int] = []
+        with self._lock:
+            self._entries[post_id] = (text, expanded_at)
+            self._entries.move_to_end(post_id)
+            while len(self._entries) > self.capacity:
+                evicted.append(self._entries.popitem(last=False)[0])
+            self._append({"p": post_id, "text": text, "at": expanded_at})
+        return evicted
+
+    def _append(self, rec: Dict[str, Any]) -> None:
+        if self.path is None:
+            return
+        if self._log_lines >= 2 * self.capacity:
+            self._compact()
+        if self._fh is None:
+            self._fh = self.path.open("a", encoding="utf-8")
+        self._fh.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._fh.flush()
+        self._log_lines += 1
+
+    def _compact(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        lines = [
+            json.dumps({"p": pid, "text": text, "at": at}, ensure_ascii=False, separators=(",", ":"))
+            for pid, (text, at) in self._entries.items()
+        ]
+        write_text_atomic(self.path, "".join(line + "\n" for line in lines))
+        self._log_lines = len(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+class Expander:
+    """Bounded, single-flight runner for an async ExpandFn on a private event loop thread."""
+
+    def __init__(self, fn: ExpandFn, workers: int, timeout: float) -> None:
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._inflight: Dict[int, "concurrent.futures.Future[str]"] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def current(self, post_id: int) -> Optional["concurrent.futures.Future[str]"]:
+        """The running expansion of `post_id`, if any."""
+        return self._inflight.get(post_id)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="expander", daemon=True)
+            self._thread.start()
+            self._sem = asyncio.run_coroutine_threadsafe(self._make_semaphore(), loop).result()
+            self._loop = loop
+        return self._loop
+
+    async def _make_semaphore(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(self.workers)
+
+    async def _run(self, post: Dict[str, Any], on_done: DoneFn) -> str:
+        assert self._sem is not None
+        pid = int(post["id"])
+        text: Optional[str] = None
+        err: Optional[ExpansionError] = None
+        async with self._sem:
+            try:
+                text = await asyncio.wait_for(self.fn(post), self.timeout)
+                if not isinstance(text, str) or not text:
+                    err = ExpansionError(f"expander returned no text for post {pid}")
+            except asyncio.TimeoutError:
+                err = ExpansionError(f"expansion of post {pid} timed out after {self.timeout}s")
+            except Exception as exc:
+                err = ExpansionError(f"expansion of post {pid} failed: {exc}")
+        # on_done takes the store lock: run it off the loop, and before the
+        # Future resolves, so waiters always find the result applied.
+        await asyncio.get_running_loop().run_in_executor(None, on_done, pid, None if err else text, err)
+        if err is not None:
+            raise err
+        assert text is not None
+        return text
+
+    def submit(self, post: Dict[str, Any], on_done: DoneFn) -> "concurrent.futures.Future[str]":
+        """
+        Start expanding `post` unless it already is; returns the shared Future.
+
+        on_done(post_id, text, error) runs once per actual run, before the
+        Future resolves and before it leaves the in-flight map -- so a caller
+        that finds nothing in flight will find the result instead.
+        """
+        pid = int(post["id"])
+        with self._lock:
+            fut = self._inflight.get(pid)
+            if fut is not None:
+                return fut
+            fut = asyncio.run_coroutine_threadsafe(self._run(post, on_done), self._ensure_loop())
+            self._inflight[pid] = fut
+
+        def release(f: "concurrent.futures.Future[str]") -> None:
+            with self._lock:
+                if self._inflight.get(pid) is f:
+                    del self._inflight[pid]
+
+        fut.add_done_callback(release)
+        return fut
+
+    def close(self) -> None:
+        """Cancel whatever is still running and stop the loop thread."""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._cancel_all(), loop).result(timeout=5.0)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+    async def _cancel_all(self) -> None:
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,253 @@
+"""
+Feed indexes for the dummy backend.
+
+Everything here works on post ids and numeric keys only, so it can be
+maintained incrementally by the Store without touching Post objects.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import random
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# (timestamp key, -post id): ascending order == oldest first, and among equal
+# timestamps the lower id sorts *last*, so reading the list backwards yields
+# newest first with ties in id order -- the same order the old full sort gave.
+RecencyKey = Tuple[int, int]
+
+
+def ts_key(timestamp: str) -> int:
+    """Parse an ISO-8601 timestamp once into sortable epoch microseconds (0 if unparseable)."""
+    s = (timestamp or "").strip()
+    if s.endswith("Z"):
+        s = s[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(s)
+    except ValueError:
+        return 0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1_000_000)
+
+
+def encode_cursor(payload: Any) -> str:
+    """Opaque, URL-safe page cursor."""
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Any:
+    """Inverse of encode_cursor; raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return json.loads(raw.decode("utf-8"))
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def cursor_key(value: Any) -> RecencyKey:
+    """Validate a decoded [timestamp_key, post_id] pair and turn it into an index key."""
+    if not (isinstance(value, list) and len(value) == 2 and all(isinstance(v, int) for v in value)):
+        raise ValueError("invalid cursor")
+    return (value[0], -value[1])
+
+
+def key_payload(key: RecencyKey) -> List[int]:
+    return [key[0], -key[1]]
+
+
+class RecencyIndex:
+    """
+    Post ids ordered newest-first, globally and per topic.
+
+    Backed by sorted Python lists: an insert is a bisect + memmove (an append
+    for the common "new post is the newest" case) and reading a page is a
+    positional slice, so a page costs O(log N + limit) instead of a full sort.
+    """
+
+    def __init__(self) -> None:
+        self._all: List[RecencyKey] = []
+        self._by_topic: Dict[str, List[RecencyKey]] = {}
+        # post id -> (topic, key), so re-adding a post replaces its old entry
+        self._entries: Dict[int, Tuple[str, RecencyKey]] = {}
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    @staticmethod
+    def _insert(lst: List[RecencyKey], key: RecencyKey) -> None:
+        if not lst or lst[-1] < key:
+            lst.append(key)
+        else:
+            insort(lst, key)
+
+    @staticmethod
+    def _remove(lst: List[RecencyKey], key: RecencyKey) -> None:
+        i = bisect_left(lst, key)
+        if i < len(lst) and lst[i] == key:
+            del lst[i]
+
+    def add(self, post_id: int, topic: str, timestamp_key: int) -> None:
+        old = self._entries.get(post_id)
+        if old is not None:
+            self._remove(self._all, old[1])
+            self._remove(self._by_topic.get(old[0], []), old[1])
+        key = (timestamp_key, -post_id)
+        self._entries[post_id] = (topic, key)
+        self._insert(self._all, key)
+        self._insert(self._by_topic.setdefault(topic, []), key)
+
+    def extend(self, entries: Iterable[Tuple[int, str, int]]) -> None:
+        """
+        Bulk add() of (post id, topic, timestamp key) for posts not indexed
+        yet: one sort per list, and only the topic lists that grew. Appending
+        already-ordered keys keeps each sort close to linear.
+        """
+        touched: Dict[str, List[RecencyKey]] = {}
+        for post_id, topic, timestamp_key in entries:
+            key = (timestamp_key, -post_id)
+            self._entries[post_id] = (topic, key)
+            self._all.append(key)
+            lst = touched.get(topic)
+            if lst is None:
+                lst = touched[topic] = self._by_topic.setdefault(topic, [])
+            lst.append(key)
+        self._all.sort()
+        for lst in touched.values():
+            lst.sort()
+
+    def topics(self) -> List[str]:
+        return [t for t, lst in self._by_topic.items() if lst]
+
+    def count(self, topic: Optional[str] = None) -> int:
+        return len(self._all if topic is None else self._by_topic.get(topic, []))
+
+    def key_of(self, post_id: int) -> RecencyKey:
+        return self._entries[post_id][1]
+
+    def page_after(self, topic: Optional[str], key: RecencyKey, limit: int) -> List[int]:
+        """
+        Newest-first post ids strictly older than `key` (keyset pagination).
+
+        Cost is O(log N + limit) however deep the key is, and posts inserted
+        newer than `key` since the previous page cannot shift this one.
+        """
+        lst = self._all if topic is None else self._by_topic.get(topic, [])
+        hi = bisect_left(lst, key)
+        if hi <= 0 or limit <= 0:
+            return []
+        lo = max(0, hi - limit)
+        return [-k[1] for k in reversed(lst[lo:hi])]
+
+    def page(self, topic: Optional[str], limit: int, offset: int = 0) -> List[int]:
+        """Newest-first post ids at positions [offset, offset + limit)."""
+        lst = self._all if topic is None else self._by_topic.get(topic, [])
+        hi = len(lst) - offset
+        if hi <= 0 or limit <= 0:
+            return []
+        lo = max(0, hi - limit)
+        return [-k[1] for k in reversed(lst[lo:hi])]
+
+    def iter_newest(self, topic: Optional[str] = None, after: Optional[RecencyKey] = None) -> Iterator[int]:
+        """Lazily yield post ids newest-first (strictly older than `after` if given)."""
+        lst = self._all if topic is None else self._by_topic.get(topic, [])
+        start = len(lst) if after is None else bisect_left(lst, after)
+        for i in range(start - 1, -1, -1):
+            yield -lst[i][1]
+
+
+def parse_topic_weights(spec: Optional[str]) -> Dict[str, float]:
+    """Parse "space:2,art:0.5" into {"space": 2.0, "art": 0.5}; malformed parts are skipped."""
+    out: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        name, sep, value = part.partition(":")
+        name = name.strip()
+        if not name or not sep:
+            continue
+        try:
+            w = float(value)
+        except ValueError:
+            continue
+        if w >= 0:
+            out[name] = w
+    return out
+
+
+class MixedSampler:
+    """
+    Interleaves per-topic recency streams into one mixed feed.
+
+    Each topic is consumed lazily through RecencyIndex.iter_newest, and the
+    interleave stops after `count` items, so a page costs O(count + topics)
+    whatever the corpus size. Randomness comes from an explicit seed so an
+    experiment can replay exactly the same feed.
+
+    Without weights the mix is the original one: a shuffled topic order,
+    then round-robin. With weights, every slot picks a topic with probability
+    proportional to its weight (unlisted topics weigh 1, weight 0 excludes a
+    topic); exhausted topics drop out.
+    """
+
+    def __init__(self, index: RecencyIndex) -> None:
+        self.index = index
+
+    def sample(
+        self,
+        count: int,
+        seed: Any = None,
+        weights: Optional[Dict[str, float]] = None,
+        after: Optional[Dict[str, RecencyKey]] = None,
+    ) -> Iterator[int]:
+        rng = random.Random(seed)
+        after = after or {}
+        # Sorted, like the weighted path: a seed gives the same mix whatever
+        # order the topics were first indexed in (backend, imports, ...).
+        topics = sorted(self.index.topics())
+        streams = {t: self.index.iter_newest(t, after.get(t)) for t in topics}
+
+        if weights:
+            yield from self._weighted(count, rng, streams, weights)
+            return
+
+        rng.shuffle(topics)
+        emitted = 0
+        while topics:
+            alive: List[str] = []
+            for t in topics:
+                pid = next(streams[t], None)
+                if pid is None:
+                    continue
+                alive.append(t)
+                yield pid
+                emitted += 1
+                if emitted >= count:
+                    return
+            topics = alive
+
+    @staticmethod
+    def _weighted(
+        count: int,
+        rng: random.Random,
+        streams: Dict[str, Iterator[int]],
+        weights: Dict[str, float],
+    ) -> Iterator[int]:
+        topics = [t for t in streams if weights.get(t, 1.0) > 0]
+        topics.sort()  # deterministic for a given seed regardless of index insertion order
+        emitted = 0
+        while topics and emitted < count:
+            cum = list(accumulate(weights.get(t, 1.0) for t in topics))
+            # Draw until a topic runs dry; only then rebuild the cumulative table.
+            while emitted < count:
+                i = bisect_right(cum, rng.random() * cum[-1])
+                i = min(i, len(topics) - 1)
+                pid = next(streams[topics[i]], None)
+                if pid is None:
+                    del topics[i]
+                    break
+                emitted += 1
+                yield pid
@@ -0,0 +1,213 @@
+"""
+Materialised feed pages.
+
+FeedCache keeps finished /posts and /posts/mixed bodies per (user, feed, page)
+so a user re-reading a page that has not changed costs one dict lookup. It is
+an LRU capped by (approximate) bytes, and every entry also expires after
+`ttl` seconds.
+
+Entries are dropped precisely rather than by flushing the whole cache:
+
+- post_changed(): only the pages listing that post (any user).
+- user_changed(): only that user's pages.
+- posts_added(): only the pages a new post would land on or shift, i.e. pages
+  of its topic (or of all topics) whose key window contains its recency key,
+  plus the cached mixed pages, whose interleave any new post can reorder.
+
+The Store calls the invalidation hooks under its write lock and put() under
+its read lock, so a body built from a state that has since changed can never
+be stored after the change was reported.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from feed import RecencyKey
+
+# Rough per-entry bookkeeping on top of the body: the entry itself plus one
+# reverse-index slot per listed post.
+_ENTRY_OVERHEAD = 256
+_PER_POST_OVERHEAD = 64
+
+
+class _Entry:
+    __slots__ = ("body", "user", "scope", "post_ids", "low", "high", "full", "size", "expires")
+
+    def __init__(
+        self,
+        body: bytes,
+        user: str,
+        scope: Any,
+        post_ids: Tuple[int, ...],
+        low: Optional[RecencyKey],
+        high: Optional[RecencyKey],
+        full: bool,
+        expires: float,
+    ) -> None:
+        self.body = body
+        self.user = user
+        self.scope = scope
+        self.post_ids = post_ids
+        self.low = low
+        self.high = high
+        self.full = full
+        self.size = len(body) + _ENTRY_OVERHEAD + _PER_POST_OVERHEAD * len(post_ids)
+        self.expires = expires
+
+
+# scope of /posts/mixed entries; /posts entries use their topic (None = all topics)
+MIXED = ("mixed",)
+
+
+class FeedCache:
+    """
+    page key -> finished body. `max_bytes` <= 0 disables the cache (get()
+    always misses, put() does nothing).
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_bytes = max(0, max_bytes)
+        self.ttl = ttl
+        self.clock = clock
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._by_post: Dict[int, Set[Hashable]] = {}
+        self._by_user: Dict[str, Set[Hashable]] = {}
+        self._by_scope: Dict[Any, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        """Cached body for `key` (marked as recently used), or None."""
+        if not self.max_bytes:
+            return None
+        with self._lock:
+            e = self._entries.get(key)
+            if e is not None and e.expires <= self.clock():
+                self._drop(key)
+                self.evictions += 1
+                e = None
+            if e is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return e.body
+
+    def put(
+        self,
+        key: Hashable,
+        body: bytes,
+        user: str,
+        scope: Any,
+        post_ids: Iterable[int],
+        low: Optional[RecencyKey] = None,
+        high: Optional[RecencyKey] = None,
+        full: bool = True,
+    ) -> None:
+        """
+        Store a page body. For /posts pages, `low` is the oldest key listed,
+        `high` the cursor the page started after (None: the newest post) and
+        `full` whether the page reached its limit; a new post changes the page
+        iff its key is below `high` and either above `low` or the page has room.
+        """
+        if not self.max_bytes:
+            return
+        e = _Entry(body, user, scope, tuple(post_ids), low, high, full, self.clock() + self.ttl)
+        if e.size > self.max_bytes // 8:
+            return  # one page should never push out a large part of the cache
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = e
+            self.bytes += e.size
+            for pid in e.post_ids:
+                self._by_post.setdefault(pid, set()).add(key)
+            self._by_user.setdefault(user, set()).add(key)
+            self._by_scope.setdefault(scope, set()).add(key)
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def post_changed(self, post_id: int) -> None:
+        """A post's public form changed: drop the pages that list it."""
+        if not self._by_post:
+            return
+        with self._lock:
+            self._invalidate(self._by_post.get(post_id, ()))
+
+    def user_changed(self, user_id: str) -> None:
+        """A user's own flags changed: drop that user's pages only."""
+        if not self._by_user:
+            return
+        with self._lock:
+            self._invalidate(self._by_user.get(user_id, ()))
+
+    def posts_added(self, keys_by_topic: Dict[str, List[RecencyKey]]) -> None:
+        """New posts ({topic: their recency keys}): drop the pages they land on or shift."""
+        if not self._entries or not keys_by_topic:
+            return
+        with self._lock:
+            stale: List[Hashable] = list(self._by_scope.get(MIXED, ()))
+            everything: List[RecencyKey] = []
+            for topic, keys in keys_by_topic.items():
+                keys = sorted(keys)
+                everything.extend(keys)
+                stale.extend(self._shifted(topic, keys))
+            everything.sort()
+            stale.extend(self._shifted(None, everything))
+            self._invalidate(stale)
+
+    def _shifted(self, scope: Optional[str], keys: List[RecencyKey]) -> Iterable[Hashable]:
+        for key in self._by_scope.get(scope, ()):
+            e = self._entries[key]
+            i = len(keys) if e.high is None else bisect_left(keys, e.high)
+            if i and (not e.full or e.low is None or keys[i - 1] > e.low):
+                yield key
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    def _invalidate(self, keys: Iterable[Hashable]) -> None:
+        for key in list(keys):
+            if key in self._entries:
+                self._drop(key)
+                self.invalidations += 1
+
+    def _drop(self, key: Hashable) -> None:
+        e = self._entries.pop(key)
+        self.bytes -= e.size
+        for pid in e.post_ids:
+            self._discard(self._by_post, pid, key)
+        self._discard(self._by_user, e.user, key)
+        self._discard(self._by_scope, e.scope, key)
+
+    @staticmethod
+    def _discard(index: Dict[Any, Set[Hashable]], name: Any, key: Hashable) -> None:
+        keys = index.get(name)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[name]
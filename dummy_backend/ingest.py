@@ -0,0 +1,375 @@
+"""
+Bulk import of posts from NDJSON or a JSON array, read incrementally.
+
+Input is parsed as it arrives: RowReader turns byte chunks into (row number,
+value) pairs, holding at most one unfinished row, and Importer groups valid
+JSON into batches for Store.import_posts, which validates each row
+(validate_row), gives the good ones fresh ids from next_id and adds the whole
+batch to every index in one pass. Memory stays bounded by the batch size
+however large the input; the report keeps the first `max_errors` per-row
+errors and a count of the rest.
+
+Rows are objects in the /posts shape. Only topic and text are required:
+
+    {"topic": "space", "text": "...", "timestamp": "2025-01-01T00:00:00Z",
+     "upvotes": 3, "tags": ["mars"], "author": {...}, "source": {...},
+     "parent_id": 42}
+
+"id" is ignored (ids are always allocated by the store), as are derived and
+per-viewer fields (score, my_*, lineage, expanded_*). parent_id must name a
+post that already exists.
+
+    python ingest.py corpus.ndjson                      # into the configured state files
+    python ingest.py corpus.json --url http://127.0.0.1:8000   # through POST /admin/import
+"""
+
+from __future__ import annotations
+
+import argparse
+import codecs
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from counters import COUNTER_FIELDS
+from feed import ts_key
+
+Row = Tuple[int, Any]
+RowError = Tuple[int, str]
+InsertBatch = Callable[[List[Row]], Tuple[List[int], List[RowError]]]
+
+DEFAULT_SOURCE = {"kind": "import", "model": None}
+# One row (an NDJSON line or an array element) may not exceed this.
+MAX_ROW_CHARS = 8 * 1024 * 1024
+
+
+class ParseError(ValueError):
+    """A row that is not valid JSON (the row is skipped)."""
+
+
+class RowReader:
+    """
+    Incremental parser for NDJSON (one value per line) or a single JSON
+    array, told apart by the first non-blank character. feed() returns the
+    rows completed so far as (row number, value or ParseError); rows are
+    numbered by line for NDJSON and by element (from 1) for arrays. A syntax
+    error inside an array cannot be skipped: it sets `fatal` and ends the input.
+    """
+
+    def __init__(self, max_row_chars: int = MAX_ROW_CHARS) -> None:
+        self.max_row_chars = max_row_chars
+        self.fatal: Optional[str] = None
+        self._decode = codecs.getincrementaldecoder("utf-8")("strict").decode
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._mode: Optional[str] = None  # "ndjson" | "array" | "done"
+        self._row = 0
+        self._skipping = False  # NDJSON: inside an over-long line
+
+    def feed(self, data: bytes) -> List[Row]:
+        if self.fatal is not None or self._mode == "done":
+            return []
+        try:
+            self._buf += self._decode(data)
+        except UnicodeDecodeError as exc:
+            self.fatal = f"input is not UTF-8: {exc.reason}"
+            return []
+        return self._drain(final=False)
+
+    def close(self) -> List[Row]:
+        """Rows still buffered at end of input."""
+        if self.fatal is not None or self._mode == "done":
+            return []
+        try:
+            self._buf += self._decode(b"", True)
+        except UnicodeDecodeError as exc:
+            self.fatal = f"input is not UTF-8: {exc.reason}"
+            return []
+        return self._drain(final=True)
+
+    def _drain(self, final: bool) -> List[Row]:
+        if self._mode is None:
+            head = self._buf.lstrip("\ufeff \t\r\n")
+            if not head:
+                if not final:
+                    return []
+                self._mode = "done"
+                return []
+            if head[0] == "[":
+                self._mode = "array"
+                self._buf = head[1:]
+            else:
+                self._mode = "ndjson"
+        if self._mode == "ndjson":
+            return self._ndjson(final)
+        return self._array(final)
+
+    def _ndjson(self, final: bool) -> List[Row]:
+        if self._skipping:
+            # Drop the rest of a line already reported as too long.
+            end = self._buf.find("\n")
+            if end < 0:
+                self._buf = ""
+                return []
+            self._buf = self._buf[end + 1:]
+            self._row += 1
+            self._skipping = False
+        lines = self._buf.split("\n")
+        self._buf = "" if final else lines.pop()
+        out: List[Row] = []
+        for line in lines:
+            self._row += 1
+            if not line.strip():
+                continue
+            try:
+                out.append((self._row, json.loads(line)))
+            except ValueError as exc:
+                out.append((self._row, ParseError(f"invalid JSON: {exc}")))
+        if not final and len(self._buf) > self.max_row_chars:
+            out.append((self._row + 1, ParseError(f"line longer than {self.max_row_chars} characters")))
+            self._buf = ""
+            self._skipping = True
+        return out
+
+    def _array(self, final: bool) -> List[Row]:
+        buf, pos, out = self._buf, 0, []
+        while True:
+            pos = _skip_blank(buf, pos)
+            if pos == len(buf):
+                break
+            if buf[pos] == "]":
+                self._mode = "done"
+                if buf[pos + 1:].strip():
+                    self.fatal = "unexpected data after the closing ]"
+                self._buf = ""
+                return out
+            if self._row and buf[pos] == ",":
+                # Separator before the next element: only consume it with the element.
+                start = _skip_blank(buf, pos + 1)
+                if start == len(buf):
+                    break
+            elif self._row:
+                self.fatal = f"expected , or ] after element {self._row}"
+                return out
+            else:
+                start = pos
+            try:
+                value, end = self._json.raw_decode(buf, start)
+            except ValueError as exc:
+                if final or len(buf) - start > self.max_row_chars:
+                    self.fatal = f"element {self._row + 1}: invalid JSON: {exc}"
+                    return out
+                break  # most likely cut off mid-element: wait for more input
+            self._row += 1
+            out.append((self._row, value))
+            pos = end
+        self._buf = buf[pos:]
+        if final and self._mode != "done":
+            self.fatal = "input ended before the closing ]"
+        return out
+
+
+def _skip_blank(s: str, i: int) -> int:
+    n = len(s)
+    while i < n and s[i] in " \t\r\n":
+        i += 1
+    return i
+
+
+def validate_row(raw: Any, now: str) -> Dict[str, Any]:
+    """Post() keyword arguments (without id) for one import row; raises ValueError naming the bad field."""
+    if not isinstance(raw, dict):
+        raise ValueError("row must be a JSON object")
+    out: Dict[str, Any] = {}
+    for name in ("topic", "text"):
+        v = raw.get(name)
+        if not isinstance(v, str) or not v.strip():
+            raise ValueError(f"{name} must be a non-empty string")
+        out[name] = v
+    ts = raw.get("timestamp")
+    if ts is None:
+        ts = now
+    elif not isinstance(ts, str) or not ts_key(ts):
+        raise ValueError("timestamp must be an ISO-8601 string")
+    out["timestamp"] = ts
+    for name in COUNTER_FIELDS:
+        v = raw.get(name, 0)
+        if isinstance(v, bool) or not isinstance(v, int) or v < 0:
+            raise ValueError(f"{name} must be a non-negative integer")
+        out[name] = v
+    tags = raw.get("tags")
+    if tags is not None and (not isinstance(tags, list) or not all(isinstance(t, str) for t in tags)):
+        raise ValueError("tags must be a list of strings")
+    out["tags"] = tags
+    for name in ("author", "source"):
+        v = raw.get(name)
+        if v is not None and not isinstance(v, dict):
+            raise ValueError(f"{name} must be an object")
+        out[name] = v
+    if out["source"] is None:
+        out["source"] = dict(DEFAULT_SOURCE)
+    parent = raw.get("parent_id")
+    if parent is not None and (isinstance(parent, bool) or not isinstance(parent, int) or parent <= 0):
+        raise ValueError("parent_id must be a positive integer")
+    out["parent_id"] = parent
+    return out
+
+
+class Importer:
+    """
+    Drives one import: feed() input chunks, pass every batch it returns to
+    insert(), then do the same for finish(). report() summarises the run.
+    The caller decides where insert() runs (a worker thread for the API).
+    """
+
+    def __init__(self, insert_batch: InsertBatch, batch_size: int = 5000, max_errors: int = 1000) -> None:
+        self.insert_batch = insert_batch
+        self.batch_size = max(1, batch_size)
+        self.max_errors = max_errors
+        self.reader = RowReader()
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.id_ranges: List[List[int]] = []
+        self._pending: List[Row] = []
+        self._t0 = time.perf_counter()
+
+    def feed(self, data: bytes) -> List[List[Row]]:
+        """Parse a chunk of input; returns the batches it completed."""
+        return self._collect(self.reader.feed(data))
+
+    def finish(self) -> List[List[Row]]:
+        """End of input: the remaining rows, as at most one (short) batch."""
+        batches = self._collect(self.reader.close())
+        if self._pending:
+            batches.append(self._pending)
+            self._pending = []
+        return batches
+
+    def _collect(self, rows: List[Row]) -> List[List[Row]]:
+        batches: List[List[Row]] = []
+        for row, value in rows:
+            self.rows += 1
+            if isinstance(value, ParseError):
+                self._error(row, str(value))
+                continue
+            self._pending.append((row, value))
+            if len(self._pending) >= self.batch_size:
+                batches.append(self._pending)
+                self._pending = []
+        return batches
+
+    def insert(self, batch: List[Row]) -> None:
+        ids, errors = self.insert_batch(batch)
+        self.imported += len(ids)
+        for row, message in errors:
+            self._error(row, message)
+        for pid in ids:
+            if self.id_ranges and self.id_ranges[-1][1] == pid - 1:
+                self.id_ranges[-1][1] = pid
+            else:
+                self.id_ranges.append([pid, pid])
+
+    def _error(self, row: int, message: str) -> None:
+        # Parse errors are found while reading, validation errors only once
+        # their batch is inserted: keep the lowest rows, not the first found.
+        self.failed += 1
+        self.errors.append({"row": row, "error": message})
+        if len(self.errors) >= 2 * self.max_errors:
+            self._trim_errors()
+
+    def _trim_errors(self) -> None:
+        self.errors.sort(key=lambda e: e["row"])
+        del self.errors[self.max_errors:]
+
+    def report(self) -> Dict[str, Any]:
+        """{"rows", "imported", "failed", "id_ranges", "errors", "errors_truncated", "aborted", "seconds"}."""
+        self._trim_errors()
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "failed": self.failed,
+            "id_ranges": self.id_ranges,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "aborted": self.reader.fatal,
+            "seconds": round(time.perf_counter() - self._t0, 3),
+        }
+
+
+def import_chunks(insert_batch: InsertBatch, chunks: Iterable[bytes], batch_size: int = 5000, max_errors: int = 1000) -> Dict[str, Any]:
+    """Run a whole import synchronously over an iterable of byte chunks; returns the report."""
+    importer = Importer(insert_batch, batch_size, max_errors)
+    for chunk in chunks:
+        for batch in importer.feed(chunk):
+            importer.insert(batch)
+        if importer.reader.fatal is not None:
+            break
+    for batch in importer.finish():
+        importer.insert(batch)
+    return importer.report()
+
+
+def read_chunks(fh: Any, size: int = 1 << 20) -> Iterable[bytes]:
+    while True:
+        chunk = fh.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+# -------------------------
+# CLI
+# -------------------------
+
+def _post_file(path: Path, url: str, batch: int, token: Optional[str]) -> Dict[str, Any]:
+    from urllib.request import Request, urlopen
+
+    headers = {"Content-Type": "application/x-ndjson", "Content-Length": str(path.stat().st_size)}
+    if token:
+        headers["x_admin_token"] = token
+    with path.open("rb") as fh:
+        req = Request(f"{url.rstrip('/')}/admin/import?batch={batch}", data=fh, headers=headers, method="POST")
+        with urlopen(req) as resp:
+            return json.loads(resp.read())
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Bulk-import posts from NDJSON or a JSON array.")
+    ap.add_argument("file", help="input file ('-' for stdin)")
+    ap.add_argument("--batch", type=int, default=5000, help="posts validated and inserted per batch")
+    ap.add_argument("--url", help="send to a running server's POST /admin/import instead of the state files")
+    ap.add_argument("--token", default=os.environ.get("FATHOM_ADMIN_TOKEN"), help="admin token for --url")
+    args = ap.parse_args(argv)
+
+    if args.url:
+        if args.file == "-":
+            raise SystemExit("--url needs a file, not stdin")
+        report = _post_file(Path(args.file), args.url, args.batch, args.token)
+    else:
+        # Imports into whatever main.py would load (FATHOM_STORAGE, FATHOM_STATE_PATH,
+        # ...). Stop the server first: both would write the same files.
+        os.environ["FATHOM_METRICS"] = "0"
+        os.environ.pop("FATHOM_STATE_SERVER", None)
+        sys.path.insert(0, str(Path(__file__).resolve().parent))
+        import main
+
+        store = main.get_store()
+        fh = sys.stdin.buffer if args.file == "-" else open(args.file, "rb")
+        try:
+            report = import_chunks(store.import_posts, read_chunks(fh), args.batch)
+        finally:
+            if fh is not sys.stdin.buffer:
+                fh.close()
+            store.save()  # one checkpoint for the whole import
+            store.close()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0 if report["aborted"] is None else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
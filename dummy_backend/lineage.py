@@ -0,0 +1,242 @@
+"""
+Lineage graph of spawned posts.
+
+Reaching the power threshold spawns a child post (Store._spawn_child_post);
+children can spawn in turn, so every original post roots a tree. The index
+below keeps that forest as a children adjacency list keyed by post id, and
+for every node in it the depth (0 = original post), the root, the subtree
+size and the summed engagement counters of the subtree. Adding a child or
+changing a node's counters walks its ancestor chain once, so updates cost
+O(depth) and ancestry / descendant queries O(answer) -- never O(corpus).
+
+Posts that never spawned and were never spawned are not stored at all: for
+them depth is 0, the root is the post itself and the subtree is the post.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from collections import Counter, deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from counters import COUNTER_FIELDS
+
+CountersOf = Callable[[int], Sequence[int]]
+
+
+class LineageIndex:
+    """
+    Forest of spawned posts. `counters_of(post_id)` returns a post's current
+    counters (in COUNTER_FIELDS order); own counters are cached per node, so
+    touched() can propagate just the difference up the tree.
+    """
+
+    def __init__(self, counters_of: CountersOf) -> None:
+        self.counters_of = counters_of
+        self.parent: Dict[int, int] = {}
+        self.children: Dict[int, List[int]] = {}
+        self._depth: Dict[int, int] = {}
+        self._root: Dict[int, int] = {}
+        self._topic: Dict[int, str] = {}
+        self._size: Dict[int, int] = {}
+        self._own: Dict[int, List[int]] = {}
+        self._sums: Dict[int, List[int]] = {}
+        # Children whose parent was not added yet (e.g. out-of-order seed files).
+        self._orphans: Dict[int, List[int]] = {}
+        self._depth_counts: Counter = Counter()
+        # topic (None: all topics) -> depth >= 1 -> post ids at that depth, ascending,
+        # so deepest() reads the top levels instead of scanning the forest.
+        self._levels: Dict[Optional[str], Dict[int, List[int]]] = {}
+
+    def __contains__(self, post_id: int) -> bool:
+        return post_id in self._size
+
+    def depth(self, post_id: int) -> int:
+        return self._depth.get(post_id, 0)
+
+    def root(self, post_id: int) -> int:
+        return self._root.get(post_id, post_id)
+
+    def size(self, post_id: int) -> int:
+        """Posts in the subtree of `post_id`, itself included."""
+        return self._size.get(post_id, 1)
+
+    def sums(self, post_id: int) -> List[int]:
+        """Counters summed over the subtree of `post_id`."""
+        s = self._sums.get(post_id)
+        return list(s) if s is not None else list(self.counters_of(post_id))
+
+    def depth_counts(self) -> Counter:
+        """{depth: number of spawned posts at that depth} (depth >= 1)."""
+        return +self._depth_counts
+
+    def _join(self, post_id: int, topic: str) -> None:
+        """Start tracking a node (alone in its subtree, depth 0 until attached)."""
+        own = list(self.counters_of(post_id))
+        self._own[post_id] = own
+        self._sums[post_id] = list(own)
+        self._size[post_id] = 1
+        self._depth[post_id] = 0
+        self._root[post_id] = post_id
+        self._topic[post_id] = topic
+
+    def add(self, post_id: int, parent_id: int, topic: str, parent_topic: Optional[str] = None) -> List[Tuple[int, int]]:
+        """
+        Record that `post_id` was spawned from `parent_id`. Returns the
+        (post id, depth) of every node whose depth was set by this call: the
+        post and any descendants that were waiting for it.
+
+        `parent_topic` is needed only when the parent is known but not yet in
+        the forest; a parent that was not added at all keeps the post pending.
+        """
+        if post_id in self.parent or post_id == parent_id:
+            return []
+        if post_id not in self._size:
+            self._join(post_id, topic)
+        if parent_id not in self._size:
+            if parent_topic is None:
+                self._orphans.setdefault(parent_id, []).append(post_id)
+                return []
+            self._join(parent_id, parent_topic)
+        return self._attach(post_id, parent_id)
+
+    def adopt(self, post_id: int, topic: str) -> List[Tuple[int, int]]:
+        """`post_id` was just added: attach children that named it as parent before it existed."""
+        waiting = self._orphans.pop(post_id, None)
+        if not waiting:
+            return []
+        if post_id not in self._size:
+            self._join(post_id, topic)
+        changed: List[Tuple[int, int]] = []
+        for child in waiting:
+            changed.extend(self._attach(child, post_id))
+        return changed
+
+    def _attach(self, child: int, parent: int) -> List[Tuple[int, int]]:
+        # Refuse edges that would close a cycle.
+        node: Optional[int] = parent
+        while node is not None:
+            if node == child:
+                return []
+            node = self.parent.get(node)
+
+        self.parent[child] = parent
+        self.children.setdefault(parent, []).append(child)
+        size, sums = self._size[child], self._sums[child]
+        node = parent
+        while node is not None:
+            self._size[node] += size
+            acc = self._sums[node]
+            for i, v in enumerate(sums):
+                acc[i] += v
+            node = self.parent.get(node)
+
+        # (Re)number the attached subtree.
+        changed: List[Tuple[int, int]] = []
+        root = self._root[parent]
+        stack = [(child, self._depth[parent] + 1)]
+        while stack:
+            node, d = stack.pop()
+            old = self._depth[node]
+            if old:
+                self._depth_counts[old] -= 1
+                self._unlevel(node, old)
+            self._depth_counts[d] += 1
+            self._level(node, d)
+            self._depth[node] = d
+            self._root[node] = root
+            changed.append((node, d))
+            stack.extend((c, d + 1) for c in self.children.get(node, ()))
+        return changed
+
+    def _level(self, post_id: int, depth: int) -> None:
+        for scope in (None, self._topic[post_id]):
+            insort(self._levels.setdefault(scope, {}).setdefault(depth, []), post_id)
+
+    def _unlevel(self, post_id: int, depth: int) -> None:
+        for scope in (None, self._topic[post_id]):
+            levels = self._levels[scope]
+            bucket = levels[depth]
+            del bucket[bisect_left(bucket, post_id)]
+            if not bucket:
+                del levels[depth]
+
+    def touched(self, post_id: int) -> None:
+        """Re-read one node's counters and add the difference to its ancestors' sums."""
+        own = self._own.get(post_id)
+        if own is None:
+            return
+        now = list(self.counters_of(post_id))
+        delta = [n - o for n, o in zip(now, own)]
+        if not any(delta):
+            return
+        self._own[post_id] = now
+        node: Optional[int] = post_id
+        while node is not None:
+            acc = self._sums[node]
+            for i, d in enumerate(delta):
+                acc[i] += d
+            node = self.parent.get(node)
+
+    def recount(self) -> None:
+        """Recompute every cached counter and sum from scratch (after a bulk load)."""
+        for pid in self._own:
+            self._own[pid] = list(self.counters_of(pid))
+            self._sums[pid] = list(self._own[pid])
+        # Children before parents: deepest first.
+        for pid in sorted(self._own, key=self._depth.__getitem__, reverse=True):
+            parent = self.parent.get(pid)
+            if parent is not None:
+                acc = self._sums[parent]
+                for i, v in enumerate(self._sums[pid]):
+                    acc[i] += v
+
+    def ancestors(self, post_id: int) -> List[int]:
+        """Parent, grandparent, ... up to the root."""
+        out: List[int] = []
+        node = self.parent.get(post_id)
+        while node is not None:
+            out.append(node)
+            node = self.parent.get(node)
+        return out
+
+    def descendants(self, post_id: int, max_depth: Optional[int] = None, limit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        (post id, parent id) of the subtree below `post_id`, breadth first and
+        in spawn order within a level, at most `max_depth` levels down and
+        `limit` posts in total.
+        """
+        out: List[Tuple[int, int]] = []
+        queue = deque([(post_id, 0)])
+        while queue:
+            node, level = queue.popleft()
+            if max_depth is not None and level >= max_depth:
+                continue
+            for child in self.children.get(node, ()):
+                if limit is not None and len(out) >= limit:
+                    return out
+                out.append((child, node))
+                queue.append((child, level + 1))
+        return out
+
+    def deepest(self, topic: Optional[str] = None, limit: int = 10) -> List[int]:
+        """
+        Spawned posts with the longest ancestry (newest first among equals),
+        optionally in one topic. Reads levels from the deepest down, so it
+        costs O(distinct depths + limit).
+        """
+        levels = self._levels.get(topic, {})
+        out: List[int] = []
+        for depth in sorted(levels, reverse=True):
+            if len(out) >= limit:
+                break
+            bucket = levels[depth]
+            out.extend(reversed(bucket[max(0, len(bucket) - (limit - len(out))):]))
+        return out
+
+
+def sums_json(size: int, sums: Sequence[int]) -> Dict[str, int]:
+    """{"size", "score", <counter>...} for a subtree."""
+    out = {"size": size, "score": sums[0] - sums[1]}
+    out.update(zip(COUNTER_FIELDS, sums))
+    return out
@@ -0,0 +1,230 @@
+"""
+Live counter deltas for push clients (SSE / WebSocket).
+
+The Store only *logs* which posts changed (a list append per mutation, no
+I/O); a DeltaHub publisher wakes up every `window` seconds, reads the posts
+logged since its cursor, turns them into one compact message and fans it out
+to subscribers. Because readers keep their own cursor, several hubs (one per
+worker process, see stateserver.py) can follow the same log. However many
+votes a hot post receives, each subscriber gets at most one message per
+window, and a post appears in it at most once with its latest counters.
+
+Message shape (JSON):
+
+    {"seq": 12,
+     "posts": [{"id": 7, "topic": "space", "score": 14, "learned_count": 3}, ...],
+     "new":   [{"id": 181, "parent_id": 7, "topic": "space"}, ...],
+     "expanded": [{"id": 9, "topic": "space"}, ...]}
+
+"expanded" lists posts whose expanded body just became available (see
+expansion.py); fetch it with GET /posts/{id} or /posts/{id}/expansion.
+
+Each subscriber gets only the counters that changed since the last message
+*it* received for a post; values are absolute, not increments. A post it has
+not been sent yet (or not recently: the baseline per subscriber is bounded)
+comes with all counters, and so does every post after the subscriber's queue
+overflowed and lost a message.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from counters import COUNTER_FIELDS
+
+Delta = Dict[str, Any]
+
+# Published fields: the five counters plus the derived score the feed shows.
+_FIELDS = ("score",) + COUNTER_FIELDS
+
+
+class ChangeLog:
+    """
+    Thread-safe, bounded log of changed / spawned / expanded post ids, each
+    tagged with a sequence number. since(cursor) returns what happened after
+    `cursor`.
+    """
+
+    def __init__(self, max_entries: int = 65536) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._changed: List[Tuple[int, int]] = []
+        self._spawned: List[Tuple[int, int]] = []
+        self._expanded: List[Tuple[int, int]] = []
+
+    @property
+    def cursor(self) -> int:
+        return self._seq
+
+    def changed(self, post_id: int) -> None:
+        with self._lock:
+            self._seq += 1
+            self._changed.append((self._seq, post_id))
+            if len(self._changed) > self.max_entries:
+                # A reader this far behind just gets the newest half; values are absolute.
+                del self._changed[: self.max_entries // 2]
+
+    def spawned(self, post_id: int) -> None:
+        self._append(self._spawned, post_id)
+
+    def expanded(self, post_id: int) -> None:
+        self._append(self._expanded, post_id)
+
+    def _append(self, log: List[Tuple[int, int]], post_id: int) -> None:
+        with self._lock:
+            self._seq += 1
+            log.append((self._seq, post_id))
+            if len(log) > self.max_entries:
+                del log[: self.max_entries // 2]
+
+    def since(self, cursor: int) -> Tuple[int, Set[int], List[int], List[int]]:
+        """(new cursor, post ids changed after `cursor`, spawned after it, expanded after it)."""
+        key = (cursor, sys.maxsize)
+        with self._lock:
+            changed = {pid for _, pid in self._changed[bisect_right(self._changed, key):]}
+            spawned = [pid for _, pid in self._spawned[bisect_right(self._spawned, key):]]
+            expanded = [pid for _, pid in self._expanded[bisect_right(self._expanded, key):]]
+            return self._seq, changed, spawned, expanded
+
+
+class Subscriber:
+    """
+    One connected client: a topic / post id filter, a small outbound queue
+    and the counters last sent per post (at most `max_seen` posts, LRU).
+    """
+
+    def __init__(self, topics: Iterable[str] = (), post_ids: Iterable[int] = (), maxsize: int = 32, max_seen: int = 4096) -> None:
+        self.topics = set(topics)
+        self.post_ids = set(post_ids)
+        self.queue: "asyncio.Queue[Delta]" = asyncio.Queue(maxsize=maxsize)
+        self.max_seen = max_seen
+        self._seen: "OrderedDict[int, Tuple[int, ...]]" = OrderedDict()
+
+    def wants(self, post_id: int, topic: str, parent_id: Optional[int] = None) -> bool:
+        if not self.topics and not self.post_ids:
+            return True
+        return topic in self.topics or post_id in self.post_ids or (parent_id is not None and parent_id in self.post_ids)
+
+    def make_room(self) -> None:
+        """
+        A slow client loses its oldest message rather than stalling the hub.
+        What it lost is unknown from here on, so the baseline goes too and the
+        next message carries full rows.
+        """
+        if self.queue.full():
+            self.queue.get_nowait()
+            self._seen.clear()
+
+    def deltas(self, posts: List[Delta]) -> List[Delta]:
+        """Full rows (already filtered for this client) trimmed to what it has not been sent."""
+        out: List[Delta] = []
+        seen = self._seen
+        for full in posts:
+            pid = full["id"]
+            row = tuple(full[name] for name in _FIELDS)
+            old = seen.pop(pid, None)
+            seen[pid] = row
+            if old == row:
+                continue
+            if old is None:
+                out.append(full)
+                continue
+            d: Delta = {"id": pid, "topic": full["topic"]}
+            for i, name in enumerate(_FIELDS):
+                if old[i] != row[i]:
+                    d[name] = row[i]
+            out.append(d)
+        while len(seen) > self.max_seen:
+            seen.popitem(last=False)
+        return out
+
+    def offer(self, msg: Delta) -> None:
+        self.make_room()
+        self.queue.put_nowait(msg)
+
+
+class DeltaHub:
+    """Coalesces Store changes and publishes them to subscribers every `window` seconds."""
+
+    def __init__(self, store: Any, window: float) -> None:
+        self.store = store
+        self.window = window
+        self.subscribers: Set[Subscriber] = set()
+        self._cursor: Optional[int] = None
+        self._seq = 0
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def subscribe(self, topics: Iterable[str] = (), post_ids: Iterable[int] = ()) -> Subscriber:
+        sub = Subscriber(topics, post_ids)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self.subscribers.discard(sub)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._cursor = await loop.run_in_executor(None, self.store.delta_cursor)
+        while True:
+            await asyncio.sleep(self.window)
+            try:
+                # Reading counters takes the store's read lock (or a round trip to
+                # the state server): keep it off the loop.
+                posts, new, expanded = await loop.run_in_executor(None, self.collect)
+            except Exception as exc:  # never let one bad round kill the stream
+                print(f"[live] publish failed: {exc}")
+                continue
+            if posts or new or expanded:
+                self.publish(posts, new, expanded)
+
+    def collect(self) -> Tuple[List[Delta], List[Delta], List[Delta]]:
+        """
+        Fetch what changed since the last round as (full post rows, new
+        posts, expanded posts); publish() trims the rows per subscriber.
+        """
+        if not self.subscribers or self._cursor is None:
+            # Nobody listening: just keep the cursor current.
+            self._cursor = self.store.delta_cursor()
+            return [], [], []
+        self._cursor, rows, new, expanded = self.store.delta_rows(self._cursor)
+        posts: List[Delta] = []
+        for pid, topic, counters in rows:
+            d: Delta = {"id": pid, "topic": topic}
+            d.update(zip(_FIELDS, (counters[0] - counters[1], *counters)))
+            posts.append(d)
+        return posts, new, expanded
+
+    def publish(self, posts: List[Delta], new: List[Delta], expanded: List[Delta]) -> None:
+        self._seq += 1
+        for sub in list(self.subscribers):
+            mine = [d for d in posts if sub.wants(d["id"], d["topic"])]
+            born = [d for d in new if sub.wants(d["id"], d["topic"], d["parent_id"])]
+            ready = [d for d in expanded if sub.wants(d["id"], d["topic"])]
+            if not (mine or born or ready):
+                continue
+            sub.make_room()  # before diffing, so a dropped message resets the baseline first
+            mine = sub.deltas(mine)
+            if mine or born or ready:
+                msg: Delta = {"seq": self._seq, "posts": mine, "new": born}
+                if ready:
+                    msg["expanded"] = ready
+                sub.offer(msg)
@@ -1,19 +1,43 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import hmac
 import json
 import os
 import random
-from dataclasses import dataclass
+import threading
+import time
+from array import array
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
-
-from fastapi import FastAPI, Header, HTTPException, Request
-from fastapi.responses import JSONResponse
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from fastapi import FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from compress import CompressionMiddleware
+from counters import COUNTER_FIELDS, CounterColumns, CounterView
+from expansion import ExpansionCache, ExpansionError, Expander, load_expander
+from feed import MixedSampler, RecencyIndex, RecencyKey, cursor_key, decode_cursor, encode_cursor, key_payload, parse_topic_weights, ts_key
+from feedcache import MIXED, FeedCache
+from ingest import Importer, validate_row
+from lineage import LineageIndex, sums_json
+from live import ChangeLog, DeltaHub
+from metrics import MetricsMiddleware, Registry
+from ranking import POLICIES, RankingEngine
+from rwlock import RWLock
+from search import SearchIndex, SearchNotReady
+from storage import BinaryBackend, JsonBackend, SqliteBackend, StorageBackend, read_json, write_json
+from userstate import UserState
+from versions import VersionClock, etag_matches
 
 APP_DIR = Path(__file__).resolve().parent
 SEED_PATH = APP_DIR / "posts_seed.json"
-STATE_PATH = APP_DIR / "state.json"
+STATE_PATH = Path(os.environ.get("FATHOM_STATE_PATH", str(APP_DIR / "state.json")))
 
 SCHEMA_VERSION = 0
 
@@ -31,9 +55,14 @@ DEFAULT_TOPICS = [
 
 POWER_THRESHOLD_DEFAULT = 5
 
+# Upper bound on operations per POST /interactions/batch request.
+BATCH_MAX_OPS = 10_000
+
 
-def now_iso() -> str:
-    return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+def now_iso(t: Optional[float] = None) -> str:
+    """`t` (epoch seconds, default now) as an ISO-8601 UTC timestamp."""
+    dt = datetime.now(timezone.utc) if t is None else datetime.fromtimestamp(t, timezone.utc)
+    return dt.replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
 
 def clamp_int(x: Any, lo: int, hi: int, default: int) -> int:
@@ -44,19 +73,104 @@ def clamp_int(x: Any, lo: int, hi: int, default: int) -> int:
     return max(lo, min(hi, v))
 
 
-def read_json(path: Path, default: Any) -> Any:
-    if not path.exists():
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except Exception:
         return default
+
+
+def env_float(name: str, default: float) -> float:
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return float(os.environ.get(name, default))
     except Exception:
         return default
 
 
-def write_json(path: Path, data: Any) -> None:
-    tmp = path.with_suffix(".tmp")
-    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
-    tmp.replace(path)
+# Persistence:
+#   "sync"         rewrite state.json after every mutation (original behaviour)
+#   "write_behind" mark the store dirty; a background flusher coalesces writes
+#                  into one snapshot per FLUSH_INTERVAL_S or FLUSH_BATCH_SIZE mutations
+#   "journal"      append one compact record per interaction to JOURNAL_PATH and
+#                  fold the journal into state.json every JOURNAL_COMPACT_EVERY records
+PERSIST_MODE = os.environ.get("FATHOM_PERSIST_MODE", "sync").strip().lower()
+# Upper bound on how many seconds of writes a crash can lose in write_behind mode.
+FLUSH_INTERVAL_S = max(0.05, env_float("FATHOM_FLUSH_INTERVAL", 2.0))
+# Flush early once this many mutations are pending.
+FLUSH_BATCH_SIZE = max(1, env_int("FATHOM_FLUSH_BATCH", 1000))
+
+JOURNAL_PATH = Path(os.environ.get("FATHOM_JOURNAL_PATH", str(STATE_PATH.with_suffix(".journal"))))
+JOURNAL_COMPACT_EVERY = max(1, env_int("FATHOM_JOURNAL_COMPACT_EVERY", 10_000))
+
+# Storage backend: "json" (state.json + journal), "sqlite" (WAL database, see
+# storage.py) or "binary" (memory-mapped snapshot, see snapshot.py).
+STORAGE_BACKEND = os.environ.get("FATHOM_STORAGE", "json").strip().lower()
+SQLITE_PATH = Path(os.environ.get("FATHOM_SQLITE_PATH", str(APP_DIR / "state.sqlite3")))
+SNAPSHOT_PATH = Path(os.environ.get("FATHOM_SNAPSHOT_PATH", str(STATE_PATH.with_suffix(".fathom"))))
+
+# Live deltas (/stream, /ws): coalescing window, i.e. the max message rate per client.
+STREAM_WINDOW_S = max(0.02, env_float("FATHOM_STREAM_WINDOW", 0.25))
+# SSE keep-alive comment interval.
+STREAM_PING_S = 15.0
+
+# Materialised /posts and /posts/mixed pages per user (see feedcache.py): an
+# LRU capped at this many MB ("0" disables it), entries expiring after a TTL.
+FEED_CACHE_MB = max(0.0, env_float("FATHOM_FEED_CACHE_MB", 64.0))
+FEED_CACHE_TTL_S = max(0.1, env_float("FATHOM_FEED_CACHE_TTL", 300.0))
+
+# Expansions (POST /posts/{id}/expand, see expansion.py): "module:function" of an
+# async generator (default: the built-in template), how many run at once, and
+# how long one may take. Bodies live in their own LRU-bounded JSONL log.
+EXPANDER = os.environ.get("FATHOM_EXPANDER", "").strip()
+EXPANSION_WORKERS = max(1, env_int("FATHOM_EXPANSION_WORKERS", 4))
+EXPANSION_TIMEOUT_S = max(0.1, env_float("FATHOM_EXPANSION_TIMEOUT", 30.0))
+EXPANSION_CACHE_SIZE = max(1, env_int("FATHOM_EXPANSION_CACHE", 10_000))
+EXPANSIONS_PATH = Path(os.environ.get("FATHOM_EXPANSIONS_PATH", str(STATE_PATH.with_suffix(".expansions.jsonl"))))
+# Most recent failure per post, reported by GET /posts/{id}/expansion.
+EXPANSION_ERRORS_MAX = 1000
+
+# /metrics (Prometheus text format). "0" removes the request middleware and the
+# Store method timers entirely; only a few plain counters keep ticking.
+METRICS_ENABLED = os.environ.get("FATHOM_METRICS", "1").strip().lower() not in ("0", "false", "no", "off")
+# Per-process metrics (HTTP, live subscribers) ...
+METRICS = Registry(enabled=METRICS_ENABLED)
+HTTP_DURATION = METRICS.histogram(
+    "fathom_http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+HTTP_REQUESTS = METRICS.counter(
+    "fathom_http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status"))
+# ... and metrics of the process that owns the Store (see Store.metrics_text).
+STORE_METRICS = Registry(enabled=METRICS_ENABLED)
+STORE_DURATION = STORE_METRICS.histogram(
+    "fathom_store_method_duration_seconds", "Time spent in Store methods (includes waiting for the store lock).", ("method",))
+SPAWNS = STORE_METRICS.counter("fathom_spawns_total", "Child posts spawned by reaching the power threshold.")
+EXPANSIONS = STORE_METRICS.counter("fathom_expansions_total", "Posts expanded for the first time.")
+IMPORTED = STORE_METRICS.counter("fathom_imported_posts_total", "Posts added by bulk import.")
+
+# Response compression: gzip, plus zstd when the zstandard package is installed
+# (see compress.py). "0" turns it off; smaller bodies are sent as they are.
+COMPRESSION_ENABLED = os.environ.get("FATHOM_COMPRESSION", "1").strip().lower() not in ("0", "false", "no", "off")
+COMPRESS_MIN_BYTES = max(0, env_int("FATHOM_COMPRESS_MIN_BYTES", 1024))
+# Bulk import (POST /admin/import, ingest.py): posts validated and inserted per
+# write section. The endpoint is disabled unless a token is set, and then
+# requires it in x_admin_token.
+IMPORT_BATCH = max(1, env_int("FATHOM_IMPORT_BATCH", 5000))
+ADMIN_TOKEN = os.environ.get("FATHOM_ADMIN_TOKEN", "").strip()
+# Posts per chunk of an NDJSON export; each chunk is one read-lock section.
+EXPORT_CHUNK = max(1, env_int("FATHOM_EXPORT_CHUNK", 1000))
+
+# Multi-worker mode: address ("host:port" or a socket path) of a running
+# stateserver.py. Every worker then talks to that one Store instead of its own.
+STATE_SERVER = os.environ.get("FATHOM_STATE_SERVER", "").strip()
+
+
+def make_backend(persist_mode: str) -> StorageBackend:
+    json_backend = JsonBackend(STATE_PATH, JOURNAL_PATH, journal=(persist_mode == "journal"))
+    # First start of sqlite / binary imports the seed plus any existing state.json / journal.
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteBackend(SQLITE_PATH, migrate_from=json_backend)
+    if STORAGE_BACKEND == "binary":
+        return BinaryBackend(SNAPSHOT_PATH, migrate_from=json_backend)
+    return json_backend
 
 
 def get_user_id(x_user_id: Optional[str]) -> str:
@@ -65,48 +179,197 @@ def get_user_id(x_user_id: Optional[str]) -> str:
     return uid if uid else "anon"
 
 
+# Allow booleans or truthy strings/ints
+def to_opt_bool(v: Any) -> Optional[bool]:
+    if v is None:
+        return None
+    if isinstance(v, bool):
+        return v
+    if isinstance(v, (int, float)):
+        return bool(v)
+    if isinstance(v, str):
+        s = v.strip().lower()
+        if s in ("1", "true", "yes", "y", "on"):
+            return True
+        if s in ("0", "false", "no", "n", "off", ""):
+            return False
+    return None
+
+
+# Accept enabled bool; tolerate 0/1, "true"/"false"
+def to_bool(v: Any) -> bool:
+    if isinstance(v, bool):
+        return v
+    if isinstance(v, (int, float)):
+        return bool(v)
+    if isinstance(v, str):
+        s = v.strip().lower()
+        if s in ("1", "true", "yes", "y", "on"):
+            return True
+        return False
+    return False
+
+
 # -------------------------
 # In-memory model + storage
 # -------------------------
 
-@dataclass
-class Post:
-    id: int
-    topic: str
-    text: str
-    timestamp: str
-
-    # aggregate counts (global)
-    upvotes: int = 0
-    downvotes: int = 0
-    learned_count: int = 0
-    surprised_count: int = 0
-    power_count: int = 0
-
-    # optional expansion
-    expanded_text: Optional[str] = None
-    expanded_at: Optional[str] = None
-
-    # future-proof metadata
-    tags: Optional[List[str]] = None
-    author: Optional[Dict[str, Any]] = None
-    parent_id: Optional[int] = None
-    lineage: Optional[Dict[str, Any]] = None
-    source: Optional[Dict[str, Any]] = None
+# Post fields a binary snapshot keeps in the post's record (see snapshot.py).
+_RECORD_FIELDS = ("text", "timestamp", "tags", "author", "lineage", "source")
+
+
+def _record_property(name: str) -> property:
+    slot = "_" + name
+
+    def fget(self: "Post") -> Any:
+        if self._stored is not None:
+            self._hydrate()
+        return getattr(self, slot)
+
+    def fset(self: "Post", value: Any) -> None:
+        if self._stored is not None:
+            self._hydrate()
+        setattr(self, slot, value)
+
+    return property(fget, fset, doc=f"{name} (decoded from the snapshot record on first access)")
+
+
+class Post(CounterView):
+    """
+    One post. The aggregate counters (upvotes, downvotes, learned_count,
+    surprised_count, power_count) are properties: once the Store attaches the
+    post they live in the Store's CounterColumns (see counters.py).
+
+    A post loaded from a binary snapshot (or the SQLite backend) starts out
+    with only id, topic and parent_id; the fields in _RECORD_FIELDS are
+    decoded from its stored record the first time any of them is read or
+    written.
+    """
+
+    _FIELDS = (
+        "id", "topic", "text", "timestamp",
+        "expanded_text", "expanded_at",
+        "tags", "author", "parent_id", "lineage", "source",
+    )
+
+    # _frag caches the pre-encoded viewer-independent JSON (see public_bytes);
+    # _stored is (snapshot, index) until the record fields are decoded.
+    __slots__ = tuple(f for f in _FIELDS if f not in _RECORD_FIELDS) + tuple("_" + f for f in _RECORD_FIELDS) + ("_frag", "_stored")
+
+    text = _record_property("text")
+    timestamp = _record_property("timestamp")
+    tags = _record_property("tags")
+    author = _record_property("author")
+    lineage = _record_property("lineage")
+    source = _record_property("source")
+
+    def __init__(
+        self,
+        id: int,
+        topic: str,
+        text: str,
+        timestamp: str,
+        # aggregate counts (global)
+        upvotes: int = 0,
+        downvotes: int = 0,
+        learned_count: int = 0,
+        surprised_count: int = 0,
+        power_count: int = 0,
+        # optional expansion
+        expanded_text: Optional[str] = None,
+        expanded_at: Optional[str] = None,
+        # future-proof metadata
+        tags: Optional[List[str]] = None,
+        author: Optional[Dict[str, Any]] = None,
+        parent_id: Optional[int] = None,
+        lineage: Optional[Dict[str, Any]] = None,
+        source: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self._stored: Optional[Tuple[Any, int]] = None
+        self.id = id
+        self.topic = topic
+        self.text = text
+        self.timestamp = timestamp
+        self._init_counters((upvotes, downvotes, learned_count, surprised_count, power_count))
+        self.expanded_text = expanded_text
+        self.expanded_at = expanded_at
+        self.tags = tags
+        self.author = author
+        self.parent_id = parent_id
+        self.lineage = lineage
+        self.source = source
+        self._frag: Optional[Tuple[bytes, bytes]] = None
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Any, index: int, id: int, topic: str, parent_id: Optional[int]) -> "Post":
+        """Post whose record fields stay in `snapshot` until first access; counters are bound by the caller."""
+        p = cls.__new__(cls)
+        p._stored = (snapshot, index)
+        p.id = id
+        p.topic = topic
+        p.parent_id = parent_id
+        p.expanded_text = p.expanded_at = None
+        p._frag = None
+        return p
+
+    def _hydrate(self) -> None:
+        # Readers share the store lock, so two of them may decode the same post
+        # at once: read _stored once, and clear it only after every slot is set.
+        stored = self._stored
+        if stored is None:
+            return
+        raw = stored[0].record(stored[1])
+        for name in _RECORD_FIELDS:
+            setattr(self, "_" + name, raw.get(name))
+        self._stored = None
+
+    def search_fields(self) -> Tuple[Optional[str], Any]:
+        """(text, tags) for the search index, read from the snapshot without decoding the post."""
+        stored = self._stored
+        if stored is not None:
+            record = stored[0].record(stored[1])
+            return record.get("text"), record.get("tags")
+        return self.text, self.tags
+
+    def record_bytes(self) -> bytes:
+        """The snapshot record of this post (copied as-is if it was never decoded)."""
+        stored = self._stored
+        if stored is not None:
+            return stored[0].record_bytes(stored[1])
+        return json_bytes({name: getattr(self, name) for name in _RECORD_FIELDS if getattr(self, name) is not None})
+
+    def __repr__(self) -> str:
+        return f"Post(id={self.id!r}, topic={self.topic!r}, score={self.score()})"
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Pickle a detached copy; never drag the Store's counter columns along.
+        state = {k: getattr(self, k) for k in self._FIELDS}
+        state["counters"] = self.counter_values()
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._stored = None
+        for k in self._FIELDS:
+            setattr(self, k, state.get(k))
+        self._frag = None
+        self._init_counters(state.get("counters") or [0] * len(COUNTER_FIELDS))
 
     def score(self) -> int:
         return int(self.upvotes) - int(self.downvotes)
 
-    def to_public(self, user_state: Dict[str, Any]) -> Dict[str, Any]:
+    def to_state(self) -> Dict[str, Any]:
+        """Whole post as persisted outside the seed file (the expanded body lives in the expansion cache)."""
+        raw = self.to_public(UserState())
+        raw["expanded_text"] = raw["expanded_at"] = None
+        return raw
+
+    def to_public(self, user_state: UserState) -> Dict[str, Any]:
         """Return a JSON dict with viewer-specific fields merged in."""
         pid = self.id
-        my_vote = int(user_state.get("votes", {}).get(str(pid), 0))
-
-        reactions = user_state.get("reactions", {}).get(str(pid), {})
-        my_learned = bool(reactions.get("learned", False))
-        my_surprised = bool(reactions.get("surprised", False))
-
-        my_powered = bool(user_state.get("power", {}).get(str(pid), False))
+        my_vote = user_state.vote(pid)
+        my_learned = user_state.learned(pid)
+        my_surprised = user_state.surprised(pid)
+        my_powered = user_state.powered(pid)
 
         d: Dict[str, Any] = {
             "schema_version": SCHEMA_VERSION,
@@ -146,25 +409,276 @@ class Post:
 
         return d
 
+    # -------------------------
+    # Fast JSON path
+    # -------------------------
+
+    def invalidate(self) -> None:
+        """Drop the cached JSON fragments; call after any change to this post."""
+        self._frag = None
+
+    def _fragments(self) -> Tuple[bytes, bytes]:
+        frag = self._frag
+        if frag is None:
+            # Encode the anonymous-viewer form once and cut out the viewer fields.
+            # The marker cannot occur inside a JSON string value (its quotes
+            # would be escaped there), so the first match is the real one.
+            raw = json_bytes(self.to_public(_NO_VIEWER))
+            head, sep, tail = raw.partition(_VIEWER_MARKER)
+            if not sep:  # pragma: no cover - to_public changed shape
+                raise RuntimeError("to_public layout changed; update _VIEWER_MARKER")
+            frag = self._frag = (head, tail)
+        return frag
+
+    def public_bytes(self, user_state: UserState) -> bytes:
+        """to_public(user_state) as JSON bytes, splicing the viewer fields into cached fragments."""
+        head, tail = self._fragments()
+        pid = self.id
+        return b"%s,\"my_vote\":%d,\"my_learned\":%s,\"my_surprised\":%s,\"my_powered\":%s,%s" % (
+            head,
+            user_state.vote(pid),
+            _JSON_BOOL[user_state.learned(pid)],
+            _JSON_BOOL[user_state.surprised(pid)],
+            _JSON_BOOL[user_state.powered(pid)],
+            tail,
+        )
+
+    def export_bytes(self, user_state: UserState) -> bytes:
+        """
+        public_bytes() for one-off bulk reads (NDJSON exports): uses cached
+        fragments if there are any but never adds them, and leaves a post
+        backed by a binary snapshot undecoded -- a throwaway copy decodes the
+        record instead -- so exporting the whole corpus does not grow the heap.
+        """
+        if self._frag is not None:
+            return self.public_bytes(user_state)
+        post = self
+        if self._stored is not None:
+            snapshot, index = self._stored
+            post = Post.from_snapshot(snapshot, index, self.id, self.topic, self.parent_id)
+            post.bind_counters(self._cols, self._slot)
+            post.expanded_text, post.expanded_at = self.expanded_text, self.expanded_at
+        return json_bytes(post.to_public(user_state))
+
+
+def json_bytes(data: Any) -> bytes:
+    # Same encoding FastAPI's JSONResponse uses, so both paths emit identical bytes.
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+_NO_VIEWER = UserState()
+_JSON_BOOL = {True: b"true", False: b"false"}
+_VIEWER_MARKER = b',"my_vote":0,"my_learned":false,"my_surprised":false,"my_powered":false,'
+
+
+def posts_json(posts: List[Post], user_state: UserState, next_cursor: Any = ...) -> bytes:
+    """
+    Feed page body, bypassing FastAPI's generic encoder.
+
+    Without next_cursor the body is a bare list; with it (even None) it is the
+    {"posts": [...], "next_cursor": ...} envelope used by cursor paging.
+    """
+    body = b"[" + b",".join(p.public_bytes(user_state) for p in posts) + b"]"
+    if next_cursor is not ...:
+        body = b'{"posts":' + body + b',"next_cursor":' + json_bytes(next_cursor) + b"}"
+    return body
+
+
+def posts_ndjson(posts: List[Post], user_state: UserState) -> bytes:
+    """One JSON object per line (NDJSON), same per-post bytes as posts_json."""
+    return b"".join(p.export_bytes(user_state) + b"\n" for p in posts)
+
+
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+def tagged_response(etag: str, body: Optional[bytes]) -> Response:
+    """JSON `body` with its ETag, or 304 Not Modified when `body` is None."""
+    # no-cache: clients may keep the body but must revalidate it every time.
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "x_user_id"}
+    if body is None:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 
 class Store:
     """
     Stores posts (global) + per-user state.
-    Persists user state (and optionally posts) to STATE_PATH as JSON.
+    Persists through a StorageBackend (state.json by default, see storage.py).
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        backend: Optional[StorageBackend] = None,
+        persist_mode: Optional[str] = None,
+        expansions_path: Optional[Path] = None,
+    ) -> None:
         self.posts: Dict[int, Post] = {}
         self.next_id: int = 1
 
-        # user_id -> state
-        # state: { votes: {post_id_str:int}, reactions:{post_id_str:{learned:bool,surprised:bool}}, power:{post_id_str:bool} }
-        self.user_state: Dict[str, Dict[str, Any]] = {}
+        # Newest-first ordering, global and per topic; kept in sync by _add_post.
+        self.recency = RecencyIndex()
+        self.sampler = MixedSampler(self.recency)
+        # Aggregate counters of every post, in contiguous per-field arrays.
+        self.counters = CounterColumns()
+        self.ranker = RankingEngine(self.counters)
+        # Spawn forest: children, true depth, subtree sizes and counter sums.
+        # Posts whose counters changed are re-read once per write section.
+        self.lineage = LineageIndex(lambda pid: self.posts[pid].counter_values())
+        self._lineage_touched: Set[int] = set()
+        # Tokens, tags and topics -> posting lists of counter slots (see search.py).
+        # Posts present at startup are indexed by build_search_index(), on a
+        # thread, under _search_lock; until then _search_backlog is None and
+        # _add_post leaves indexing to it.
+        self.search = SearchIndex()
+        self._search_lock = threading.Lock()
+        self._search_ready = threading.Event()
+        self._search_backlog: Optional[int] = None
+        # Epoch seconds for spawn timestamps and ranking ages (see set_clock).
+        self.clock: Callable[[], float] = time.time
+
+        # Parentless posts added by import_posts(): not in the seed file, so
+        # the JSON backend persists them whole (imports with a parent go out
+        # as spawned posts). The binary and SQLite backends store the ids
+        # too, so converting back keeps them.
+        self._imported: Set[int] = set()
+
+        # user_id -> packed per-post interaction flags (see userstate.py);
+        # persisted in the historical { votes, reactions, power } JSON shape.
+        self.user_state: Dict[str, UserState] = {}
 
         # power threshold can be per-post later; keep global for now
         self.power_threshold: int = POWER_THRESHOLD_DEFAULT
 
+        self.persist_mode: str = persist_mode or PERSIST_MODE
+        self.backend: StorageBackend = backend or make_backend(self.persist_mode)
+        if self.persist_mode == "journal" and not isinstance(self.backend, JsonBackend):
+            # Only the JSON backend keeps a journal (SQLite's WAL already is one): persist per mutation.
+            self.persist_mode = "sync"
+
+        # Concurrency: reads (feed pages, single posts) share _lock, mutations
+        # hold it exclusively. Checkpoints only read the store, so they take the
+        # read side plus _flush_lock (one checkpoint at a time); the backend's
+        # slow I/O (e.g. writing state.json) runs after both are released.
+        self._lock = RWLock()
+        self._flush_lock = threading.Lock()
+        self._dirty: int = 0
+        self._flush_wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+        self._replaying = False
+
+        # Post ids changed / spawned, for the live-delta publishers (see live.py).
+        self.changes = ChangeLog()
+        # Per-post / per-topic / per-user versions behind the feed ETags (see versions.py).
+        self.versions = VersionClock()
+        # Finished feed pages, dropped alongside those version bumps.
+        self.feed_cache = FeedCache(int(FEED_CACHE_MB * 1024 * 1024), FEED_CACHE_TTL_S)
+
+        # Expanded bodies: generated off the request path, kept in a bounded LRU
+        # persisted apart from state.json; Post.expanded_text mirrors the cache.
+        self.expander = Expander(load_expander(EXPANDER), EXPANSION_WORKERS, EXPANSION_TIMEOUT_S)
+        self.expansions = ExpansionCache(expansions_path or EXPANSIONS_PATH, EXPANSION_CACHE_SIZE)
+        self._expansion_errors: Dict[int, str] = {}
+
+    def set_clock(self, clock: Callable[[], float]) -> None:
+        """Replace the wall clock, e.g. with the virtual clock of a simulation run."""
+        self.clock = clock
+        self.ranker.clock = clock
+
+    def reading(self) -> Any:
+        """Shared lock: everything read inside sees one consistent state."""
+        return self._lock.read()
+
+    @contextmanager
+    def writing(self) -> Iterator[None]:
+        """
+        Exclusive lock for one mutation.
+
+        In sync mode the flush runs after the lock is released, so readers never
+        wait on disk; the caller still only returns once the change is persisted.
+        """
+        self._lock.acquire_write()
+        try:
+            yield
+        finally:
+            if self._lineage_touched:
+                self._refresh_lineage()
+            released = self._lock.release_write()
+        if released and self.persist_mode == "sync" and self._dirty:
+            self.flush()
+
     def load(self) -> None:
+        replayed = self.backend.load(self)
+        self.next_id = max(self.next_id, max(self.posts.keys(), default=0) + 1)
+        # Overrides and replayed records changed counters without a write section.
+        self.lineage.recount()
+        self._lineage_touched.clear()
+        if replayed:
+            self._dirty = replayed
+            if self.persist_mode != "journal":
+                # Fold a leftover journal into a snapshot so switching modes never loses it.
+                self.flush(force=True)
+        self._adopt_expansions()
+        self.start_flusher()
+        self.build_search_index()
+
+    def build_search_index(self, background: bool = True) -> None:
+        """
+        Index every post present now for /search -- on a thread unless
+        `background` is False -- and every post added from now on as it
+        arrives. Searches raise SearchNotReady until the first part is done.
+        """
+        if self._search_backlog is not None:
+            return
+        with self._search_lock:
+            self._search_backlog = len(self.counters)
+        if not background:
+            self._index_backlog()
+            return
+        threading.Thread(target=self._index_backlog, name="search-indexer", daemon=True).start()
+
+    def wait_search_index(self, timeout: Optional[float] = None) -> bool:
+        """Block until build_search_index() has caught up; False on timeout."""
+        return self._search_ready.wait(timeout)
+
+    def _index_backlog(self, chunk: int = 5000) -> None:
+        # Runs outside the store lock: it only reads what never changes after a
+        # post is added (slot, topic, text, tags) plus expanded_text, which
+        # _finish_expansion sets before handing the body to the index itself.
+        ids, n = self.counters.post_ids, self._search_backlog or 0
+        try:
+            for start in range(0, n, chunk):
+                if self._closed:
+                    return
+                with self._search_lock:
+                    for slot in range(start, min(n, start + chunk)):
+                        p = self.posts[ids[slot]]
+                        text, tags = p.search_fields()
+                        self.search.add(slot, p.topic, text, tags)
+                        if p.expanded_text:
+                            self.search.add_expansion(slot, p.expanded_text)
+        except Exception as exc:
+            print(f"[search] indexing failed: {exc}")
+            return
+        self._search_ready.set()
+
+    def _adopt_expansions(self) -> None:
+        """Point posts at the expansion cache, importing bodies older versions kept in state.json."""
+        self.expansions.load()
+        if not len(self.expansions):
+            legacy = sorted((p for p in self.posts.values() if p.expanded_text), key=lambda p: p.expanded_at or "")
+            for p in legacy:
+                self.expansions.put(p.id, p.expanded_text, p.expanded_at)
+        for p in self.posts.values():
+            p.expanded_text = p.expanded_at = None
+        for pid, (text, expanded_at) in self.expansions.items():
+            p = self.posts.get(pid)
+            if p is not None:
+                p.expanded_text, p.expanded_at = text, expanded_at
+
+    def load_seed(self) -> None:
         # Load seed posts
         seed = read_json(SEED_PATH, default=None)
         if isinstance(seed, list) and seed:
@@ -172,42 +686,181 @@ class Store:
         else:
             self._generate_seed_posts()
 
-        # Load persisted state (per-user) and (optionally) post overrides
-        state = read_json(STATE_PATH, default={})
-        if isinstance(state, dict):
-            us = state.get("user_state", {})
-            if isinstance(us, dict):
-                self.user_state = us
-            # Optional: allow persisting posts too (but not required)
-            # We only apply counters if present.
-            posts_over = state.get("posts_overrides", {})
-            if isinstance(posts_over, dict):
-                self._apply_post_overrides(posts_over)
-
-        self.next_id = max(self.posts.keys(), default=0) + 1
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Apply persisted per-user state and (optionally) post overrides in the state.json shape."""
+        us = state.get("user_state", {})
+        if isinstance(us, dict):
+            self.user_state = {str(uid): UserState.from_json(raw) for uid, raw in us.items()}
+        # Optional: allow persisting posts too (but not required)
+        # We only apply counters if present.
+        posts_over = state.get("posts_overrides", {})
+        if isinstance(posts_over, dict):
+            self._apply_post_overrides(posts_over)
+        self._load_imported(state.get("imported_posts", []))
+        spawned = state.get("spawned_posts", [])
+        if isinstance(spawned, list):
+            self._load_posts_from_seed([raw for raw in spawned if isinstance(raw, dict) and raw.get("id") not in self.posts])
 
     def save(self) -> None:
+        """Persist everything now, regardless of persistence mode."""
+        self._dirty = max(1, self._dirty)
+        self.flush(force=True)
+
+    def snapshot_state(self) -> Dict[str, Any]:
         # Persist user state and lightweight per-post counters so votes survive too.
+        # Counters are read column-wise rather than through each Post's properties.
         posts_overrides: Dict[str, Any] = {}
-        for pid, p in self.posts.items():
-            posts_overrides[str(pid)] = {
-                "upvotes": p.upvotes,
-                "downvotes": p.downvotes,
-                "learned_count": p.learned_count,
-                "surprised_count": p.surprised_count,
-                "power_count": p.power_count,
-                "expanded_text": p.expanded_text,
-                "expanded_at": p.expanded_at,
+        cols = self.counters
+        for pid, *values in zip(cols.post_ids, *cols.columns):
+            p = self.posts[pid]
+            o = dict(zip(COUNTER_FIELDS, values))
+            o.update({
                 "parent_id": p.parent_id,
                 "lineage": p.lineage,
-            }
+            })
+            posts_overrides[str(pid)] = o
+
+        # Spawned children and imported posts are not in the seed file, so
+        # persist them whole (minus expanded bodies, which live in the
+        # expansion cache). An imported post with a parent counts as spawned.
+        spawned_posts = []
+        imported_posts = []
+        for p in self.posts.values():
+            if p.parent_id is not None or p.id in self._imported:
+                (spawned_posts if p.parent_id is not None else imported_posts).append(p.to_state())
 
-        data = {
-            "user_state": self.user_state,
+        return {
+            # list(): readers may register new users while a checkpoint runs.
+            "user_state": {uid: st.to_json() for uid, st in list(self.user_state.items())},
             "posts_overrides": posts_overrides,
+            "spawned_posts": spawned_posts,
+            "imported_posts": imported_posts,
             "meta": {"saved_at": now_iso()},
         }
-        write_json(STATE_PATH, data)
+
+    # -------------------------
+    # Write-behind persistence
+    # -------------------------
+
+    def _record(self, op: str, **fields: Any) -> None:
+        """Hand one interaction record to the backend (journal line / table row)."""
+        if self._replaying:
+            return
+        rec: Dict[str, Any] = {"op": op}
+        rec.update(fields)
+        self.backend.record(self, rec)
+
+    def _flush_batch(self) -> int:
+        return JOURNAL_COMPACT_EVERY if self.persist_mode == "journal" else FLUSH_BATCH_SIZE
+
+    def _mark_dirty(self) -> None:
+        """Called after every mutation; decides when the change reaches disk."""
+        if self._replaying:
+            return
+        self._dirty += 1
+        if self.persist_mode == "sync":
+            if not self._lock.held_for_write():
+                self.flush()  # otherwise writing() flushes once the lock is released
+        elif self._dirty >= self._flush_batch():
+            self._flush_wake.set()
+
+    def start_flusher(self) -> None:
+        if self.persist_mode == "sync" or self._flusher is not None:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="store-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._flush_wake.wait(timeout=FLUSH_INTERVAL_S)
+            self._flush_wake.clear()
+            if self._closed:
+                break
+            try:
+                self.flush()
+            except Exception as exc:  # keep flushing; next round retries the same dirty state
+                print(f"[store] flush failed: {exc}")
+
+    def flush(self, force: bool = False) -> None:
+        """
+        Checkpoint the backend if anything changed since the last checkpoint.
+
+        In journal mode records are already durable, so a checkpoint (compaction)
+        only happens once JOURNAL_COMPACT_EVERY records have piled up, or on force.
+        """
+        with self._flush_lock, self._lock.read():
+            if not self._dirty:
+                return
+            if self.persist_mode == "journal" and not force and self._dirty < JOURNAL_COMPACT_EVERY:
+                return
+            self._dirty = 0
+            write = self.backend.checkpoint(self)
+        if write is not None:
+            write()
+
+    def close(self) -> None:
+        """Stop the flusher and force a final flush (safe to call more than once)."""
+        if self._closed:
+            return
+        self._closed = True
+        self.expander.close()
+        self._flush_wake.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=FLUSH_INTERVAL_S + 5.0)
+        self.flush(force=True)
+        self.backend.close()
+        self.expansions.close()
+
+    # -------------------------
+    # Interaction records
+    # -------------------------
+
+    def apply_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Replay persisted interaction records without re-persisting them. Returns records applied."""
+        applied = 0
+        self._replaying = True
+        try:
+            for rec in records:
+                try:
+                    self.apply_record(rec)
+                except Exception:
+                    continue
+                applied += 1
+        finally:
+            self._replaying = False
+        return applied
+
+    def apply_record(self, rec: Dict[str, Any]) -> None:
+        """Re-apply one journal record through the same state transitions as the live methods."""
+        op = rec.get("op")
+        if op == "import":
+            self._load_imported(rec.get("posts", []))
+            return
+        p = self.posts.get(int(rec.get("parent" if op == "spawn" else "p", 0)))
+        if p is None:
+            return
+        if op == "vote":
+            self._apply_vote(str(rec["u"]), p, clamp_int(rec.get("v", 0), -1, 1, 0))
+        elif op == "react":
+            if rec.get("k") in ("learned", "surprised"):
+                self._apply_react(str(rec["u"]), p, rec["k"], bool(rec.get("v")))
+        elif op == "power":
+            self._apply_power(str(rec["u"]), p, bool(rec.get("v")))
+        elif op == "expand":  # journals written before expansions had their own log
+            self._apply_expand(p, rec.get("text"), rec.get("at"))
+        elif op == "spawn":
+            if int(rec["p"]) not in self.posts:
+                self._spawn_child_post(parent=p, pid=int(rec["p"]), timestamp=rec.get("ts"))
+
+    def _load_imported(self, rows: Any) -> None:
+        """Re-add bulk-imported posts (to_state() dicts) that are not loaded yet."""
+        if not isinstance(rows, list):
+            return
+        rows = [raw for raw in rows if isinstance(raw, dict) and raw.get("id") not in self.posts]
+        self._load_posts_from_seed(rows)
+        added = (self.posts.get(raw.get("id")) for raw in rows)
+        self._imported.update(p.id for p in added if p is not None and p.parent_id is None)
 
     def _load_posts_from_seed(self, seed_posts: List[Dict[str, Any]]) -> None:
         for raw in seed_posts:
@@ -239,7 +892,103 @@ class Store:
                 lineage=raw.get("lineage", None),
                 source=raw.get("source", {"kind": "dummy", "model": None}),
             )
+            self._add_post(p)
+
+    def load_snapshot(self, snapshot: Any) -> None:
+        """
+        Bulk-load posts and user state from a binary snapshot (snapshot.py).
+        Counter and index columns are copied whole; post text and metadata are
+        left in the snapshot until first read (see Post.from_snapshot).
+        """
+        ids = snapshot.column("id")
+        names = snapshot.topics
+        topics = [names[t] for t in snapshot.column("topic")]
+        first = self.counters.extend(ids, [snapshot.column(f) for f in COUNTER_FIELDS])
+        posts = self.posts
+        for i, (pid, topic, parent) in enumerate(zip(ids, topics, snapshot.column("parent"))):
+            p = Post.from_snapshot(snapshot, i, pid, topic, parent or None)
+            p.bind_counters(self.counters, first + i)
+            posts[pid] = p
+        ts = snapshot.column("ts")
+        self.recency.extend(zip(ids, topics, ts))
+        self.ranker.extend(first, ts, snapshot.column("depth"), topics)
+        changed: List[Tuple[int, int]] = []
+        for pid, topic, parent in zip(ids, topics, snapshot.column("parent")):
+            if parent:
+                parent_post = posts.get(parent)
+                changed += self.lineage.add(pid, parent, topic, parent_post.topic if parent_post is not None else None)
+        self._sync_depths(changed)
+        for uid, flags in snapshot.users():
+            self.ensure_user(uid).flags.update(flags)
+        self._imported.update(snapshot.imported())
+        self.next_id = max(self.next_id, snapshot.next_id)
+
+    def _add_post(self, p: Post) -> None:
+        """Single entry point for new posts so every index sees them."""
+        self.posts[p.id] = p
+        p.attach_counters(self.counters, p.id)
+        key = ts_key(p.timestamp)
+        self.recency.add(p.id, p.topic, key)
+        changed = self.lineage.adopt(p.id, p.topic)
+        if p.parent_id is not None:
+            parent = self.posts.get(p.parent_id)
+            changed += self.lineage.add(p.id, p.parent_id, p.topic, parent.topic if parent is not None else None)
+        self.ranker.add(p.slot, p.topic, key, self.lineage.depth(p.id))
+        self.versions.post_changed(p.id)
+        if self.feed_cache:
+            self.feed_cache.posts_added({p.topic: [self.recency.key_of(p.id)]})
+        self._sync_depths(changed)
+        if self._search_backlog is not None:
+            with self._search_lock:
+                self.search.add(p.slot, p.topic, p.text, p.tags)
+
+    def _add_posts(self, posts: List[Post]) -> None:
+        """_add_post() for a batch of new posts: one bulk append (and sort) per index."""
+        if not posts:
+            return
+        ids = array("q", (p.id for p in posts))
+        rows = [p.counter_values() for p in posts]
+        first = self.counters.extend(ids, [array("q", col) for col in zip(*rows)])
+        for slot, p in enumerate(posts, first):
+            p.bind_counters(self.counters, slot)
             self.posts[p.id] = p
+        keys = array("q", (ts_key(p.timestamp) for p in posts))
+        topics = [p.topic for p in posts]
+        self.recency.extend(zip(ids, topics, keys))
+        self.ranker.extend(first, keys, array("q", bytes(8 * len(posts))), topics)
+        changed: List[Tuple[int, int]] = []
+        for p in posts:
+            self.versions.post_changed(p.id)
+            changed += self.lineage.adopt(p.id, p.topic)
+            if p.parent_id is not None:
+                changed += self.lineage.add(p.id, p.parent_id, p.topic, self.posts[p.parent_id].topic)
+        self._sync_depths(changed)
+        if self.feed_cache:
+            added: Dict[str, List[RecencyKey]] = {}
+            for p in posts:
+                added.setdefault(p.topic, []).append(self.recency.key_of(p.id))
+            self.feed_cache.posts_added(added)
+        if self._search_backlog is not None:
+            with self._search_lock:
+                for p in posts:
+                    self.search.add(p.slot, p.topic, p.text, p.tags)
+
+    def _sync_depths(self, changed: List[Tuple[int, int]]) -> None:
+        """Write depths (re)computed by the lineage index back to the posts and the ranker."""
+        for pid, depth in changed:
+            p = self.posts[pid]
+            self.ranker.depth[p.slot] = depth
+            lineage = p.lineage or {}
+            root = self.lineage.root(pid)
+            if lineage.get("depth") != depth or lineage.get("root_id") != root:
+                # Older versions stored depth 1 for every spawned post.
+                p.lineage = dict(lineage, root_id=root, depth=depth)
+                self._invalidate(p)
+
+    def _refresh_lineage(self) -> None:
+        for pid in self._lineage_touched:
+            self.lineage.touched(pid)
+        self._lineage_touched.clear()
 
     def _apply_post_overrides(self, overrides: Dict[str, Any]) -> None:
         for pid_str, o in overrides.items():
@@ -265,6 +1014,7 @@ class Store:
                     p.parent_id = o.get("parent_id")
                 if "lineage" in o:
                     p.lineage = o.get("lineage")
+                p.invalidate()
 
     def _generate_seed_posts(self, n_per_topic: int = 20) -> None:
         # Small deterministic-ish set; enough to test paging and filters.
@@ -292,12 +1042,12 @@ class Store:
                     source={"kind": "dummy", "model": None},
                     author={"id": f"agent_{topic}", "display_name": f"@/{topic}"},
                 )
-                self.posts[pid] = p
+                self._add_post(p)
                 pid += 1
 
         self.next_id = pid
         # Write out a seed file so contributors can edit content easily.
-        seed_dump = [self.posts[k].to_public(user_state={"votes": {}, "reactions": {}, "power": {}}) for k in sorted(self.posts)]
+        seed_dump = [self.posts[k].to_public(UserState()) for k in sorted(self.posts)]
         write_json(SEED_PATH, seed_dump)
 
     @staticmethod
@@ -327,52 +1077,89 @@ class Store:
         ])
         return base[idx % len(base)]
 
-    def ensure_user(self, user_id: str) -> Dict[str, Any]:
-        if user_id not in self.user_state:
-            self.user_state[user_id] = {"votes": {}, "reactions": {}, "power": {}}
-        # Ensure keys exist
-        st = self.user_state[user_id]
-        st.setdefault("votes", {})
-        st.setdefault("reactions", {})
-        st.setdefault("power", {})
+    def ensure_user(self, user_id: str) -> UserState:
+        st = self.user_state.get(user_id)
+        if st is None:
+            # setdefault is atomic, so concurrent readers agree on one instance.
+            st = self.user_state.setdefault(user_id, UserState())
         return st
 
-    def list_posts(self, topic: Optional[str], limit: int, offset: int) -> List[Post]:
-        posts = list(self.posts.values())
-        # Most recent first (timestamp string is ISO; lexicographically sortable if consistent)
-        posts.sort(key=lambda p: p.timestamp, reverse=True)
-
-        if topic:
-            posts = [p for p in posts if p.topic == topic]
-
-        return posts[offset: offset + limit]
-
-    def mixed_posts(self, count: int) -> List[Post]:
-        posts = list(self.posts.values())
-        posts.sort(key=lambda p: p.timestamp, reverse=True)
+    def list_posts(self, topic: Optional[str], limit: int, offset: int = 0, after: Optional[RecencyKey] = None) -> List[Post]:
+        # Most recent first, straight from the recency index (no per-request sort).
+        # `after` (a keyset cursor) takes precedence over `offset`.
+        with self.reading():
+            if after is not None:
+                ids = self.recency.page_after(topic, after, limit)
+            else:
+                ids = self.recency.page(topic, limit, offset)
+            return [self.posts[pid] for pid in ids]
+
+    def mixed_posts(
+        self,
+        count: int,
+        after: Optional[Dict[str, RecencyKey]] = None,
+        seed: Any = None,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> List[Post]:
         # Take a mix by topic rather than purely newest to keep it interesting.
-        by_topic: Dict[str, List[Post]] = {}
-        for p in posts:
-            by_topic.setdefault(p.topic, []).append(p)
-
-        out: List[Post] = []
-        topics = list(by_topic.keys())
-        random.shuffle(topics)
-        # Round-robin pull
-        while len(out) < count and topics:
-            progressed = False
-            for t in list(topics):
-                if len(out) >= count:
-                    break
-                lst = by_topic.get(t, [])
-                if lst:
-                    out.append(lst.pop(0))
-                    progressed = True
-                else:
-                    topics.remove(t)
-            if not progressed:
-                break
-        return out[:count]
+        # `after` maps topic -> last key already served, for cursor paging;
+        # `seed` makes the mix reproducible, `weights` biases topic shares.
+        with self.reading():
+            ids = self.sampler.sample(count, seed=seed, weights=weights, after=after)
+            return [self.posts[pid] for pid in ids]
+
+    def ranked_posts(self, policy: str, limit: int, offset: int = 0, topic: Optional[str] = None) -> List[Post]:
+        """Top posts under a ranking policy (see ranking.py); raises KeyError for unknown policies."""
+        if policy not in POLICIES:
+            raise KeyError(policy)
+        with self.reading():
+            ids = self.ranker.top(policy, limit, offset, topic)
+            return [self.posts[pid] for pid in ids]
+
+    def search_posts(
+        self,
+        query: str,
+        tags: List[str],
+        topic: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+        sort: str = "relevance",
+    ) -> Tuple[int, List[Post]]:
+        """
+        (total matches, page of posts) for a conjunctive query over text, tags
+        and topic; `sort` is "relevance" (BM25) or a ranking policy name.
+        Raises KeyError for unknown sorts and SearchNotReady while the posts
+        present at startup are still being indexed.
+        """
+        if sort != "relevance" and sort not in POLICIES:
+            raise KeyError(sort)
+        if not self._search_ready.is_set():
+            raise SearchNotReady(f"search index is still being built ({len(self.search)} of {self._search_backlog} posts)")
+        rank = None if sort == "relevance" else (lambda candidates, k: self.ranker.top_slots(sort, k, candidates))
+        with self.reading():
+            total, slots = self.search.search(query, tags, topic, limit, offset, rank=rank)
+            ids = self.counters.post_ids
+            return total, [self.posts[ids[s]] for s in slots]
+
+    def ancestry(self, post_id: int) -> List[Post]:
+        """The posts `post_id` descends from, root first; raises KeyError for unknown posts."""
+        with self.reading():
+            self.get_post(post_id)
+            return [self.posts[pid] for pid in reversed(self.lineage.ancestors(post_id))]
+
+    def descendants(self, post_id: int, max_depth: Optional[int] = None, limit: Optional[int] = None) -> List[Tuple[Post, int]]:
+        """(post, parent id) below `post_id`, breadth first; raises KeyError for unknown posts."""
+        with self.reading():
+            self.get_post(post_id)
+            return [(self.posts[pid], parent) for pid, parent in self.lineage.descendants(post_id, max_depth, limit)]
+
+    def deepest_posts(self, topic: Optional[str] = None, limit: int = 10) -> List[Post]:
+        """Spawned posts with the longest ancestry, optionally in one topic."""
+        with self.reading():
+            return [self.posts[pid] for pid in self.lineage.deepest(topic, limit)]
+
+    def recency_key(self, post: Post) -> RecencyKey:
+        return self.recency.key_of(post.id)
 
     def get_post(self, post_id: int) -> Post:
         p = self.posts.get(post_id)
@@ -385,12 +1172,18 @@ class Store:
         value in {-1,0,1}
         Returns: (new_score, my_vote)
         """
-        if post_id not in self.posts:
-            raise KeyError(post_id)
-        p = self.posts[post_id]
+        with self.writing():
+            if post_id not in self.posts:
+                raise KeyError(post_id)
+            p = self.posts[post_id]
+            new = self._apply_vote(user_id, p, value)
+            self._record("vote", u=user_id, p=post_id, v=new)
+            self._mark_dirty()
+            return (p.score(), new)
+
+    def _apply_vote(self, user_id: str, p: Post, value: int) -> int:
         st = self.ensure_user(user_id)
-        votes = st["votes"]
-        old = int(votes.get(str(post_id), 0))
+        old = st.vote(p.id)
         new = int(value)
 
         # Remove old effect
@@ -405,133 +1198,658 @@ class Store:
         elif new == -1:
             p.downvotes += 1
 
-        votes[str(post_id)] = new
-        self.save()
-        return (p.score(), new)
+        st.set_vote(p.id, new)
+        self._user_changed(user_id)
+        self._touch(p)
+        return new
 
     def toggle_react(self, user_id: str, post_id: int, learned: Optional[bool], surprised: Optional[bool]) -> Dict[str, Any]:
-        if post_id not in self.posts:
-            raise KeyError(post_id)
-        p = self.posts[post_id]
-        st = self.ensure_user(user_id)
-        reacts = st["reactions"].setdefault(str(post_id), {"learned": False, "surprised": False})
-
-        if learned is not None:
-            old = bool(reacts.get("learned", False))
-            new = bool(learned)
-            if old != new:
-                reacts["learned"] = new
-                p.learned_count += (1 if new else -1)
-                p.learned_count = max(0, p.learned_count)
-
-        if surprised is not None:
-            old = bool(reacts.get("surprised", False))
-            new = bool(surprised)
-            if old != new:
-                reacts["surprised"] = new
-                p.surprised_count += (1 if new else -1)
-                p.surprised_count = max(0, p.surprised_count)
-
-        self.save()
+        with self.writing():
+            if post_id not in self.posts:
+                raise KeyError(post_id)
+            p = self.posts[post_id]
+            st = self.ensure_user(user_id)
 
-        return {
-            "id": post_id,
-            "power_count": p.power_count,
-            "learned_count": p.learned_count,
-            "surprised_count": p.surprised_count,
-            "my_powered": bool(st["power"].get(str(post_id), False)),
-            "my_learned": bool(reacts.get("learned", False)),
-            "my_surprised": bool(reacts.get("surprised", False)),
-        }
+            if learned is not None and self._apply_react(user_id, p, "learned", learned):
+                self._record("react", u=user_id, p=post_id, k="learned", v=bool(learned))
+            if surprised is not None and self._apply_react(user_id, p, "surprised", surprised):
+                self._record("react", u=user_id, p=post_id, k="surprised", v=bool(surprised))
 
-    def expand_post(self, post_id: int) -> Post:
-        if post_id not in self.posts:
-            raise KeyError(post_id)
-        p = self.posts[post_id]
-        if p.expanded_text:
-            return p
-
-        # Simple deterministic expansion; no OpenAI dependency.
-        # You can replace this later with a “templated” or markov-ish expander if desired.
-        p.expanded_text = (
-            f"{p.text}\n\n"
-            f"— Expanded context —\n"
-            f"This is dummy expanded text for post #{p.id} in topic '{p.topic}'.\n"
-            f"It exists to exercise your modal UI, scrolling, and reaction/vote syncing.\n\n"
-            f"Potential directions:\n"
-            f"- Add tags for multi-axis organization beyond topic.\n"
-            f"- Track parent/child lineage for 'power spawn' and visible legacy.\n"
-            f"- Store per-user state keyed by X-User-Id.\n"
-        )
-        p.expanded_at = now_iso()
-        self.save()
-        return p
+            self._mark_dirty()
 
-    def set_power(self, user_id: str, post_id: int, enabled: bool) -> Dict[str, Any]:
-        if post_id not in self.posts:
-            raise KeyError(post_id)
-        p = self.posts[post_id]
+            return {
+                "id": post_id,
+                "power_count": p.power_count,
+                "learned_count": p.learned_count,
+                "surprised_count": p.surprised_count,
+                "my_powered": st.powered(post_id),
+                "my_learned": st.learned(post_id),
+                "my_surprised": st.surprised(post_id),
+            }
+
+    def _apply_react(self, user_id: str, p: Post, kind: str, value: bool) -> bool:
+        """Set one reaction flag; returns True if it changed."""
         st = self.ensure_user(user_id)
-        power_map = st["power"]
-        old = bool(power_map.get(str(post_id), False))
-        new = bool(enabled)
+        old = st.learned(p.id) if kind == "learned" else st.surprised(p.id)
+        new = bool(value)
+        if old == new:
+            return False
+        st.set_reaction(p.id, kind, new)
+        self._user_changed(user_id)
+        self._touch(p)
+        attr = f"{kind}_count"
+        setattr(p, attr, max(0, getattr(p, attr) + (1 if new else -1)))
+        return True
+
+    def request_expansion(self, post_id: int) -> "Optional[Future[str]]":
+        """
+        Make sure `post_id` is expanded or being expanded. Returns None if the
+        body is already there, else the Future of the (possibly shared) run.
+        """
+        fut = self.expander.current(post_id)
+        if fut is not None:
+            return fut
+        with self.reading():
+            p = self.get_post(post_id)
+            ready = bool(p.expanded_text)
+            post = {"id": p.id, "topic": p.topic, "text": p.text, "parent_id": p.parent_id}
+        if ready:
+            self.expansions.get(post_id)  # keep it recently used
+            return None
+        return self.expander.submit(post, self._finish_expansion)
 
-        if old != new:
-            power_map[str(post_id)] = new
-            p.power_count += (1 if new else -1)
-            p.power_count = max(0, p.power_count)
+    def expand_post(self, post_id: int, wait: bool = True) -> Optional[Post]:
+        """
+        Expanded post, generating the body if needed. With wait=False returns
+        None instead of blocking while the expansion runs. Raises KeyError for
+        unknown posts and ExpansionError when the generator fails.
+        """
+        fut = self.request_expansion(post_id)
+        if fut is not None:
+            if not wait:
+                return None
+            fut.result()
+        return self.get_post(post_id)
+
+    def _finish_expansion(self, post_id: int, text: Optional[str], error: Optional[BaseException]) -> None:
+        """Expander callback: cache and publish a new body (or remember why there is none)."""
+        if error is not None or text is None:
+            self._expansion_errors.pop(post_id, None)
+            self._expansion_errors[post_id] = str(error)
+            if len(self._expansion_errors) > EXPANSION_ERRORS_MAX:
+                self._expansion_errors.pop(next(iter(self._expansion_errors)))
+            return
+        expanded_at = now_iso()
+        evicted = self.expansions.put(post_id, text, expanded_at)
+        with self.writing():
+            p = self.posts.get(post_id)
+            if p is not None:
+                self._apply_expand(p, text, expanded_at)
+                with self._search_lock:
+                    self.search.add_expansion(p.slot, text)
+            for pid in evicted:
+                old = self.posts.get(pid)
+                if old is not None:
+                    old.expanded_text = old.expanded_at = None
+                    self._invalidate(old)
+        self._expansion_errors.pop(post_id, None)
+        self.changes.expanded(post_id)
+        EXPANSIONS.inc()
+
+    def _apply_expand(self, p: Post, text: Optional[str], expanded_at: Optional[str]) -> None:
+        p.expanded_text = text
+        p.expanded_at = expanded_at
+        self._touch(p)
 
-        triggered = False
-        new_post_id = -1
+    def set_power(self, user_id: str, post_id: int, enabled: bool) -> Dict[str, Any]:
+        with self.writing():
+            if post_id not in self.posts:
+                raise KeyError(post_id)
+            p = self.posts[post_id]
+            st = self.ensure_user(user_id)
 
-        # Spawn a child post when threshold reached (global count), just to exercise your UI path.
-        if p.power_count >= self.power_threshold and p.power_count > 0:
-            # only spawn once per reaching threshold for this post; we track it via lineage marker
-            if not (p.lineage or {}).get("spawned_at_threshold", False):
-                triggered = True
-                new_post_id = self._spawn_child_post(parent=p)
-                # Mark parent so we don't keep spawning infinitely.
-                p.lineage = p.lineage or {}
-                p.lineage["spawned_at_threshold"] = True
+            if self._apply_power(user_id, p, enabled):
+                self._record("power", u=user_id, p=post_id, v=bool(enabled))
 
-        self.save()
+            triggered = False
+            new_post_id = -1
 
-        return {
-            "id": post_id,
-            "power_count": p.power_count,
-            "my_powered": bool(st["power"].get(str(post_id), False)),
-            "power_threshold": self.power_threshold,
-            "power_triggered": triggered,
-            "new_post_id": new_post_id,
-        }
+            # Spawn a child post when threshold reached (global count), just to exercise your UI path.
+            if p.power_count >= self.power_threshold and p.power_count > 0:
+                # only spawn once per reaching threshold for this post; we track it via lineage marker
+                if not (p.lineage or {}).get("spawned_at_threshold", False):
+                    triggered = True
+                    new_post_id = self._spawn_child_post(parent=p)
 
-    def _spawn_child_post(self, parent: Post) -> int:
-        pid = self.next_id
-        self.next_id += 1
+            self._mark_dirty()
+
+            return {
+                "id": post_id,
+                "power_count": p.power_count,
+                "my_powered": st.powered(post_id),
+                "power_threshold": self.power_threshold,
+                "power_triggered": triggered,
+                "new_post_id": new_post_id,
+            }
+
+    def _apply_power(self, user_id: str, p: Post, enabled: bool) -> bool:
+        """Set the user's power flag; returns True if it changed."""
+        st = self.ensure_user(user_id)
+        old = st.powered(p.id)
+        new = bool(enabled)
+        if old == new:
+            return False
+        st.set_power(p.id, new)
+        self._user_changed(user_id)
+        self._touch(p)
+        p.power_count = max(0, p.power_count + (1 if new else -1))
+        return True
+
+    def _spawn_child_post(self, parent: Post, pid: Optional[int] = None, timestamp: Optional[str] = None) -> int:
+        # pid/timestamp are only passed when replaying a journaled spawn.
+        if pid is None:
+            pid = self.next_id
+        self.next_id = max(self.next_id, pid + 1)
 
         child = Post(
             id=pid,
             topic=parent.topic,
             text=f"(Spawned) A powered follow-up to post #{parent.id}: build on the strongest thread and iterate.",
-            timestamp=now_iso(),
+            timestamp=timestamp or now_iso(self.clock()),
             upvotes=0,
             downvotes=0,
             learned_count=0,
             surprised_count=0,
             power_count=0,
             parent_id=parent.id,
-            lineage={"root_id": parent.lineage.get("root_id", parent.id) if parent.lineage else parent.id, "depth": 1},
+            lineage={"root_id": self.lineage.root(parent.id), "depth": self.lineage.depth(parent.id) + 1},
             source={"kind": "dummy", "model": None},
             author={"id": "system_spawn", "display_name": "@/spawn"},
         )
-        self.posts[child.id] = child
+        self._add_post(child)
+        if not self._replaying:
+            self.changes.spawned(child.id)
+            SPAWNS.inc()
+        # Mark parent so we don't keep spawning infinitely.
+        parent.lineage = parent.lineage or {}
+        parent.lineage["spawned_at_threshold"] = True
+        self._invalidate(parent)
+        self._record("spawn", p=child.id, parent=parent.id, ts=child.timestamp)
         return child.id
 
+    # -------------------------
+    # Route-facing API
+    # -------------------------
+    # Routes only call the methods below, which return JSON bytes or small
+    # plain values. In multi-worker mode they run inside the state server
+    # (stateserver.py) and only those results cross the process boundary.
+
+    def feed_page(
+        self,
+        user_id: str,
+        topic: Optional[str],
+        limit: int,
+        offset: int = 0,
+        after: Optional[RecencyKey] = None,
+        paged: bool = False,
+    ) -> bytes:
+        """
+        /posts body: a bare list, or with `paged` the {"posts", "next_cursor"}
+        envelope. Served from the feed cache until a post on the page, the
+        page's key window or the user's own state changes.
+        """
+        st = self.ensure_user(user_id)
+        key = ("feed", user_id, topic, limit, after if paged else offset, paged)
+        with self.reading():
+            body = self.feed_cache.get(key)
+            if body is not None:
+                return body
+            if not paged:
+                posts = self.list_posts(topic, limit, offset)
+                body = posts_json(posts, st)
+            else:
+                posts = self.list_posts(topic, limit, after=after)
+                next_cursor = encode_cursor(key_payload(self.recency_key(posts[-1]))) if len(posts) == limit else None
+                body = posts_json(posts, st, next_cursor)
+            self.feed_cache.put(
+                key, body, user_id, topic, (p.id for p in posts),
+                low=self.recency_key(posts[-1]) if posts else None,
+                high=after if paged else None,
+                full=len(posts) == limit,
+            )
+            return body
+
+    def conditional_feed_page(
+        self,
+        if_none_match: Optional[str],
+        user_id: str,
+        topic: Optional[str],
+        limit: int,
+        offset: int = 0,
+        after: Optional[RecencyKey] = None,
+        paged: bool = False,
+    ) -> Tuple[str, Optional[bytes]]:
+        """
+        (ETag, feed_page() body). The body is None when `if_none_match`
+        already names the ETag: only the page's ids are listed then, and
+        nothing is serialised. The tag covers the listed posts' versions and
+        the viewer's, so changes elsewhere in the feed keep it valid.
+        """
+        with self.reading():
+            if paged:
+                posts = self.list_posts(topic, limit, after=after)
+            else:
+                posts = self.list_posts(topic, limit, offset)
+            scope, listed = self.versions.page([p.id for p in posts])
+            page = (topic, limit, after if paged else offset, paged, listed)
+            etag = self.versions.etag(scope, user_id, page)
+            if etag_matches(if_none_match, etag):
+                return etag, None
+            return etag, self.feed_page(user_id, topic, limit, offset, after, paged)
+
+    def mixed_page(
+        self,
+        user_id: str,
+        count: int,
+        seed: Any = None,
+        weights: Optional[Dict[str, float]] = None,
+        after: Optional[Dict[str, RecencyKey]] = None,
+    ) -> bytes:
+        """
+        /posts/mixed body; `after` (even empty) selects the cursor envelope.
+        Seeded mixes are reproducible, so they go through the feed cache.
+        """
+        st = self.ensure_user(user_id)
+        key: Any = None
+        if seed is not None:
+            key = (
+                "mixed", user_id, count, seed,
+                tuple(sorted(weights.items())) if weights else None,
+                tuple(sorted(after.items())) if after is not None else None,
+            )
+        with self.reading():
+            if key is not None:
+                body = self.feed_cache.get(key)
+                if body is not None:
+                    return body
+            if after is None:
+                posts = self.mixed_posts(count, seed=seed, weights=weights)
+                body = posts_json(posts, st)
+            else:
+                posts = self.mixed_posts(count, after=after, seed=seed, weights=weights)
+                after = dict(after)
+                for p in posts:
+                    after[p.topic] = self.recency_key(p)
+                next_cursor = encode_cursor({t: key_payload(k) for t, k in after.items()}) if len(posts) == count else None
+                body = posts_json(posts, st, next_cursor)
+            if key is not None:
+                self.feed_cache.put(key, body, user_id, MIXED, (p.id for p in posts))
+            return body
+
+    def export_chunk(
+        self, user_id: str, topic: Optional[str], after: Optional[RecencyKey], limit: int
+    ) -> Tuple[bytes, int, Optional[RecencyKey]]:
+        """
+        One chunk of an NDJSON export, newest first: (lines, posts in them,
+        key to continue after -- None once the feed is exhausted). Chained
+        through keyset paging, every chunk costs O(log N + limit).
+        """
+        st = self.ensure_user(user_id)
+        with self.reading():
+            posts = self.list_posts(topic, limit, after=after)
+            last = self.recency_key(posts[-1]) if len(posts) == limit else None
+            return posts_ndjson(posts, st), len(posts), last
+
+    def mixed_export_chunk(
+        self,
+        user_id: str,
+        count: int,
+        after: Dict[str, RecencyKey],
+        seed: Any = None,
+        weights: Optional[Dict[str, float]] = None,
+    ) -> Tuple[bytes, int, Optional[Dict[str, RecencyKey]]]:
+        """export_chunk() for the topic mix: `after` is the last key served per topic ({} to start)."""
+        st = self.ensure_user(user_id)
+        with self.reading():
+            posts = self.mixed_posts(count, after=after, seed=seed, weights=weights)
+            after = dict(after)
+            for p in posts:
+                after[p.topic] = self.recency_key(p)
+            return posts_ndjson(posts, st), len(posts), after if len(posts) == count else None
+
+    def ranked_page(self, user_id: str, policy: str, limit: int, offset: int = 0, topic: Optional[str] = None) -> bytes:
+        st = self.ensure_user(user_id)
+        with self.reading():
+            return posts_json(self.ranked_posts(policy, limit, offset, topic), st)
+
+    def search_page(
+        self,
+        user_id: str,
+        query: str,
+        tags: List[str],
+        topic: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+        sort: str = "relevance",
+    ) -> bytes:
+        """/search body: {"total": n, "posts": [...]}."""
+        st = self.ensure_user(user_id)
+        with self.reading():
+            total, posts = self.search_posts(query, tags, topic, limit, offset, sort)
+            return b'{"total":' + str(total).encode() + b',"posts":' + posts_json(posts, st) + b"}"
 
-store = Store()
-store.load()
+    def ancestry_page(self, user_id: str, post_id: int) -> bytes:
+        """/posts/{id}/ancestry body: {"id", "depth", "root_id", "ancestors": [root, ..., parent]}."""
+        st = self.ensure_user(user_id)
+        with self.reading():
+            chain = self.ancestry(post_id)
+            head = {"id": post_id, "depth": self.lineage.depth(post_id), "root_id": self.lineage.root(post_id)}
+            return json_bytes(head)[:-1] + b',"ancestors":' + posts_json(chain, st) + b"}"
 
-app = FastAPI(title="Fathom Dummy Backend", version="0.1.0")
+    def descendants_page(self, user_id: str, post_id: int, max_depth: Optional[int] = None, limit: Optional[int] = None) -> bytes:
+        """
+        /posts/{id}/descendants body: {"id", "depth", "subtree", "returned",
+        "truncated", "tree"}. "subtree" sums the whole subtree (size and
+        counters); "tree" nests {"post", "subtree", "children"} nodes, cut at
+        `max_depth` levels and `limit` posts.
+        """
+        st = self.ensure_user(user_id)
+        with self.reading():
+            rows = self.descendants(post_id, max_depth, limit)
+            lineage = self.lineage
+            kids: Dict[int, List[bytes]] = {}
+
+            def node(p: Post) -> bytes:
+                stats = json_bytes(sums_json(lineage.size(p.id), lineage.sums(p.id)))
+                children = b",".join(reversed(kids.pop(p.id, [])))
+                return b'{"post":' + p.public_bytes(st) + b',"subtree":' + stats + b',"children":[' + children + b"]}"
+
+            # Breadth-first rows reversed: every child is rendered before its
+            # parent (and siblings last to first, hence reversed() above).
+            for p, parent in reversed(rows):
+                kids.setdefault(parent, []).append(node(p))
+            root = self.get_post(post_id)
+            size = lineage.size(post_id)
+            head = {
+                "id": post_id,
+                "depth": lineage.depth(post_id),
+                "subtree": sums_json(size, lineage.sums(post_id)),
+                "returned": len(rows),
+                "truncated": len(rows) < size - 1,
+            }
+            return json_bytes(head)[:-1] + b',"tree":' + node(root) + b"}"
+
+    def deepest_page(self, user_id: str, topic: Optional[str] = None, limit: int = 10) -> bytes:
+        st = self.ensure_user(user_id)
+        with self.reading():
+            return posts_json(self.deepest_posts(topic, limit), st)
+
+    def post_page(self, user_id: str, post_id: int) -> bytes:
+        st = self.ensure_user(user_id)
+        with self.reading():
+            return self.get_post(post_id).public_bytes(st)
+
+    def conditional_post_page(self, if_none_match: Optional[str], user_id: str, post_id: int) -> Tuple[str, Optional[bytes]]:
+        """(ETag, post_page() body or None if it matches `if_none_match`); raises KeyError for unknown posts."""
+        with self.reading():
+            self.get_post(post_id)
+            etag = self.versions.etag(self.versions.post(post_id), user_id)
+            if etag_matches(if_none_match, etag):
+                return etag, None
+            return etag, self.post_page(user_id, post_id)
+
+    def expand_page(self, user_id: str, post_id: int, wait: bool = True) -> Optional[bytes]:
+        st = self.ensure_user(user_id)
+        p = self.expand_post(post_id, wait=wait)
+        if p is None:
+            return None
+        with self.reading():
+            return p.public_bytes(st)
+
+    def expansion_status(self, post_id: int) -> Dict[str, Any]:
+        """{"id", "status": ready|pending|failed|none, "expanded_text", "expanded_at"[, "error"]}."""
+        with self.reading():
+            p = self.get_post(post_id)
+            text, expanded_at = p.expanded_text, p.expanded_at
+        out: Dict[str, Any] = {"id": post_id, "status": "none", "expanded_text": text, "expanded_at": expanded_at}
+        if text:
+            out["status"] = "ready"
+        elif self.expander.current(post_id) is not None:
+            out["status"] = "pending"
+        elif post_id in self._expansion_errors:
+            out["status"] = "failed"
+            out["error"] = self._expansion_errors[post_id]
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {"posts": len(self.posts), "users": len(self.user_state), "feed_cache": self.feed_cache.stats()}
+
+    def metrics_text(self) -> str:
+        return STORE_METRICS.render()
+
+    def delta_cursor(self) -> int:
+        return self.changes.cursor
+
+    def delta_rows(self, cursor: int) -> Tuple[int, List[Tuple[int, str, List[int]]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        For live.DeltaHub: (new cursor, [(post id, topic, counters)] of posts
+        changed after `cursor`, [{id, parent_id, topic}] of posts spawned after
+        it, [{id, topic}] of posts whose expansion finished after it).
+        """
+        cursor, changed, spawned, expanded = self.changes.since(cursor)
+        rows: List[Tuple[int, str, List[int]]] = []
+        new: List[Dict[str, Any]] = []
+        done: List[Dict[str, Any]] = []
+        with self.reading():
+            for pid in sorted(changed):
+                p = self.posts.get(pid)
+                if p is not None:
+                    rows.append((pid, p.topic, p.counter_values()))
+            for pid in spawned:
+                p = self.posts.get(pid)
+                if p is not None:
+                    new.append({"id": pid, "parent_id": p.parent_id, "topic": p.topic})
+            for pid in expanded:
+                p = self.posts.get(pid)
+                if p is not None:
+                    done.append({"id": pid, "topic": p.topic})
+        return cursor, rows, new, done
+
+    def _invalidate(self, p: Post) -> None:
+        """Drop a post's cached JSON and pages, and bump its version."""
+        p.invalidate()
+        self.versions.post_changed(p.id)
+        self.feed_cache.post_changed(p.id)
+
+    def _user_changed(self, user_id: str) -> None:
+        """A user's own flags changed: bump their version, drop their cached pages."""
+        self.versions.user_changed(user_id)
+        self.feed_cache.user_changed(user_id)
+
+    def _touch(self, p: Post) -> None:
+        """Every mutation of a live post ends here: drop cached JSON, queue a live delta."""
+        self._invalidate(p)
+        if p.id in self.lineage:
+            self._lineage_touched.add(p.id)
+        if not self._replaying:
+            self.changes.changed(p.id)
+
+    def apply_batch(self, user_id: str, ops: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Apply many vote / react / power operations under one write lock.
+
+        Each op is {"op": "vote", "post_id": 1, "value": 1}, {"op": "react",
+        "post_id": 1, "learned": true}, or {"op": "power", "post_id": 1,
+        "enabled": true}, optionally with its own "user_id" (defaults to
+        `user_id`). Ops go through set_vote / toggle_react / set_power in order,
+        so threshold spawns behave exactly as for single requests; the batch is
+        persisted once when the lock is released. A bad op does not abort the
+        rest: its result is {"ok": false, "status": ..., "error": ...}.
+        """
+        results: List[Dict[str, Any]] = []
+        with self.writing():
+            for op in ops:
+                try:
+                    res = self._apply_batch_op(user_id, op)
+                except KeyError:
+                    res = {"ok": False, "status": 404, "error": "post not found"}
+                except ValueError as exc:
+                    res = {"ok": False, "status": 400, "error": str(exc)}
+                else:
+                    res = {"ok": True, **res}
+                results.append(res)
+        return results
+
+    def import_posts(self, rows: List[Tuple[int, Any]]) -> Tuple[List[int], List[Tuple[int, str]]]:
+        """
+        Validate and add one batch of (row number, object) pairs from a bulk
+        import (see ingest.py) under a single write lock. Good rows get ids
+        from next_id, in order; bad ones are skipped. Returns (new ids,
+        [(row number, error)]).
+
+        Each batch is one persisted mutation: a journal record carrying the
+        new posts whole (SQLite: their rows), flushed as the persistence mode
+        flushes any interaction.
+        """
+        now = now_iso(self.clock())
+        posts: List[Post] = []
+        errors: List[Tuple[int, str]] = []
+        with self.writing():
+            for row, raw in rows:
+                try:
+                    fields = validate_row(raw, now)
+                except ValueError as exc:
+                    errors.append((row, str(exc)))
+                    continue
+                parent = fields["parent_id"]
+                if parent is not None and parent not in self.posts:
+                    errors.append((row, f"parent_id {parent} does not exist"))
+                    continue
+                posts.append(Post(id=self.next_id, **fields))
+                self.next_id += 1
+            self._add_posts(posts)
+            ids = [p.id for p in posts]
+            self._imported.update(p.id for p in posts if p.parent_id is None)
+            if ids:
+                self._record("import", ids=ids)
+                self._mark_dirty()
+        IMPORTED.inc(len(ids))
+        return ids, errors
+
+    def _apply_batch_op(self, default_user: str, op: Any) -> Dict[str, Any]:
+        if not isinstance(op, dict):
+            raise ValueError("operation must be an object")
+        kind = op.get("op")
+        uid = get_user_id(op.get("user_id")) if op.get("user_id") is not None else default_user
+        try:
+            post_id = int(op.get("post_id"))
+        except Exception:
+            raise ValueError("post_id must be an integer")
+
+        if kind == "vote":
+            score, my_vote = self.set_vote(uid, post_id, clamp_int(op.get("value", 0), -1, 1, 0))
+            return {"op": kind, "id": post_id, "score": score, "my_vote": my_vote}
+        if kind == "react":
+            learned, surprised = to_opt_bool(op.get("learned")), to_opt_bool(op.get("surprised"))
+            if learned is None and surprised is None:
+                raise ValueError("react needs learned or surprised")
+            return {"op": kind, **self.toggle_react(uid, post_id, learned=learned, surprised=surprised)}
+        if kind == "power":
+            if op.get("enabled") is None:
+                raise ValueError("power needs enabled")
+            return {"op": kind, **self.set_power(uid, post_id, enabled=to_bool(op["enabled"]))}
+        raise ValueError("op must be vote, react or power")
+
+
+STORE_METRICS.instrument(Store, (
+    "import_posts",
+    "list_posts", "mixed_posts", "ranked_posts", "search_posts", "get_post",
+    "ancestry", "descendants", "deepest_posts",
+    "set_vote", "toggle_react", "set_power", "expand_post", "apply_batch",
+    "save", "flush", "snapshot_state",
+), STORE_DURATION)
+
+
+# The Store this process serves (a proxy under a state server). Built on first
+# get_store() -- at app startup, or by a CLI -- so importing main.py for its
+# classes loads nothing.
+store: Any = None
+_store_lock = threading.Lock()
+hub = DeltaHub(None, STREAM_WINDOW_S)
+
+
+def get_store() -> Any:
+    """The served Store, built and loaded from the environment's configuration on first call."""
+    global store
+    with _store_lock:
+        if store is None:
+            if STATE_SERVER:
+                from stateserver import connect
+
+                store = connect(STATE_SERVER)
+            else:
+                store = Store()
+                store.load()
+            hub.store = store
+        return store
+
+
+def persisted_file_bytes() -> Optional[int]:
+    backend = store.backend
+    path = getattr(backend, "state_path", None) or getattr(backend, "db_path", None) or getattr(backend, "snapshot_path", None)
+    return path.stat().st_size if path is not None and path.exists() else None
+
+
+# Only rendered in the process that owns the Store (via Store.metrics_text).
+STORE_METRICS.gauge("fathom_posts", "Posts in the store.", lambda: len(store.posts))
+STORE_METRICS.gauge("fathom_users", "Users with interaction state.", lambda: len(store.user_state))
+STORE_METRICS.gauge(
+    "fathom_tracked_interactions", "(user, post) pairs with any vote, reaction or power state.",
+    lambda: sum(len(st) for st in list(store.user_state.values())))
+STORE_METRICS.gauge("fathom_persist_pending", "Mutations not yet covered by a checkpoint.", lambda: store._dirty)
+STORE_METRICS.gauge(
+    "fathom_persist_bytes_written_total", "Bytes written to snapshot and journal files.",
+    lambda: store.backend.bytes_written, kind="counter")
+STORE_METRICS.gauge("fathom_state_file_bytes", "Size of state.json (or the SQLite database / binary snapshot).", persisted_file_bytes)
+STORE_METRICS.gauge("fathom_expansion_cache_entries", "Expanded bodies held in the expansion cache.", lambda: len(store.expansions))
+STORE_METRICS.gauge("fathom_search_terms", "Distinct tokens in the search index.", lambda: store.search.terms)
+STORE_METRICS.gauge("fathom_lineage_max_depth", "Generations in the deepest spawn chain.", lambda: max(store.lineage.depth_counts(), default=0))
+STORE_METRICS.gauge("fathom_expansions_in_flight", "Expansions currently queued or running.", lambda: store.expander.inflight())
+STORE_METRICS.gauge("fathom_feed_cache_entries", "Feed pages held in the feed cache.", lambda: len(store.feed_cache))
+STORE_METRICS.gauge("fathom_feed_cache_bytes", "Approximate size of the feed cache.", lambda: store.feed_cache.bytes)
+STORE_METRICS.gauge(
+    "fathom_feed_cache_hits_total", "Feed pages served from the feed cache.",
+    lambda: store.feed_cache.hits, kind="counter")
+STORE_METRICS.gauge(
+    "fathom_feed_cache_misses_total", "Feed pages built because they were not cached.",
+    lambda: store.feed_cache.misses, kind="counter")
+STORE_METRICS.gauge(
+    "fathom_feed_cache_invalidations_total", "Cached feed pages dropped by a change to one of their posts, their window or their user.",
+    lambda: store.feed_cache.invalidations, kind="counter")
+STORE_METRICS.gauge(
+    "fathom_feed_cache_evictions_total", "Cached feed pages dropped for space or age.",
+    lambda: store.feed_cache.evictions, kind="counter")
+METRICS.gauge("fathom_live_subscribers", "Connected /stream and /ws clients.", lambda: len(hub.subscribers))
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    get_store()
+    hub.start()
+    yield
+    await hub.stop()
+    # Forced flush so write_behind mode never drops acknowledged writes on a clean shutdown.
+    # (A worker of a state server leaves that to the server.)
+    if not STATE_SERVER:
+        store.close()
+
+
+app = FastAPI(title="Fathom Dummy Backend", version="0.1.0", lifespan=lifespan)
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+# Added last, so outermost: request timings include compression.
+if METRICS.enabled:
+    app.add_middleware(MetricsMiddleware, duration=HTTP_DURATION, requests=HTTP_REQUESTS)
 
 
 # ------------
@@ -550,19 +1868,142 @@ async def unhandled_exception_handler(_request: Request, exc: Exception):
 
 @app.get("/health")
 def health() -> Dict[str, Any]:
-    return {"ok": True, "time": now_iso(), "posts": len(store.posts)}
+    return {"ok": True, "time": now_iso(), "posts": store.stats()["posts"]}
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+    """Prometheus text exposition of request, Store and persistence metrics."""
+    if not METRICS.enabled:
+        raise HTTPException(status_code=404, detail="metrics are disabled (FATHOM_METRICS=0)")
+    text = METRICS.render() + store.metrics_text()
+    return Response(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def parse_cursor(cursor: str) -> Any:
+    """Decode an opaque cursor from a query string; "" means "first page"."""
+    if cursor == "":
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def parse_mixed_cursor(cursor: str) -> Dict[str, RecencyKey]:
+    """/posts/mixed cursor: the last key served per topic ({} for the first page)."""
+    raw = parse_cursor(cursor) or {}
+    try:
+        if not isinstance(raw, dict):
+            raise ValueError("invalid cursor")
+        return {str(t): cursor_key(v) for t, v in raw.items()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+
+def export_stream(next_chunk: Callable[[Any, int], Tuple[bytes, int, Any]], after: Any, limit: Optional[int]) -> Iterator[bytes]:
+    """
+    NDJSON chunks from `next_chunk(after, n)` until the feed or `limit` runs
+    out. Only one chunk is held at a time, so memory stays flat however much
+    is exported; Starlette pulls the next one only after sending the last.
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        n = EXPORT_CHUNK if remaining is None else min(EXPORT_CHUNK, remaining)
+        body, count, after = next_chunk(after, n)
+        if body:
+            yield body
+        if remaining is not None:
+            remaining -= count
+        if after is None:
+            return
+
+
+def ndjson_response(chunks: Iterator[bytes]) -> StreamingResponse:
+    return StreamingResponse(chunks, media_type="application/x-ndjson")
 
 
 @app.get("/posts/mixed")
 def posts_mixed(
     count: int = 20,
+    cursor: Optional[str] = None,
+    seed: Optional[str] = None,
+    weights: Optional[str] = None,
     x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
-) -> List[Dict[str, Any]]:
+) -> Response:
+    """
+    Round-robin mix across topics.
+
+    `seed` (any string, e.g. a user or run id) makes the mix reproducible;
+    without it every call is shuffled afresh. `weights` such as
+    "space:2,art:0.5" biases topic shares (unlisted topics weigh 1).
+    """
     uid = get_user_id(x_user_id)
-    st = store.ensure_user(uid)
     c = clamp_int(count, 1, 200, 20)
-    posts = store.mixed_posts(c)
-    return [p.to_public(st) for p in posts]
+    w = parse_topic_weights(weights) or None
+
+    if cursor is None:
+        return json_response(store.mixed_page(uid, c, seed=seed, weights=w))
+
+    # Cursor mode: the cursor carries the last key served per topic.
+    after = parse_mixed_cursor(cursor)
+
+    # Fold the cursor into the seed so successive pages are not the same shuffle.
+    page_seed = None if seed is None else f"{seed}|{cursor}"
+    return json_response(store.mixed_page(uid, c, seed=page_seed, weights=w, after=after))
+
+
+@app.get("/posts/ranked")
+def posts_ranked(
+    topic: Optional[str] = None,
+    policy: str = "hot",
+    limit: int = 30,
+    offset: int = 0,
+    x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
+) -> Response:
+    """Feed ranked server-side by a named policy (engagement, hot, novelty, controversial, ...)."""
+    uid = get_user_id(x_user_id)
+
+    lim = clamp_int(limit, 1, 200, 30)
+    off = clamp_int(offset, 0, 10_000, 0)
+    t = (topic or "").strip() or None
+
+    try:
+        return json_response(store.ranked_page(uid, policy, lim, off, t))
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"unknown policy; choose one of {sorted(POLICIES)}")
+
+
+@app.get("/search")
+def posts_search(
+    q: str = "",
+    tags: Optional[str] = None,
+    topic: Optional[str] = None,
+    sort: str = "relevance",
+    limit: int = 20,
+    offset: int = 0,
+    x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
+) -> Response:
+    """
+    Posts containing every word of `q` and every tag in `tags` (comma
+    separated), optionally within one topic, as {"total": n, "posts": [...]}.
+    `sort` is "relevance" (BM25) or a ranking policy (engagement, hot, ...).
+    """
+    uid = get_user_id(x_user_id)
+
+    lim = clamp_int(limit, 1, 200, 20)
+    off = clamp_int(offset, 0, 10_000, 0)
+    t = (topic or "").strip() or None
+    tag_list = [x.strip() for x in (tags or "").split(",") if x.strip()]
+    if not q.strip() and not tag_list:
+        raise HTTPException(status_code=400, detail="q or tags is required")
+
+    try:
+        return json_response(store.search_page(uid, q, tag_list, t, lim, off, sort))
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"unknown sort; choose relevance or one of {sorted(POLICIES)}")
+    except SearchNotReady as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
 
 
 @app.get("/posts")
@@ -570,10 +2011,22 @@ def posts_list(
     topic: Optional[str] = None,
     limit: int = 30,
     offset: int = 0,
+    cursor: Optional[str] = None,
     x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
-) -> List[Dict[str, Any]]:
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    """
+    Newest-first feed page.
+
+    Legacy clients page with limit/offset and get a bare list. Passing `cursor`
+    (empty for the first page) switches to keyset paging on (timestamp, id) and
+    returns {"posts": [...], "next_cursor": str | null}; each page then costs the
+    same however deep the client has scrolled, and new posts never shift pages.
+
+    Responses carry an ETag; sending it back in If-None-Match gets a bodiless
+    304 until a post in the topic (or the viewer's own state) changes.
+    """
     uid = get_user_id(x_user_id)
-    st = store.ensure_user(uid)
 
     lim = clamp_int(limit, 1, 200, 30)
     off = clamp_int(offset, 0, 10_000_000, 0)
@@ -582,36 +2035,150 @@ def posts_list(
     if t == "":
         t = None
 
-    posts = store.list_posts(t, lim, off)
-    return [p.to_public(st) for p in posts]
+    if cursor is None:
+        return tagged_response(*store.conditional_feed_page(if_none_match, uid, t, lim, off))
+
+    raw = parse_cursor(cursor)
+    try:
+        after = cursor_key(raw) if raw is not None else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+    return tagged_response(*store.conditional_feed_page(if_none_match, uid, t, lim, after=after, paged=True))
+
+
+@app.get("/posts/export")
+def posts_export(
+    topic: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
+) -> StreamingResponse:
+    """
+    The newest-first feed (optionally one topic) as NDJSON, one post per
+    line in the /posts shape, streamed in chunks of FATHOM_EXPORT_CHUNK
+    posts. Without `limit` it runs to the oldest post; `cursor` (a /posts
+    next_cursor) starts below an already-fetched page. Posts created during
+    the export are newer than every chunk's key, so they never shift it:
+    nothing is skipped or sent twice.
+    """
+    uid = get_user_id(x_user_id)
+    t = (topic or "").strip() or None
+    raw = parse_cursor(cursor) if cursor else None
+    try:
+        after = cursor_key(raw) if raw is not None else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    lim = None if limit is None else max(0, limit)
+    return ndjson_response(export_stream(lambda a, n: store.export_chunk(uid, t, a, n), after, lim))
+
+
+@app.get("/posts/mixed/export")
+def posts_mixed_export(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    seed: Optional[str] = None,
+    weights: Optional[str] = None,
+    x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
+) -> StreamingResponse:
+    """The /posts/mixed round robin as an NDJSON stream; runs until every topic is exhausted or `limit`."""
+    uid = get_user_id(x_user_id)
+    w = parse_topic_weights(weights) or None
+    after = parse_mixed_cursor(cursor) if cursor else {}
+    lim = None if limit is None else max(0, limit)
+    return ndjson_response(export_stream(lambda a, n: store.mixed_export_chunk(uid, n, a, seed=seed, weights=w), after, lim))
 
 
 @app.get("/posts/{post_id}")
 def post_get(
     post_id: int,
     x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
-) -> Dict[str, Any]:
+    if_none_match: Optional[str] = Header(default=None),
+) -> Response:
+    uid = get_user_id(x_user_id)
+    try:
+        return tagged_response(*store.conditional_post_page(if_none_match, uid, post_id))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="post not found")
+
+
+@app.get("/posts/{post_id}/ancestry")
+def post_ancestry(
+    post_id: int,
+    x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
+) -> Response:
+    """The chain of posts this one was spawned from, root first."""
     uid = get_user_id(x_user_id)
-    st = store.ensure_user(uid)
     try:
-        p = store.get_post(post_id)
+        return json_response(store.ancestry_page(uid, post_id))
     except KeyError:
         raise HTTPException(status_code=404, detail="post not found")
-    return p.to_public(st)
+
+
+@app.get("/posts/{post_id}/descendants")
+def post_descendants(
+    post_id: int,
+    max_depth: Optional[int] = None,
+    limit: int = 500,
+    x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
+) -> Response:
+    """
+    Everything spawned from this post, as a nested tree with subtree sizes and
+    summed counters. Cost follows the subtree returned, not the corpus.
+    """
+    uid = get_user_id(x_user_id)
+    lim = clamp_int(limit, 1, 5000, 500)
+    depth = None if max_depth is None else clamp_int(max_depth, 1, 10_000, 1)
+    try:
+        return json_response(store.descendants_page(uid, post_id, depth, lim))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="post not found")
+
+
+@app.get("/lineage/deepest")
+def lineage_deepest(
+    topic: Optional[str] = None,
+    limit: int = 10,
+    x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
+) -> Response:
+    """Spawned posts with the longest ancestry chains, optionally in one topic."""
+    uid = get_user_id(x_user_id)
+    t = (topic or "").strip() or None
+    return json_response(store.deepest_page(uid, t, clamp_int(limit, 1, 200, 10)))
 
 
 @app.post("/posts/{post_id}/expand")
 def post_expand(
     post_id: int,
+    mode: str = "wait",
     x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
-) -> Dict[str, Any]:
+) -> Response:
+    """
+    Expanded post. ?mode=pending answers 202 with the expansion status instead
+    of waiting for the generator; poll GET /posts/{id}/expansion or watch the
+    "expanded" list of /stream and /ws.
+    """
+    if mode not in ("wait", "pending"):
+        raise HTTPException(status_code=400, detail="mode must be wait or pending")
     uid = get_user_id(x_user_id)
-    st = store.ensure_user(uid)
     try:
-        p = store.expand_post(post_id)
+        body = store.expand_page(uid, post_id, wait=(mode == "wait"))
+        if body is None:
+            return JSONResponse(status_code=202, content=store.expansion_status(post_id))
+        return json_response(body)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="post not found")
+    except ExpansionError as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
+
+
+@app.get("/posts/{post_id}/expansion")
+def post_expansion(post_id: int) -> Dict[str, Any]:
+    """Expansion status of one post: ready / pending / failed / none."""
+    try:
+        return store.expansion_status(post_id)
     except KeyError:
         raise HTTPException(status_code=404, detail="post not found")
-    return p.to_public(st)
 
 
 @app.post("/posts/{post_id}/vote")
@@ -623,8 +2190,9 @@ async def post_vote(
     uid = get_user_id(x_user_id)
     body = await request.json()
     value = clamp_int(body.get("value", 0), -1, 1, 0)
+    # Mutations wait for the store's write lock and may hit disk: keep them off the event loop.
     try:
-        score, my_vote = store.set_vote(uid, post_id, value)
+        score, my_vote = await run_in_threadpool(store.set_vote, uid, post_id, value)
     except KeyError:
         raise HTTPException(status_code=404, detail="post not found")
 
@@ -643,22 +2211,6 @@ async def post_react(
     learned = body.get("learned", None)
     surprised = body.get("surprised", None)
 
-    # Allow booleans or truthy strings/ints
-    def to_opt_bool(v: Any) -> Optional[bool]:
-        if v is None:
-            return None
-        if isinstance(v, bool):
-            return v
-        if isinstance(v, (int, float)):
-            return bool(v)
-        if isinstance(v, str):
-            s = v.strip().lower()
-            if s in ("1", "true", "yes", "y", "on"):
-                return True
-            if s in ("0", "false", "no", "n", "off", ""):
-                return False
-        return None
-
     learned_b = to_opt_bool(learned)
     surprised_b = to_opt_bool(surprised)
 
@@ -666,7 +2218,7 @@ async def post_react(
         raise HTTPException(status_code=400, detail="body must include learned or surprised")
 
     try:
-        result = store.toggle_react(uid, post_id, learned=learned_b, surprised=surprised_b)
+        result = await run_in_threadpool(store.toggle_react, uid, post_id, learned=learned_b, surprised=surprised_b)
     except KeyError:
         raise HTTPException(status_code=404, detail="post not found")
 
@@ -683,25 +2235,142 @@ async def post_power(
     body = await request.json()
     enabled = body.get("enabled", None)
 
-    # Accept enabled bool; tolerate 0/1, "true"/"false"
-    def to_bool(v: Any) -> bool:
-        if isinstance(v, bool):
-            return v
-        if isinstance(v, (int, float)):
-            return bool(v)
-        if isinstance(v, str):
-            s = v.strip().lower()
-            if s in ("1", "true", "yes", "y", "on"):
-                return True
-            return False
-        return False
-
     if enabled is None:
         raise HTTPException(status_code=400, detail="body must include enabled")
 
     try:
-        result = store.set_power(uid, post_id, enabled=to_bool(enabled))
+        result = await run_in_threadpool(store.set_power, uid, post_id, enabled=to_bool(enabled))
     except KeyError:
         raise HTTPException(status_code=404, detail="post not found")
 
     return result
+
+
+@app.post("/interactions/batch")
+async def interactions_batch(
+    request: Request,
+    x_user_id: Optional[str] = Header(default=None, convert_underscores=False),
+) -> Dict[str, Any]:
+    """
+    Many votes / reactions / power toggles in one round trip (see Store.apply_batch).
+
+    Body: {"ops": [...]} or a bare list. Returns {"results": [...]} in op order.
+    """
+    uid = get_user_id(x_user_id)
+    body = await request.json()
+    ops = body.get("ops") if isinstance(body, dict) else body
+    if not isinstance(ops, list):
+        raise HTTPException(status_code=400, detail="body must be a list of operations or {\"ops\": [...]}")
+    if len(ops) > BATCH_MAX_OPS:
+        raise HTTPException(status_code=413, detail=f"at most {BATCH_MAX_OPS} operations per batch")
+
+    results = await run_in_threadpool(store.apply_batch, uid, ops)
+    return {"results": results}
+
+
+@app.post("/admin/import")
+async def admin_import(
+    request: Request,
+    batch: Optional[str] = None,
+    x_admin_token: Optional[str] = Header(default=None, convert_underscores=False),
+) -> Dict[str, Any]:
+    """
+    Bulk-load posts from an NDJSON (or JSON array) request body, streamed.
+
+    Rows are validated and inserted `batch` at a time, each batch under one
+    write lock, and get fresh ids. Bad rows are skipped and reported; the
+    response is the import report (see ingest.Importer.report).
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="bulk import is disabled: set FATHOM_ADMIN_TOKEN")
+    if not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="admin token required")
+    imp = Importer(store.import_posts, clamp_int(batch, 1, 100_000, IMPORT_BATCH))
+    async for chunk in request.stream():
+        for rows in imp.feed(chunk):
+            await run_in_threadpool(imp.insert, rows)
+        if imp.reader.fatal is not None:
+            break
+    for rows in imp.finish():
+        await run_in_threadpool(imp.insert, rows)
+    if imp.imported:
+        await run_in_threadpool(store.save)
+    return imp.report()
+
+
+# -------------
+# Live deltas
+# -------------
+
+def parse_subscription(topic: Optional[str], post_id: Optional[str]) -> Tuple[List[str], List[int]]:
+    """Comma-separated ?topic= and ?post_id= filters; both empty means "everything"."""
+    topics = [t.strip() for t in (topic or "").split(",") if t.strip()]
+    try:
+        ids = [int(x) for x in (post_id or "").split(",") if x.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="post_id must be comma-separated integers")
+    return topics, ids
+
+
+@app.get("/stream")
+async def stream(
+    request: Request,
+    topic: Optional[str] = None,
+    post_id: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    Server-Sent Events: one "delta" event per coalescing window with changed
+    counters and newly spawned posts (see live.py for the payload).
+    """
+    topics, ids = parse_subscription(topic, post_id)
+
+    async def events():
+        sub = hub.subscribe(topics, ids)
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                try:
+                    msg = await asyncio.wait_for(sub.queue.get(), timeout=STREAM_PING_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": ping\n\n"
+                    continue
+                yield f"id: {msg['seq']}\nevent: delta\ndata: {json_bytes(msg).decode('utf-8')}\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.websocket("/ws")
+async def ws_stream(ws: WebSocket, topic: Optional[str] = None, post_id: Optional[str] = None) -> None:
+    """
+    WebSocket flavour of /stream. The client may send {"topics": [...], "post_ids": [...]}
+    at any time to replace its subscription.
+    """
+    try:
+        topics, ids = parse_subscription(topic, post_id)
+    except HTTPException:
+        await ws.close(code=1008)
+        return
+    await ws.accept()
+    sub = hub.subscribe(topics, ids)
+
+    async def pump() -> None:
+        while True:
+            msg = await sub.queue.get()
+            await ws.send_text(json_bytes(msg).decode("utf-8"))
+
+    sender = asyncio.create_task(pump())
+    try:
+        while True:
+            data = await ws.receive_json()
+            if isinstance(data, dict):
+                sub.topics = {str(t) for t in data.get("topics") or []}
+                sub.post_ids = {int(x) for x in data.get("post_ids") or [] if str(x).lstrip("-").isdigit()}
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(sub)
@@ -0,0 +1,216 @@
+"""
+Minimal Prometheus-style instrumentation (no client library needed).
+
+Three metric kinds, all rendered in the Prometheus text exposition format:
+
+    Counter    monotonically increasing, optionally labelled
+    Histogram  fixed buckets; observe() is a bisect plus a few adds under a lock
+    Gauge      computed by a callback at scrape time, so it costs nothing in between
+
+Label sets are bounded by construction: routes are labelled by their path
+template (/posts/{post_id}), never the raw URL, and Store methods by name.
+
+A disabled Registry still hands out metrics (counters keep counting -- a dict
+lookup and an add), but instrument() leaves methods untouched and the HTTP
+middleware is not installed, so the request path pays nothing.
+"""
+
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _fmt_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "lock")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[LabelValues, _HistogramChild] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float, *labels: str) -> None:
+        self.labels(*labels).observe(value)
+
+    def render(self) -> List[str]:
+        out: List[str] = []
+        for key, child in sorted(self._children.items()):
+            with child.lock:
+                counts, total, n = list(child.counts), child.sum, child.count
+            labels = _fmt_labels(self.labelnames, key)
+            cum = 0
+            for le, c in zip(self.buckets, counts):
+                cum += c
+                le_label = _fmt_labels(self.labelnames, key, 'le="%s"' % le)
+                out.append(f"{self.name}_bucket{le_label} {cum}")
+            inf_label = _fmt_labels(self.labelnames, key, 'le="+Inf"')
+            out.append(f"{self.name}_bucket{inf_label} {n}")
+            out.append(f"{self.name}_sum{labels} {_fmt_value(total)}")
+            out.append(f"{self.name}_count{labels} {n}")
+        return out
+
+
+class Gauge:
+    """Value read from `fn` at scrape time; kind="counter" for totals kept elsewhere."""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float], kind: str = "gauge") -> None:
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        return [] if value is None else [f"{self.name} {_fmt_value(value)}"]
+
+
+class Registry:
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._metrics: Dict[str, Any] = {}
+
+    def _add(self, metric: Any) -> Any:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float], kind: str = "gauge") -> Gauge:
+        return self._add(Gauge(name, help, fn, kind))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics.values():
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+    def instrument(self, cls: type, methods: Iterable[str], histogram: Histogram) -> None:
+        """Wrap cls.<method> so each call is observed in `histogram` labelled by method name."""
+        if not self.enabled:
+            return
+        for name in methods:
+            setattr(cls, name, _timed(getattr(cls, name), histogram.labels(name)))
+
+
+def _timed(fn: Callable[..., Any], child: _HistogramChild) -> Callable[..., Any]:
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            child.observe(time.perf_counter() - t0)
+    return wrapper
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware: times each HTTP request until its last body chunk is
+    sent and counts it by method, route template and status code.
+    """
+
+    def __init__(self, app: Any, duration: Histogram, requests: Counter) -> None:
+        self.app = app
+        self.duration = duration
+        self.requests = requests
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status: List[int] = [500]
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route: Optional[Any] = scope.get("route")
+            path = getattr(route, "path", None) or "<unmatched>"
+            method = scope.get("method", "")
+            self.duration.observe(time.perf_counter() - t0, method, path)
+            self.requests.inc(1, method, path, str(status[0]))
@@ -0,0 +1,190 @@
+"""
+Server-side ranked feed.
+
+A ranking policy is a plain function of per-post feature arrays:
+
+    score, upvotes, downvotes, learned, surprised, power, age_hours, depth
+
+that returns one rank value per post (higher = earlier in the feed). With
+NumPy installed the features are int64/float64 ndarrays over every candidate
+and the policy runs once, vectorised; the top of the feed is then picked with
+np.argpartition (O(N) partial selection) and only those k items are sorted.
+Without NumPy the same function is called per candidate with plain numbers
+and heapq.nlargest does the selection -- so policies should stick to
+arithmetic (+ - * / **) and work on both.
+
+Register new policies with register_policy(); the /posts/ranked endpoint
+takes the name in ?policy=.
+"""
+
+from __future__ import annotations
+
+import heapq
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from counters import CounterColumns, np
+
+Policy = Callable[..., Any]
+
+POLICIES: Dict[str, Policy] = {}
+
+
+def register_policy(name: str, fn: Policy) -> Policy:
+    POLICIES[name] = fn
+    return fn
+
+
+def policy(name: str) -> Callable[[Policy], Policy]:
+    def deco(fn: Policy) -> Policy:
+        return register_policy(name, fn)
+    return deco
+
+
+@policy("engagement")
+def _engagement(score, upvotes, downvotes, learned, surprised, power, age_hours, depth):
+    # Raw engagement, no time decay.
+    return score + 2 * learned + 3 * surprised + 4 * power
+
+
+@policy("hot")
+def _hot(score, upvotes, downvotes, learned, surprised, power, age_hours, depth):
+    # Engagement with a gravity-style age decay.
+    return (score + 2 * learned + 3 * surprised + 4 * power + 1) / (age_hours + 2) ** 1.5
+
+
+@policy("novelty")
+def _novelty(score, upvotes, downvotes, learned, surprised, power, age_hours, depth):
+    # "Learned"/"surprised" weigh more than votes; derived posts get a boost per generation.
+    return (3 * learned + 4 * surprised + score + 1) * (1 + 0.5 * depth) / (age_hours + 2)
+
+
+@policy("controversial")
+def _controversial(score, upvotes, downvotes, learned, surprised, power, age_hours, depth):
+    # Lots of votes on both sides: total volume scaled by how balanced the split is.
+    total = upvotes + downvotes
+    return total * (1 - (score * score) / (total * total + 1))
+
+
+class RankingEngine:
+    """
+    Per-slot static features (timestamp, lineage depth, topic) kept next to
+    the Store's CounterColumns, plus batch scoring and top-k selection.
+    """
+
+    def __init__(self, counters: CounterColumns, clock: Callable[[], float] = time.time) -> None:
+        self.counters = counters
+        self.clock = clock  # epoch seconds; "now" for age_hours
+        self.ts = array("q")  # epoch microseconds, indexed by counter slot
+        self.depth = array("q")
+        self.slots_by_topic: Dict[str, array] = {}
+
+    def add(self, slot: int, topic: str, timestamp_key: int, depth: int) -> None:
+        if slot < len(self.ts):
+            # Re-added post: slot keeps its topic membership; refresh features.
+            self.ts[slot] = timestamp_key
+            self.depth[slot] = depth
+            return
+        self.ts.append(timestamp_key)
+        self.depth.append(depth)
+        self.slots_by_topic.setdefault(topic, array("q")).append(slot)
+
+    def extend(self, first_slot: int, ts: array, depth: array, topics: Sequence[str]) -> None:
+        """Bulk add() for the new slots first_slot, first_slot + 1, ..."""
+        if first_slot != len(self.ts):
+            raise ValueError("extend() only appends new slots")
+        self.ts.extend(ts)
+        self.depth.extend(depth)
+        by_topic = self.slots_by_topic
+        for slot, topic in enumerate(topics, first_slot):
+            lst = by_topic.get(topic)
+            if lst is None:
+                lst = by_topic[topic] = array("q")
+            lst.append(slot)
+
+    def top(self, policy_name: str, limit: int, offset: int = 0, topic: Optional[str] = None) -> List[int]:
+        """Post ids ranked by `policy_name`, positions [offset, offset + limit)."""
+        k = offset + limit
+        if k <= 0:
+            return []
+        if topic is None:
+            candidates = None
+        else:
+            candidates = self.slots_by_topic.get(topic)
+            if not candidates:
+                return []
+        ranked = self.top_slots(policy_name, k, candidates)
+        ids = self.counters.post_ids
+        return [ids[s] for s in ranked[offset:k]]
+
+    def top_slots(self, policy_name: str, k: int, candidates: Optional[Sequence[int]] = None) -> List[int]:
+        """The k best slots under `policy_name`, among `candidates` (ascending slots) or all."""
+        fn = POLICIES[policy_name]
+        if k <= 0:
+            return []
+        now_us = self.clock() * 1_000_000
+        if np is not None:
+            return self._top_numpy(fn, k, candidates, now_us)
+        return self._top_python(fn, k, candidates, now_us)
+
+    def _top_numpy(self, fn: Policy, k: int, candidates: Optional[Sequence[int]], now_us: float) -> List[int]:
+        c = self.counters
+        n = len(self.ts)
+        if n == 0:
+            return []
+        slots = None if candidates is None else np.asarray(candidates, dtype=np.int64)
+
+        def col(a: Any) -> Any:
+            v = a if isinstance(a, np.ndarray) else np.frombuffer(a, dtype=np.int64)[:n]
+            return v if slots is None else v[slots]
+
+        up, down = col(c.column("upvotes")), col(c.column("downvotes"))
+        ranks = np.asarray(fn(
+            score=up - down,
+            upvotes=up,
+            downvotes=down,
+            learned=col(c.column("learned_count")),
+            surprised=col(c.column("surprised_count")),
+            power=col(c.column("power_count")),
+            age_hours=np.maximum(0.0, (now_us - col(self.ts)) / 3.6e9),
+            depth=col(self.depth),
+        ), dtype=np.float64)
+
+        m = len(ranks)
+        if k < m:
+            # Partial selection of the k-th best value; ties at the boundary are
+            # resolved towards lower slots so results are deterministic.
+            neg = -ranks
+            kth = np.partition(neg, k - 1)[k - 1]
+            above = np.flatnonzero(neg < kth)
+            tied = np.flatnonzero(neg == kth)[: k - len(above)]
+            part = np.concatenate((above, tied))
+        else:
+            part = np.arange(m)
+        # Stable order among the selected: rank desc, then slot asc.
+        order = part[np.lexsort((part, -ranks[part]))]
+        chosen = order if slots is None else slots[order]
+        return chosen.tolist()
+
+    def _top_python(self, fn: Policy, k: int, candidates: Optional[Sequence[int]], now_us: float) -> List[int]:
+        c = self.counters
+        up, down = c.column("upvotes"), c.column("downvotes")
+        learned, surprised, power = c.column("learned_count"), c.column("surprised_count"), c.column("power_count")
+        slots = range(len(self.ts)) if candidates is None else candidates
+
+        def rank(s: int) -> float:
+            return float(fn(
+                score=up[s] - down[s],
+                upvotes=up[s],
+                downvotes=down[s],
+                learned=learned[s],
+                surprised=surprised[s],
+                power=power[s],
+                age_hours=max(0.0, (now_us - self.ts[s]) / 3.6e9),
+                depth=self.depth[s],
+            ))
+
+        # Same tie-break as the NumPy path: rank desc, then slot asc.
+        best = heapq.nlargest(k, ((rank(s), -s) for s in slots))
+        return [-neg for _, neg in best]
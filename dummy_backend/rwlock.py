@@ -0,0 +1,100 @@
+"""
+Readers-writer lock for the Store.
+
+Any number of threads may hold the read side at once; the write side is
+exclusive. Waiting writers block new readers, so a steady stream of feed
+requests cannot starve interactions. Both sides are re-entrant per thread,
+and the writing thread may also take the read side (Store methods call each
+other freely). Upgrading a held read lock to a write lock is refused rather
+than deadlocking.
+"""
+
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+class RWLock:
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    # -- read side ------------------------------------------------------------
+
+    def acquire_read(self) -> None:
+        depth = getattr(self._local, "read_depth", 0)
+        if depth or self._writer == threading.get_ident():
+            # Nested read, or the writer reading its own state: already exclusive enough.
+            self._local.read_depth = depth + 1
+            return
+        with self._cond:
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        self._local.read_depth = 1
+        self._local.counted = True
+
+    def release_read(self) -> None:
+        depth = self._local.read_depth - 1
+        self._local.read_depth = depth
+        if depth or not getattr(self._local, "counted", False):
+            return
+        self._local.counted = False
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    # -- write side -----------------------------------------------------------
+
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        if self._writer == me:
+            self._write_depth += 1
+            return
+        if getattr(self._local, "counted", False):
+            raise RuntimeError("cannot upgrade a read lock to a write lock")
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self) -> bool:
+        """Release one level; returns True when the lock was actually given up."""
+        self._write_depth -= 1
+        if self._write_depth:
+            return False
+        with self._cond:
+            self._writer = None
+            self._cond.notify_all()
+        return True
+
+    def held_for_write(self) -> bool:
+        return self._writer == threading.get_ident()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -0,0 +1,283 @@
+"""
+In-memory full-text and tag search.
+
+Documents are counter slots (see counters.py), not post ids: slots are dense
+and handed out in insertion order, so a new post's entries are plain appends
+to every posting list it touches, per-document data lives in flat arrays, and
+engagement ranking can reuse RankingEngine's columns directly.
+
+Each token of a post's text (and, once generated, of its expanded text) maps
+to a posting list: ascending slots in an array("q") with the term frequency
+alongside in an array("I"). Tags and topics get their own id-only lists.
+A query intersects its lists smallest first -- every candidate is looked up
+in the longer lists by binary search, so cost follows the rarest term rather
+than the corpus size -- then scores the survivors with BM25 and selects the
+top k. With NumPy installed the lookups, scoring and selection are
+vectorised (np.searchsorted / np.argpartition); without it the same steps run
+as bisect loops and heapq.nlargest.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from counters import np
+
+_TOKEN = re.compile(r"\w+")
+
+# BM25 parameters (the usual defaults).
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lower-cased word tokens of `text`."""
+    return _TOKEN.findall(text.casefold()) if text else []
+
+
+def normalize_tag(tag: Any) -> str:
+    return str(tag).strip().casefold()
+
+
+class SearchNotReady(RuntimeError):
+    """The index is still being built."""
+
+
+class Postings:
+    """Ascending slots containing one term, with the term's frequency in each."""
+
+    __slots__ = ("slots", "tfs")
+
+    def __init__(self) -> None:
+        self.slots = array("q")
+        self.tfs = array("I")
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def add(self, slot: int, tf: int) -> None:
+        slots = self.slots
+        if not slots or slots[-1] < slot:
+            slots.append(slot)
+            self.tfs.append(tf)
+            return
+        i = bisect_left(slots, slot)
+        if i < len(slots) and slots[i] == slot:
+            self.tfs[i] += tf
+        else:
+            slots.insert(i, slot)
+            self.tfs.insert(i, tf)
+
+
+def _add_slot(lst: array, slot: int) -> None:
+    if not lst or lst[-1] < slot:
+        lst.append(slot)
+        return
+    i = bisect_left(lst, slot)
+    if i == len(lst) or lst[i] != slot:
+        lst.insert(i, slot)
+
+
+class SearchIndex:
+    """
+    Inverted index over counter slots: add() for new posts, add_expansion()
+    for expanded bodies. Not thread-safe by itself; the Store serialises
+    updates and only queries it under its read lock once built.
+    """
+
+    def __init__(self) -> None:
+        self._terms: Dict[str, Postings] = {}
+        self._tags: Dict[str, array] = {}
+        self._topics: Dict[str, array] = {}
+        # Token count per slot (0 = not indexed yet) and their sum, for BM25.
+        self._lengths = array("I")
+        self._indexed = 0
+        self._total_length = 0
+        self._expanded: Set[int] = set()
+
+    def __len__(self) -> int:
+        return self._indexed
+
+    @property
+    def terms(self) -> int:
+        return len(self._terms)
+
+    def add(self, slot: int, topic: str, text: Optional[str], tags: Optional[Iterable[Any]] = None) -> None:
+        """Index a new post; a slot that is already indexed is left alone."""
+        lengths = self._lengths
+        if slot < len(lengths) and lengths[slot]:
+            return
+        if slot == len(lengths):
+            lengths.append(0)
+        elif slot > len(lengths):
+            lengths.extend([0] * (slot + 1 - len(lengths)))
+        self._indexed += 1
+        _add_slot(self._topics.setdefault(topic, array("q")), slot)
+        if isinstance(tags, str):
+            tags = [tags]
+        if tags:
+            for tag in {normalize_tag(t) for t in tags} - {""}:
+                _add_slot(self._tags.setdefault(tag, array("q")), slot)
+        # Count every document as at least one token, so an empty one is still "indexed".
+        self._add_tokens(slot, tokenize(text), minimum=1)
+
+    def add_expansion(self, slot: int, text: Optional[str]) -> None:
+        """Add an indexed post's expanded body (once: a regenerated body is not counted twice)."""
+        if slot < len(self._lengths) and self._lengths[slot] and slot not in self._expanded:
+            self._expanded.add(slot)
+            self._add_tokens(slot, tokenize(text))
+
+    def _add_tokens(self, slot: int, tokens: List[str], minimum: int = 0) -> None:
+        terms = self._terms
+        for term, tf in Counter(tokens).items():
+            postings = terms.get(term)
+            if postings is None:
+                postings = terms[term] = Postings()
+            slots = postings.slots
+            if slots and slots[-1] >= slot:
+                postings.add(slot, tf)
+            else:  # the usual case, inlined: a new post is the highest slot
+                slots.append(slot)
+                postings.tfs.append(tf)
+        n = max(minimum, len(tokens))
+        self._lengths[slot] += n
+        self._total_length += n
+
+    def search(
+        self,
+        query: str,
+        tags: Sequence[str] = (),
+        topic: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+        rank: Optional[Any] = None,
+    ) -> Tuple[int, List[int]]:
+        """
+        Slots of posts containing every query token and every tag (and in
+        `topic`, if given), as (total matches, slots at [offset, offset + limit)).
+
+        Matches are ordered by BM25 over the query tokens, ties (and tag-only
+        queries) newest slot first. `rank(candidates, k)` replaces that order,
+        e.g. with a ranking policy; `candidates` holds ascending slots (an
+        int64 ndarray when NumPy is installed, else a list).
+        """
+        terms = sorted(set(tokenize(query)))
+        tag_keys = sorted({normalize_tag(t) for t in tags if normalize_tag(t)})
+        postings = [self._terms.get(t) for t in terms]
+        lists: List[Any] = [p.slots if p is not None else None for p in postings]
+        lists += [self._tags.get(t) for t in tag_keys]
+        if topic is not None:
+            lists.append(self._topics.get(topic))
+        if not lists or any(not lst for lst in lists):
+            return 0, []
+
+        candidates, positions = _intersect(lists, len(self._lengths))
+        total = len(candidates)
+        k = offset + limit
+        if not total or k <= 0:
+            return total, []
+        if rank is not None:
+            return total, list(rank(candidates, k))[offset:k]
+        # postings[i] is lists[i]; none is None past the check above.
+        scores = self._bm25(candidates, [(p, positions[i]) for i, p in enumerate(postings)])
+        return total, _top(candidates, scores, k)[offset:k]
+
+    def _bm25(self, candidates: Any, terms: List[Tuple[Postings, Any]]) -> Any:
+        """BM25 of every candidate; `terms` pairs each query term's postings with the candidates' positions in it."""
+        n = max(1, self._indexed)
+        avgdl = self._total_length / n if self._total_length else 1.0
+        if np is not None:
+            norm = K1 * (1 - B + B * np.frombuffer(self._lengths, dtype=np.uint32)[candidates] / avgdl)
+            scores = np.zeros(len(candidates), dtype=np.float64)
+            for p, pos in terms:
+                tf = np.frombuffer(p.tfs, dtype=np.uint32)[pos].astype(np.float64)
+                scores += _idf(n, len(p)) * tf * (K1 + 1) / (tf + norm)
+            return scores
+
+        lengths = self._lengths
+        weighted = [(_idf(n, len(p)), p.tfs, pos) for p, pos in terms]
+        scores = []
+        for j, s in enumerate(candidates):
+            norm = K1 * (1 - B + B * lengths[s] / avgdl)
+            total = 0.0
+            for idf, tfs, pos in weighted:
+                tf = tfs[pos[j]]
+                total += idf * tf * (K1 + 1) / (tf + norm)
+            scores.append(total)
+        return scores
+
+
+def _idf(n: int, df: int) -> float:
+    return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+
+def _intersect(lists: List[array], size: int) -> Tuple[Any, Dict[int, Any]]:
+    """
+    Ascending slots present in every list (`size` bounds the slots), plus
+    {list index: position of each of those slots in that list}.
+
+    The shortest list seeds the candidates, which are probed against the
+    longer lists in turn. With NumPy, a sparse candidate set is probed by
+    binary search and a dense one through a slot -> position table.
+    """
+    order = sorted(range(len(lists)), key=lambda i: len(lists[i]))
+    first = order[0]
+    if np is not None:
+        cand = np.frombuffer(lists[first], dtype=np.int64)
+        positions = {first: np.arange(len(cand))}
+        for i in order[1:]:
+            other = np.frombuffer(lists[i], dtype=np.int64)
+            if len(cand) * 16 < size:
+                pos = np.searchsorted(other, cand)
+                pos[pos == len(other)] = 0
+                keep = other[pos] == cand
+            else:
+                where = np.full(size, -1, dtype=np.int64)
+                where[other] = np.arange(len(other))
+                pos = where[cand]
+                keep = pos >= 0
+            cand = cand[keep]
+            positions = {j: p[keep] for j, p in positions.items()}
+            positions[i] = pos[keep]
+        return cand, positions
+
+    cand: List[int] = list(lists[first])
+    positions = {first: list(range(len(cand)))}
+    for i in order[1:]:
+        lst, hi = lists[i], len(lists[i])
+        kept: List[int] = []
+        pos: List[int] = []
+        for j, s in enumerate(cand):
+            at = bisect_left(lst, s)
+            if at < hi and lst[at] == s:
+                kept.append(j)
+                pos.append(at)
+        cand = [cand[j] for j in kept]
+        positions = {k: [p[j] for j in kept] for k, p in positions.items()}
+        positions[i] = pos
+    return cand, positions
+
+
+def _top(candidates: Any, scores: Any, k: int) -> List[int]:
+    """The k best slots: score desc, then slot desc (newest first)."""
+    if np is not None:
+        neg = -scores
+        if k < len(scores):
+            # Partial selection of the k-th best score; ties at the boundary go
+            # to the highest slots, as in the sorted order below.
+            kth = np.partition(neg, k - 1)[k - 1]
+            above = np.flatnonzero(neg < kth)
+            tied = np.flatnonzero(neg == kth)
+            part = np.concatenate((above, tied[len(tied) - (k - len(above)):]))
+        else:
+            part = np.arange(len(scores))
+        order = part[np.lexsort((-candidates[part], neg[part]))]
+        return candidates[order].tolist()
+    best = heapq.nlargest(k, zip(scores, candidates))
+    return [s for _, s in best]
@@ -0,0 +1,382 @@
+"""
+Headless simulation of feed dynamics: visibility, engagement and recursive
+power/spawn generation, without HTTP and without per-click persistence.
+
+A population of agents (each with its own topic affinities) acts on the Store
+in discrete ticks of virtual time. Every tick, the agents that act see the
+same visible pool -- the top of a ranking policy plus the newest posts -- and
+pick a post with probability proportional to affinity x position bias, then
+vote, react or power it. Actions go through Store.set_vote / toggle_react /
+set_power under one write lock per tick, so threshold spawns follow exactly
+the same rules as the API. Decisions for a tick are drawn in one vectorised
+batch when NumPy is installed (plain Python otherwise).
+
+Every --every ticks one JSON line of aggregates is written to --out: topic
+diversity of engagement and of the visible pool, concentration of attention,
+lineage depth distribution, spawn counts and throughput.
+
+    python simulate.py --agents 5000 --ticks 2000 --out run.ndjson
+    python simulate.py --policy novelty --threshold 3 --state sim_state.json
+
+A run is deterministic for a given seed, corpus and NumPy availability:
+spawn timestamps and ranking ages use a virtual clock that starts at the
+newest post and advances --tick-seconds per tick. Nothing is persisted
+unless --state is given; then the run starts from that snapshot (if it
+exists) and writes it back once at the end.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+# Action codes drawn by the behaviour model.
+NOTHING, VOTE, LEARNED, SURPRISED, POWER = range(5)
+
+
+class VirtualClock:
+    """Epoch seconds that only move when the simulation says so."""
+
+    def __init__(self, start: float) -> None:
+        self.t = start
+
+    def __call__(self) -> float:
+        return self.t
+
+    def advance(self, seconds: float) -> None:
+        self.t += seconds
+
+
+# -------------------------
+# Behaviour model
+# -------------------------
+
+class Population:
+    """
+    Agents with Dirichlet-distributed topic affinities (lower --concentration
+    means more specialised agents). decide() returns one
+    (agent, pool position, action, value) tuple per acting agent.
+    """
+
+    def __init__(self, args: argparse.Namespace, topics: List[str], np: Any) -> None:
+        self.np = np
+        self.n = args.agents
+        self.topics = topics
+        self.p = (args.p_vote, args.p_react, args.p_power)
+        self.position_bias = args.position_bias
+        if np is not None:
+            self.rng = np.random.default_rng(args.seed)
+            self.affinity = self.rng.dirichlet([args.concentration] * len(topics), size=self.n)
+        else:
+            self.rng = random.Random(args.seed)
+            self.affinity = [self._dirichlet(args.concentration, len(topics)) for _ in range(self.n)]
+
+    def _dirichlet(self, alpha: float, k: int) -> List[float]:
+        draws = [self.rng.gammavariate(alpha, 1.0) for _ in range(k)]
+        total = sum(draws) or 1.0
+        return [d / total for d in draws]
+
+    def decide(self, pool_topics: List[int], acting: int) -> List[Tuple[int, int, int, int]]:
+        if not pool_topics or acting <= 0:
+            return []
+        if self.np is not None:
+            return self._decide_numpy(pool_topics, acting)
+        return self._decide_python(pool_topics, acting)
+
+    def _decide_numpy(self, pool_topics: List[int], acting: int) -> List[Tuple[int, int, int, int]]:
+        np, rng = self.np, self.rng
+        n_pool = len(pool_topics)
+        agents = rng.choice(self.n, size=min(acting, self.n), replace=False)
+        bias = 1.0 / np.arange(1, n_pool + 1, dtype=np.float64) ** self.position_bias
+        aff = self.affinity[agents][:, np.asarray(pool_topics)]        # agents x pool
+        cum = np.cumsum(aff * bias, axis=1)
+        u = rng.random(len(agents)) * cum[:, -1]
+        pick = np.minimum((cum < u[:, None]).sum(axis=1), n_pool - 1)
+        # How much the agent likes what it picked, relative to a uniform agent.
+        liking = aff[np.arange(len(agents)), pick] * len(self.topics)
+        up = rng.random(len(agents)) < liking / (1.0 + liking)
+        action = _actions_numpy(np, rng.random(len(agents)), self.p)
+        value = np.where(action == VOTE, np.where(up, 1, -1), 1)
+        return list(zip(agents.tolist(), pick.tolist(), action.tolist(), value.tolist()))
+
+    def _decide_python(self, pool_topics: List[int], acting: int) -> List[Tuple[int, int, int, int]]:
+        rng = self.rng
+        positions = range(len(pool_topics))
+        bias = [1.0 / (i + 1) ** self.position_bias for i in positions]
+        p_vote, p_react, p_power = self.p
+        out: List[Tuple[int, int, int, int]] = []
+        for agent in rng.sample(range(self.n), min(acting, self.n)):
+            aff = self.affinity[agent]
+            pick = rng.choices(positions, [aff[t] * b for t, b in zip(pool_topics, bias)])[0]
+            liking = aff[pool_topics[pick]] * len(self.topics)
+            up = rng.random() < liking / (1.0 + liking)
+            r = rng.random()
+            if r < p_vote:
+                out.append((agent, pick, VOTE, 1 if up else -1))
+            elif r < p_vote + p_react:
+                out.append((agent, pick, LEARNED if rng.random() < 0.5 else SURPRISED, 1))
+            elif r < p_vote + p_react + p_power:
+                out.append((agent, pick, POWER, 1))
+        return out
+
+
+def _actions_numpy(np: Any, r: Any, p: Tuple[float, float, float]) -> Any:
+    p_vote, p_react, p_power = p
+    react = np.where(r < p_vote + p_react / 2, LEARNED, SURPRISED)
+    return np.select(
+        [r < p_vote, r < p_vote + p_react, r < p_vote + p_react + p_power],
+        [VOTE, react, POWER],
+        default=NOTHING,
+    )
+
+
+# -------------------------
+# Aggregates
+# -------------------------
+
+def entropy(counts: List[int]) -> float:
+    """Shannon entropy normalised to [0, 1] over len(counts) categories."""
+    total = sum(counts)
+    if total <= 0 or len(counts) < 2:
+        return 0.0
+    h = -sum(c / total * math.log(c / total) for c in counts if c)
+    return round(h / math.log(len(counts)), 4)
+
+
+def gini(values: List[int]) -> float:
+    """0 when attention is spread evenly over all posts, towards 1 when one post gets it all."""
+    n = len(values)
+    total = sum(values)
+    if n == 0 or total <= 0:
+        return 0.0
+    ranked = sorted(values)
+    weighted = sum((i + 1) * v for i, v in enumerate(ranked))
+    return round((2 * weighted) / (n * total) - (n + 1) / n, 4)
+
+
+class Simulation:
+    def __init__(self, main: Any, store: Any, args: argparse.Namespace, out: TextIO) -> None:
+        from counters import np
+
+        self.main = main
+        self.store = store
+        self.args = args
+        self.out = out
+        self.topics = sorted({p.topic for p in store.posts.values()})
+        self.topic_index = {t: i for i, t in enumerate(self.topics)}
+        self.population = Population(args, self.topics, np)
+        self.users = [f"sim-u{i}" for i in range(args.agents)]
+
+        start = max((p.timestamp for p in store.posts.values()), default="")
+        self.clock = VirtualClock(self._epoch(start))
+        store.set_clock(self.clock)
+
+        self._known_posts = len(store.posts)
+        self.spawned_start = sum(1 for p in store.posts.values() if p.parent_id is not None)
+
+        self.interactions = 0
+        self.window_topics = [0] * len(self.topics)
+        self.window_posts: Counter = Counter()
+        self.window_interactions = 0
+        self.window_spawns = 0
+        self.pool_topics: List[int] = []
+        self.t0 = self.window_t0 = time.perf_counter()
+
+    def _epoch(self, timestamp: str) -> float:
+        from feed import ts_key
+
+        key = ts_key(timestamp)
+        return key / 1_000_000 if key else 0.0
+
+    def _track_new_posts(self) -> int:
+        """Posts added since the last call (depths come from store.lineage)."""
+        known, self._known_posts = self._known_posts, len(self.store.posts)
+        return self._known_posts - known
+
+    def visible_pool(self) -> List[int]:
+        args, store = self.args, self.store
+        if args.policy == "recent":
+            pool = [p.id for p in store.list_posts(None, args.pool)]
+        else:
+            pool = store.ranker.top(args.policy, args.pool)
+        if args.fresh:
+            seen = set(pool)
+            pool += [p.id for p in store.list_posts(None, args.fresh) if p.id not in seen]
+        return pool
+
+    def tick(self) -> None:
+        args, store = self.args, self.store
+        pool = self.visible_pool()
+        posts = store.posts
+        self.pool_topics = [self.topic_index[posts[pid].topic] for pid in pool]
+        decisions = self.population.decide(self.pool_topics, args.active)
+
+        users = self.users
+        applied = 0
+        with store.writing():
+            for agent, pick, action, value in decisions:
+                if action == NOTHING:
+                    continue
+                uid, pid = users[agent], pool[pick]
+                if action == VOTE:
+                    store.set_vote(uid, pid, value)
+                elif action == LEARNED:
+                    store.toggle_react(uid, pid, True, None)
+                elif action == SURPRISED:
+                    store.toggle_react(uid, pid, None, True)
+                else:
+                    store.set_power(uid, pid, True)
+                self.window_topics[self.pool_topics[pick]] += 1
+                self.window_posts[pid] += 1
+                applied += 1
+        self.interactions += applied
+        self.window_interactions += applied
+        self.window_spawns += self._track_new_posts()
+        self.clock.advance(args.tick_seconds)
+
+    def snapshot(self, tick: int) -> Dict[str, Any]:
+        now = time.perf_counter()
+        store = self.store
+        depths = store.lineage.depth_counts()
+        spawned = sum(depths.values())
+        depths[0] = len(store.posts) - spawned
+        window_s = now - self.window_t0
+        snap = {
+            "tick": tick,
+            "sim_time": self.main.now_iso(self.clock()),
+            "interactions": self.interactions,
+            "window_interactions": self.window_interactions,
+            "posts": len(store.posts),
+            "spawned": spawned - self.spawned_start,
+            "window_spawns": self.window_spawns,
+            "topic_entropy": entropy(self.window_topics),
+            "visible_topic_entropy": entropy(self._topic_counts(self.pool_topics)),
+            "attention_gini": gini([self.window_posts.get(pid, 0) for pid in store.posts]),
+            "depth_hist": {str(d): n for d, n in sorted(depths.items())},
+            "max_depth": max(depths, default=0),
+            "mean_spawn_depth": round(sum(d * n for d, n in depths.items() if d > 0) / spawned, 3) if spawned else 0.0,
+            "wall_s": round(now - self.t0, 3),
+            "ops_per_s": round(self.window_interactions / window_s, 1) if window_s > 0 else 0.0,
+        }
+        self.window_topics = [0] * len(self.topics)
+        self.window_posts.clear()
+        self.window_interactions = self.window_spawns = 0
+        self.window_t0 = now
+        return snap
+
+    def _topic_counts(self, topic_indexes: List[int]) -> List[int]:
+        counts = [0] * len(self.topics)
+        for t in topic_indexes:
+            counts[t] += 1
+        return counts
+
+    def emit(self, snap: Dict[str, Any]) -> None:
+        self.out.write(json.dumps(snap, separators=(",", ":")) + "\n")
+        self.out.flush()
+
+    def run(self) -> Dict[str, Any]:
+        every = max(1, self.args.every)
+        snap: Dict[str, Any] = {}
+        for tick in range(1, self.args.ticks + 1):
+            self.tick()
+            if tick % every == 0 or tick == self.args.ticks:
+                snap = self.snapshot(tick)
+                self.emit(snap)
+        return snap
+
+
+# -------------------------
+# CLI
+# -------------------------
+
+def build_store(main: Any, args: argparse.Namespace, scratch: Path) -> Any:
+    """
+    A Store without a flusher: write_behind only counts dirty mutations, so no
+    I/O happens during the run. With --state it loads from (and is later saved
+    to) that snapshot; otherwise it starts from the seed in a scratch dir.
+    """
+    from storage import JsonBackend
+
+    state_path = Path(args.state) if args.state else scratch / "state.json"
+    store = main.Store(
+        backend=JsonBackend(state_path, state_path.with_suffix(".journal")),
+        persist_mode="write_behind",
+        expansions_path=state_path.with_suffix(".expansions.jsonl"),
+    )
+    store.backend.load(store)
+    store.next_id = max(store.next_id, max(store.posts, default=0) + 1)
+    store.power_threshold = args.threshold
+    return store
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--agents", type=int, default=2_000)
+    ap.add_argument("--ticks", type=int, default=1_000)
+    ap.add_argument("--active", type=int, default=200, help="agents acting per tick")
+    ap.add_argument("--policy", default="hot", help="ranking policy that decides visibility, or 'recent'")
+    ap.add_argument("--pool", type=int, default=50, help="ranked posts visible per tick")
+    ap.add_argument("--fresh", type=int, default=10, help="newest posts added to the visible pool")
+    ap.add_argument("--position-bias", type=float, default=1.0, help="exponent of the 1/rank attention decay")
+    ap.add_argument("--concentration", type=float, default=0.3, help="Dirichlet alpha of agent topic affinities")
+    ap.add_argument("--p-vote", type=float, default=0.5)
+    ap.add_argument("--p-react", type=float, default=0.2)
+    ap.add_argument("--p-power", type=float, default=0.05)
+    ap.add_argument("--threshold", type=int, default=5, help="power count that spawns a child post")
+    ap.add_argument("--tick-seconds", type=float, default=60.0, help="virtual time per tick")
+    ap.add_argument("--every", type=int, default=50, help="ticks between snapshot lines")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--state", help="start from and save the final state to this state.json")
+    ap.add_argument("--out", help="NDJSON snapshot stream (default stdout)")
+    args = ap.parse_args(argv)
+    args.agents = max(1, args.agents)
+    if args.p_vote + args.p_react + args.p_power > 1:
+        raise SystemExit("--p-vote + --p-react + --p-power must not exceed 1")
+
+    # Unmetered; without --state the run's store lives in a scratch dir.
+    scratch = Path(tempfile.mkdtemp(prefix="fathom-sim-"))
+    os.environ["FATHOM_METRICS"] = "0"
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import main
+
+    from ranking import POLICIES
+
+    if args.policy != "recent" and args.policy not in POLICIES:
+        raise SystemExit(f"unknown policy {args.policy!r}; choose from recent, {', '.join(sorted(POLICIES))}")
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    store = None
+    try:
+        store = build_store(main, args, scratch)
+        final = Simulation(main, store, args, out).run()
+        if args.state:
+            store.save()
+    finally:
+        if store is not None:
+            if not args.state:
+                store._dirty = 0  # throwaway run: skip the final checkpoint
+            store.close()
+        if out is not sys.stdout:
+            out.close()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print(
+        f"[sim] {final.get('interactions', 0)} interactions, {final.get('spawned', 0)} spawns, "
+        f"max depth {final.get('max_depth', 0)} in {final.get('wall_s', 0)}s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
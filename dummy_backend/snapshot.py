@@ -0,0 +1,275 @@
+"""
+Binary, memory-mapped Store snapshot (FATHOM_STORAGE=binary).
+
+state.json has to be read whole, parsed whole and walked post by post before
+the first request can be served. A binary snapshot keeps everything the Store
+needs at startup in fixed-width columns, which load with one memcpy each, and
+leaves post text and metadata in the mapped file until a post is first read.
+
+Layout (little-endian):
+
+    "FATHOMB1" | u32 version | u32 directory length | directory (JSON)
+    | zero padding to 8 bytes | sections, each padded to 8 bytes
+
+The directory holds counts, next_id, the topic table and
+{"section": [offset, length]} with offsets relative to the first section:
+
+    id, upvotes, downvotes, learned_count,
+    surprised_count, power_count, ts, depth, parent   int64[posts]
+    topic                                             int32[posts], index into topics
+    record_offsets                                    int64[posts + 1]
+    records                                           per-post JSON: text, timestamp,
+                                                      tags, author, lineage, source
+    user_offsets                                      int64[users + 1]
+    user_ids                                          UTF-8, concatenated
+    flag_offsets                                      int64[users + 1]
+    flag_posts                                        int64[interactions]
+    flags                                             uint8[interactions] (userstate.py bits)
+    imported                                          int64[imported posts], ids of bulk-imported
+                                                      posts (absent in older snapshots)
+
+Convert to and from the JSON files with:
+
+    python snapshot.py to-binary --state state.json state.fathom
+    python snapshot.py to-json state.fathom --state state.json --seed posts_seed.json
+    python snapshot.py info state.fathom
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+MAGIC = b"FATHOMB1"
+VERSION = 1
+_HEADER = struct.Struct("<II")
+
+POST_COLUMNS = ("id", "upvotes", "downvotes", "learned_count", "surprised_count", "power_count", "ts", "depth", "parent")
+_TYPECODES = {"topic": "i", "flags": "B"}
+_SWAP = sys.byteorder != "little"
+
+
+def _typecode(section: str) -> str:
+    return _TYPECODES.get(section, "q")
+
+
+class SnapshotError(ValueError):
+    """Not a readable snapshot file."""
+
+
+class Snapshot:
+    """
+    Read-only view of one snapshot file.
+
+    column() copies a fixed-width section into an array; record() decodes one
+    post's JSON record. The file is memory-mapped (read into memory on
+    Windows, where a mapped file cannot be replaced by the next checkpoint).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as fh:
+            if os.name == "nt":
+                self._buf: Any = fh.read()
+            else:
+                self._buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buf[:8] != MAGIC:
+            raise SnapshotError(f"{path} is not a Fathom snapshot")
+        version, dir_len = _HEADER.unpack_from(self._buf, 8)
+        if version != VERSION:
+            raise SnapshotError(f"{path}: unsupported snapshot version {version}")
+        start = 8 + _HEADER.size
+        self.directory: Dict[str, Any] = json.loads(bytes(self._buf[start:start + dir_len]))
+        self._base = _align(start + dir_len)
+        self.topics: List[str] = self.directory["topics"]
+        self.n_posts: int = self.directory["posts"]
+        self.n_users: int = self.directory["users"]
+        self.next_id: int = self.directory["next_id"]
+        # Kept for record_bytes(): the only per-access lookups.
+        self._record_offsets = self.column("record_offsets")
+        self._records_at = self._section("records")[0]
+
+    def _section(self, name: str) -> Tuple[int, int]:
+        try:
+            off, length = self.directory["sections"][name]
+        except KeyError:
+            raise SnapshotError(f"{self.path}: missing section {name!r}")
+        return self._base + off, length
+
+    def raw(self, name: str) -> memoryview:
+        off, length = self._section(name)
+        return memoryview(self._buf)[off:off + length]
+
+    def column(self, name: str) -> array:
+        """Copy of a fixed-width section in native byte order."""
+        out = array(_typecode(name))
+        out.frombytes(self.raw(name))
+        if _SWAP:
+            out.byteswap()
+        return out
+
+    def record_bytes(self, index: int) -> bytes:
+        offs = self._record_offsets
+        return self._buf[self._records_at + offs[index]:self._records_at + offs[index + 1]]
+
+    def record(self, index: int) -> Dict[str, Any]:
+        return json.loads(self.record_bytes(index))
+
+    def imported(self) -> array:
+        """Ids of bulk-imported posts (empty for snapshots written before the section existed)."""
+        if "imported" not in self.directory["sections"]:
+            return array("q")
+        return self.column("imported")
+
+    def users(self) -> Iterator[Tuple[str, Dict[int, int]]]:
+        """(user id, {post id: flags}) for every user."""
+        uid_offs, ids = self.column("user_offsets"), bytes(self.raw("user_ids"))
+        flag_offs, posts, flags = self.column("flag_offsets"), self.column("flag_posts"), self.column("flags")
+        for u in range(self.n_users):
+            lo, hi = flag_offs[u], flag_offs[u + 1]
+            yield ids[uid_offs[u]:uid_offs[u + 1]].decode("utf-8"), dict(zip(posts[lo:hi], flags[lo:hi]))
+
+
+def _align(n: int) -> int:
+    return n + (-n % 8)
+
+
+def _offsets(chunks: Sequence[bytes]) -> array:
+    out = array("q", [0])
+    total = 0
+    for c in chunks:
+        total += len(c)
+        out.append(total)
+    return out
+
+
+def write_snapshot(
+    path: Path,
+    columns: Dict[str, array],
+    topics: List[str],
+    records: List[bytes],
+    users: List[Tuple[str, Dict[int, int]]],
+    meta: Dict[str, Any],
+    imported: Sequence[int] = (),
+) -> int:
+    """
+    Write a snapshot atomically. `columns` holds POST_COLUMNS plus "topic",
+    all in the same post order as `records`; `imported` lists the ids of
+    bulk-imported posts. Returns the bytes written.
+    """
+    user_ids = [uid.encode("utf-8") for uid, _ in users]
+    flag_posts, flags = array("q"), array("B")
+    flag_offsets = array("q", [0])
+    for _, user_flags in users:
+        flag_posts.extend(user_flags.keys())
+        flags.extend(user_flags.values())
+        flag_offsets.append(len(flags))
+
+    sections: Dict[str, Any] = {name: columns[name] for name in POST_COLUMNS + ("topic",)}
+    sections.update({
+        "record_offsets": _offsets(records),
+        "records": b"".join(records),
+        "user_offsets": _offsets(user_ids),
+        "user_ids": b"".join(user_ids),
+        "flag_offsets": flag_offsets,
+        "flag_posts": flag_posts,
+        "flags": flags,
+        "imported": array("q", sorted(imported)),
+    })
+    layout: Dict[str, List[int]] = {}
+    pos = 0
+    for name, data in sections.items():
+        if isinstance(data, array) and _SWAP and data.itemsize > 1:
+            data = sections[name] = array(data.typecode, data)
+            data.byteswap()
+        size = len(data) * data.itemsize if isinstance(data, array) else len(data)
+        layout[name] = [pos, size]
+        pos = _align(pos + size)
+
+    directory = dict(meta, posts=len(records), users=len(users), topics=topics, sections=layout)
+    dir_bytes = json.dumps(directory, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    head = MAGIC + _HEADER.pack(VERSION, len(dir_bytes)) + dir_bytes
+    head += b"\0" * (-len(head) % 8)
+
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    written = len(head)
+    with tmp.open("wb") as fh:
+        fh.write(head)
+        for name, data in sections.items():
+            fh.write(data)
+            pad = -layout[name][1] % 8
+            fh.write(b"\0" * pad)
+            written += layout[name][1] + pad
+    tmp.replace(path)
+    return written
+
+
+# -------------------------
+# Converter
+# -------------------------
+
+def _import_main(seed: Optional[str]) -> Any:
+    # Only the Store class is needed; main.py loads no store until get_store().
+    os.environ["FATHOM_METRICS"] = "0"
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import main
+
+    if seed:
+        main.SEED_PATH = Path(seed)
+    return main
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Convert between state.json and binary Fathom snapshots.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    to_bin = sub.add_parser("to-binary", help="seed file + state.json (+ journal) -> snapshot")
+    to_bin.add_argument("out")
+    to_bin.add_argument("--state", default="state.json")
+    to_bin.add_argument("--seed", help="seed file (default: posts_seed.json next to main.py)")
+    to_json = sub.add_parser("to-json", help="snapshot -> state.json (+ seed file)")
+    to_json.add_argument("snapshot")
+    to_json.add_argument("--state", default="state.json", help="state.json to write")
+    to_json.add_argument("--seed", help="also write every non-spawned post to this seed file")
+    info = sub.add_parser("info", help="print a snapshot's directory")
+    info.add_argument("snapshot")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "info":
+        d = dict(Snapshot(Path(args.snapshot)).directory)
+        d.pop("sections")
+        print(json.dumps(d, indent=2, ensure_ascii=False))
+        return 0
+
+    convert(_import_main(args.seed if args.cmd == "to-binary" else None), args)
+    return 0
+
+
+def convert(main: Any, args: argparse.Namespace) -> None:
+    from storage import BinaryBackend, JsonBackend, write_json
+
+    if args.cmd == "to-binary":
+        state = Path(args.state)
+        store = main.Store(backend=JsonBackend(state, state.with_suffix(".journal")), persist_mode="write_behind")
+        store.backend.load(store)
+        target = BinaryBackend(Path(args.out))
+        target.checkpoint(store)()
+        print(f"[snapshot] {len(store.posts)} posts, {len(store.user_state)} users -> {args.out} ({target.bytes_written} bytes)")
+    else:
+        store = main.Store(backend=BinaryBackend(Path(args.snapshot)), persist_mode="write_behind")
+        store.backend.load(store)
+        state = Path(args.state)
+        JsonBackend(state, state.with_suffix(".journal")).checkpoint(store)()
+        if args.seed:
+            write_json(Path(args.seed), [p.to_public(main.UserState()) for _, p in sorted(store.posts.items()) if p.parent_id is None])
+        print(f"[snapshot] {len(store.posts)} posts, {len(store.user_state)} users -> {args.state}")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main_cli())
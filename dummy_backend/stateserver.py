@@ -0,0 +1,106 @@
+"""
+State-owner process for multi-worker deployments.
+
+`uvicorn --workers N` gives every worker its own interpreter. With a Store per
+worker each one would hold its own diverging counters and overwrite the
+others' state.json. Instead, run one owner process and point the workers at it:
+
+    export FATHOM_STATE_AUTHKEY=$(python -c 'import secrets; print(secrets.token_hex(32))')
+    python stateserver.py                                   # listens on 127.0.0.1:50507
+    FATHOM_STATE_SERVER=127.0.0.1:50507 uvicorn main:app --workers 4
+
+The owner builds the one real Store (same env configuration as main.py:
+storage backend, persistence mode, ...) and serves it with the stdlib
+multiprocessing manager. In the workers, main.get_store() returns a proxy.
+
+Routes only call the route-facing Store methods (feed_page, set_vote,
+apply_batch, ...). Those return JSON bytes or small dicts, so a request is
+one round trip over a local socket and no Post objects cross processes. The
+owner serves each connection on its own thread, and the Store's RWLock keeps
+reads parallel and writes serialised exactly as in single-process mode. HTTP
+parsing, routing and response writing scale with the workers.
+
+An address containing "/" is used as a Unix socket path. Both sides must
+share the secret FATHOM_STATE_AUTHKEY: the manager unpickles what any peer
+that passes its handshake sends, so there is no default key to fall back on.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import sys
+import time
+from multiprocessing.managers import BaseManager
+from typing import Any, Tuple, Union
+
+DEFAULT_ADDRESS = "127.0.0.1:50507"
+CONNECT_TIMEOUT_S = 30.0
+
+Address = Union[str, Tuple[str, int]]
+
+
+class StateManager(BaseManager):
+    pass
+
+
+def parse_address(spec: str) -> Address:
+    if "/" in spec:
+        return spec
+    host, _, port = spec.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+def authkey() -> bytes:
+    key = os.environ.get("FATHOM_STATE_AUTHKEY", "")
+    if not key:
+        raise RuntimeError(
+            "FATHOM_STATE_AUTHKEY is not set; give the state server and its workers the same secret, e.g. "
+            "export FATHOM_STATE_AUTHKEY=$(python -c 'import secrets; print(secrets.token_hex(32))')"
+        )
+    return key.encode("utf-8")
+
+
+def connect(spec: str, timeout: float = CONNECT_TIMEOUT_S) -> Any:
+    """Proxy to the Store served at `spec`, waiting up to `timeout` seconds for the server."""
+    StateManager.register("store")
+    deadline = time.monotonic() + timeout
+    while True:
+        manager = StateManager(address=parse_address(spec), authkey=authkey())
+        try:
+            manager.connect()
+            break
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"no state server at {spec} (start it with: python stateserver.py)")
+            time.sleep(0.2)
+    return manager.store()
+
+
+def serve(spec: str) -> None:
+    key = authkey()  # fail before loading any state
+    # This process owns the state: main.py must build a real Store, not a proxy.
+    os.environ.pop("FATHOM_STATE_SERVER", None)
+    import main
+
+    store = main.get_store()
+    StateManager.register("store", callable=lambda: store)
+    manager = StateManager(address=parse_address(spec), authkey=key)
+    server = manager.get_server()
+    # SIGTERM (e.g. from a process supervisor) shuts down like Ctrl+C.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"[stateserver] serving {len(store.posts)} posts on {spec} ({store.persist_mode} persistence)")
+    try:
+        server.serve_forever()
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Serve the Fathom dummy backend's Store to uvicorn workers.")
+    ap.add_argument("address", nargs="?", default=os.environ.get("FATHOM_STATE_SERVER") or DEFAULT_ADDRESS)
+    try:
+        serve(ap.parse_args().address)
+    except RuntimeError as exc:
+        raise SystemExit(f"[stateserver] {exc}")
@@ -0,0 +1,602 @@
+"""
+Storage backends for the dummy backend's Store.
+
+The Store keeps its indexes, counters and per-user state in memory and serves
+every read from there; a backend is only responsible for making mutations
+durable and for rebuilding that in-memory state on startup. The SQLite and
+binary backends leave post text and metadata on disk until first read.
+
+Three implementations:
+
+- JsonBackend:   state.json snapshot (+ optional append-only journal). This is
+                 the original behaviour and needs nothing but the stdlib.
+- SqliteBackend: one SQLite database in WAL mode with posts and per-user
+                 votes / reactions / power flags in keyed tables. Each
+                 interaction is a single-row upsert instead of a full rewrite;
+                 post text is fetched by primary key on first read. It is a
+                 durability layer only: no read is answered by a query.
+- BinaryBackend: memory-mapped binary snapshot (see snapshot.py). Startup
+                 copies fixed-width columns instead of parsing JSON; post
+                 text is decoded lazily.
+
+Backends talk to the Store through a handful of methods (load_seed,
+load_state, snapshot_state, apply_records, ensure_user, _load_posts_from_seed,
+load_snapshot) so this module never imports main.py.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from counters import COUNTER_FIELDS
+from feed import ts_key
+from snapshot import Snapshot, write_snapshot
+
+
+def read_json(path: Path, default: Any) -> Any:
+    if not path.exists():
+        return default
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return default
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+
+def write_json(path: Path, data: Any) -> None:
+    write_text_atomic(path, json.dumps(data, indent=2, ensure_ascii=False))
+
+
+class StorageBackend:
+    """
+    Interface between Store and disk.
+
+    load()       rebuild store state; returns how many journaled records were replayed
+    record()     called (under the store lock) once per interaction record
+    checkpoint() called under the store lock when the store decides to flush;
+                 may return a callable that does the slow I/O after the lock is released
+    close()      release files / connections
+
+    bytes_written counts bytes this backend has written to its own files
+    (snapshots and journal lines); backends that cannot tell leave it at 0.
+    """
+
+    name = "base"
+    bytes_written = 0
+
+    def load(self, store: Any) -> int:
+        raise NotImplementedError
+
+    def record(self, store: Any, rec: Dict[str, Any]) -> None:
+        pass
+
+    def checkpoint(self, store: Any) -> Optional[Callable[[], None]]:
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+# -------------------------
+# JSON snapshot + journal
+# -------------------------
+
+class JsonBackend(StorageBackend):
+    """
+    state.json snapshot, optionally followed by an append-only journal.
+
+    Every journal record carries a monotonic sequence number "s"; the snapshot
+    stores the last sequence it already contains (meta.journal_seq) so replay
+    can skip records that were folded in before a crash.
+    """
+
+    name = "json"
+
+    def __init__(self, state_path: Path, journal_path: Path, journal: bool = False) -> None:
+        self.state_path = state_path
+        self.journal_path = journal_path
+        self.journal = journal
+
+        self._seq: int = 0
+        self._fh: Optional[Any] = None
+        self._write_lock = threading.Lock()
+        self._snapshot_seq: int = 0
+        self._written_seq: int = 0
+
+    def _journal_paths(self) -> Tuple[Path, Path]:
+        """(rotated journal being compacted, live journal) in replay order."""
+        return self.journal_path.with_suffix(self.journal_path.suffix + ".1"), self.journal_path
+
+    def load(self, store: Any) -> int:
+        store.load_seed()
+        state = read_json(self.state_path, default={})
+        if isinstance(state, dict):
+            store.load_state(state)
+            meta = state.get("meta", {})
+            if isinstance(meta, dict):
+                try:
+                    self._seq = max(0, int(meta.get("journal_seq", 0)))
+                except Exception:
+                    self._seq = 0
+        # Roll forward whatever was journaled after the snapshot.
+        return store.apply_records(self._read_journal())
+
+    def _read_journal(self) -> Iterator[Dict[str, Any]]:
+        snapshot_seq = self._seq
+        for path in self._journal_paths():
+            if not path.exists():
+                continue
+            with path.open("r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                        seq = int(rec.get("s", 0))
+                    except Exception:
+                        # Torn final line from a crash mid-append.
+                        continue
+                    if seq <= snapshot_seq:
+                        continue
+                    self._seq = max(self._seq, seq)
+                    yield rec
+
+    def record(self, store: Any, rec: Dict[str, Any]) -> None:
+        if not self.journal:
+            return
+        self._seq += 1
+        line = {"s": self._seq, "t": round(datetime.now(timezone.utc).timestamp(), 3)}
+        line.update(rec)
+        if rec.get("op") == "import":
+            # Imported posts are not in the seed file: journal them whole.
+            line["posts"] = [store.posts[pid].to_state() for pid in line.pop("ids")]
+        if self._fh is None:
+            self._fh = self.journal_path.open("a", encoding="utf-8")
+        text = json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n"
+        self._fh.write(text)
+        self._fh.flush()
+        self.bytes_written += len(text.encode("utf-8"))
+
+    def checkpoint(self, store: Any) -> Optional[Callable[[], None]]:
+        """
+        Serialise a snapshot and fold the journal into it.
+
+        The live journal is rotated aside here (cheap, under the store lock), so
+        writers keep appending to a new file while the snapshot is written. The
+        rotated file is only deleted once the snapshot covering it is on disk;
+        if we crash in between, load() replays it and skips what the snapshot has.
+        """
+        rotated, live = self._journal_paths()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if live.exists():
+            if rotated.exists():
+                # A previous compaction never finished; keep both tails in order.
+                with rotated.open("a", encoding="utf-8") as dst:
+                    dst.write(live.read_text(encoding="utf-8"))
+                live.unlink()
+            else:
+                live.replace(rotated)
+
+        data = store.snapshot_state()
+        data.setdefault("meta", {})["journal_seq"] = self._seq
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+        self._snapshot_seq += 1
+        seq = self._snapshot_seq
+
+        def write() -> None:
+            with self._write_lock:
+                # A newer snapshot may already have been written by another thread.
+                if seq > self._written_seq:
+                    write_text_atomic(self.state_path, text)
+                    self._written_seq = seq
+                    self.bytes_written += len(text.encode("utf-8"))
+                    rotated.unlink(missing_ok=True)
+
+        return write
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+# -------------------------
+# SQLite (WAL)
+# -------------------------
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id              INTEGER PRIMARY KEY,
+    topic           TEXT    NOT NULL,
+    ts              TEXT    NOT NULL,
+    text            TEXT    NOT NULL,
+    upvotes         INTEGER NOT NULL DEFAULT 0,
+    downvotes       INTEGER NOT NULL DEFAULT 0,
+    learned_count   INTEGER NOT NULL DEFAULT 0,
+    surprised_count INTEGER NOT NULL DEFAULT 0,
+    power_count     INTEGER NOT NULL DEFAULT 0,
+    expanded_text   TEXT,
+    expanded_at     TEXT,
+    parent_id       INTEGER,
+    extra           TEXT
+);
+
+CREATE TABLE IF NOT EXISTS votes (
+    user_id TEXT    NOT NULL,
+    post_id INTEGER NOT NULL,
+    value   INTEGER NOT NULL,
+    PRIMARY KEY (user_id, post_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS reactions (
+    user_id   TEXT    NOT NULL,
+    post_id   INTEGER NOT NULL,
+    learned   INTEGER NOT NULL DEFAULT 0,
+    surprised INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, post_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS power (
+    user_id TEXT    NOT NULL,
+    post_id INTEGER NOT NULL,
+    enabled INTEGER NOT NULL,
+    PRIMARY KEY (user_id, post_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS imported (
+    post_id INTEGER PRIMARY KEY
+);
+
+-- Reads are served from the Store's in-memory indexes, never by SQL, so only
+-- primary keys are kept. Databases from older versions had these as well.
+DROP INDEX IF EXISTS posts_topic_ts;
+DROP INDEX IF EXISTS posts_ts;
+DROP INDEX IF EXISTS posts_parent;
+DROP INDEX IF EXISTS votes_post;
+DROP INDEX IF EXISTS reactions_post;
+DROP INDEX IF EXISTS power_post;
+"""
+
+_POST_COLUMNS = (
+    "id, topic, ts, text, upvotes, downvotes, learned_count, surprised_count, power_count, "
+    "expanded_text, expanded_at, parent_id, extra"
+)
+
+_COUNTER_UPDATE = (
+    "UPDATE posts SET upvotes = ?, downvotes = ?, learned_count = ?, surprised_count = ?, power_count = ? "
+    "WHERE id = ?"
+)
+
+
+class _SqlitePosts:
+    """
+    The posts table in the shape Store.load_snapshot expects: one pass over
+    the narrow columns (id, topic, timestamp, counters, parent) at startup,
+    then record() fetches a post's text and metadata by primary key the first
+    time the post is read. Posts only go stale here once they are decoded
+    (every write path decodes first), so record() can use its own
+    connection and see the last committed rows.
+
+    Reads in load order (the startup search indexer) are served READAHEAD
+    rows per range query instead of one query per post.
+    """
+
+    READAHEAD = 2000
+
+    def __init__(self, db_path: Path) -> None:
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._last = -1
+        self._ahead: Dict[int, Tuple[str, str, Optional[str]]] = {}
+        self.topics: List[str] = []
+        index: Dict[str, int] = {}
+        self._columns: Dict[str, array] = {name: array("q") for name in ("id", "ts", "parent", *COUNTER_FIELDS)}
+        self._columns["topic"] = array("i")
+        # (id, expanded_text, expanded_at) for the few posts that have one stored.
+        self.expanded: List[Tuple[int, str, Optional[str]]] = []
+        cols = [self._columns[name] for name in ("id", "ts", *COUNTER_FIELDS, "parent")]
+        topic_col = self._columns["topic"]
+        rows = self.conn.execute(
+            "SELECT id, ts, upvotes, downvotes, learned_count, surprised_count, power_count, parent_id, "
+            "topic, expanded_text, expanded_at FROM posts ORDER BY id"
+        )
+        for row in rows:
+            pid, ts, *counters, parent, topic, expanded_text, expanded_at = row
+            for col, value in zip(cols, (pid, ts_key(ts), *counters, parent or 0)):
+                col.append(value)
+            t = index.get(topic)
+            if t is None:
+                t = index[topic] = len(self.topics)
+                self.topics.append(topic)
+            topic_col.append(t)
+            if expanded_text is not None:
+                self.expanded.append((pid, expanded_text, expanded_at))
+        self._columns["depth"] = array("q", bytes(8 * len(topic_col)))  # derived by the lineage index
+        ids = self._columns["id"]
+        self.next_id = ids[-1] + 1 if ids else 1
+
+    def column(self, name: str) -> array:
+        return self._columns[name]
+
+    def users(self) -> Iterator[Tuple[str, Dict[int, int]]]:
+        return iter(())  # SqliteBackend.load replays the interaction tables itself
+
+    def imported(self) -> List[int]:
+        with self._lock:
+            return [pid for (pid,) in self.conn.execute("SELECT post_id FROM imported")]
+
+    def record(self, index: int) -> Dict[str, Any]:
+        ids = self._columns["id"]
+        pid = ids[index]
+        with self._lock:
+            row = self._ahead.pop(pid, None)
+            if row is None:
+                if index == self._last + 1:
+                    last = ids[min(index + self.READAHEAD, len(ids)) - 1]
+                    rows = self.conn.execute("SELECT id, ts, text, extra FROM posts WHERE id BETWEEN ? AND ?", (pid, last))
+                    self._ahead = {r[0]: r[1:] for r in rows}
+                    row = self._ahead.pop(pid)
+                else:
+                    row = self.conn.execute("SELECT ts, text, extra FROM posts WHERE id = ?", (pid,)).fetchone()
+            self._last = index
+        ts, text, extra = row
+        raw: Dict[str, Any] = json.loads(extra) if extra else {}
+        raw["timestamp"], raw["text"] = ts, text
+        raw.setdefault("source", {"kind": "dummy", "model": None})
+        return raw
+
+    def record_bytes(self, index: int) -> bytes:
+        return json.dumps(self.record(index), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class SqliteBackend(StorageBackend):
+    """
+    Posts and interactions in SQLite, for durability only: feeds, post
+    lookups, ranking and search are answered from the Store's in-memory
+    indexes, which still hold every post (without its text) and every user's
+    flags. The corpus must fit that footprint.
+
+    The connection is shared across threads but only ever used while the store
+    lock is held. Writes accumulate in an open transaction and become durable
+    at checkpoint() (every mutation in sync mode, once per flush in write_behind).
+
+    In sync mode each interaction also updates its post's counter row. In
+    write_behind mode counters are written at checkpoint instead, from a
+    (vectorised) diff of the Store's counter columns against the previous
+    checkpoint, so a hot post costs one UPDATE per flush, not one per vote.
+    On first start the database is populated from the seed file plus any
+    existing state.json / journal, so switching backends keeps your data.
+
+    load() reads only the columns the feed, ranking and lineage indexes need
+    and goes through Store.load_snapshot, so post text and metadata stay in
+    the database until a post is first read (see _SqlitePosts).
+    """
+
+    name = "sqlite"
+
+    def __init__(self, db_path: Path, migrate_from: Optional[JsonBackend] = None) -> None:
+        self.db_path = db_path
+        self.migrate_from = migrate_from
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+        self._last_counters: List[Any] = []
+        self.posts: Optional[_SqlitePosts] = None
+
+    @staticmethod
+    def _post_row(p: Any) -> Tuple[Any, ...]:
+        extra = {k: getattr(p, k) for k in ("tags", "author", "lineage", "source") if getattr(p, k) is not None}
+        return (
+            p.id, p.topic, p.timestamp, p.text,
+            p.upvotes, p.downvotes, p.learned_count, p.surprised_count, p.power_count,
+            p.expanded_text, p.expanded_at, p.parent_id,
+            json.dumps(extra, ensure_ascii=False, separators=(",", ":")) if extra else None,
+        )
+
+    def _upsert_post(self, p: Any) -> None:
+        self.conn.execute(f"INSERT OR REPLACE INTO posts ({_POST_COLUMNS}) VALUES ({', '.join('?' * 13)})", self._post_row(p))
+
+    def load(self, store: Any) -> int:
+        (n,) = self.conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM posts LIMIT 1)").fetchone()
+        if n == 0:
+            self._import_initial(store)
+            return 0
+
+        self.posts = _SqlitePosts(self.db_path)
+        store.load_snapshot(self.posts)
+        for pid, expanded_text, expanded_at in self.posts.expanded:
+            p = store.posts[pid]
+            p.expanded_text, p.expanded_at = expanded_text, expanded_at
+        self.posts.expanded = []
+
+        for uid, pid, value in self.conn.execute("SELECT user_id, post_id, value FROM votes"):
+            store.ensure_user(uid).set_vote(int(pid), int(value))
+        for uid, pid, learned, surprised in self.conn.execute("SELECT user_id, post_id, learned, surprised FROM reactions"):
+            st = store.ensure_user(uid)
+            st.set_reaction(int(pid), "learned", bool(learned))
+            st.set_reaction(int(pid), "surprised", bool(surprised))
+        for uid, pid, enabled in self.conn.execute("SELECT user_id, post_id, enabled FROM power"):
+            store.ensure_user(uid).set_power(int(pid), bool(enabled))
+        self._last_counters = store.counters.snapshot()
+        return 0
+
+    def _import_initial(self, store: Any) -> None:
+        if self.migrate_from is not None:
+            self.migrate_from.load(store)
+        else:
+            store.load_seed()
+
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO posts ({_POST_COLUMNS}) VALUES ({', '.join('?' * 13)})",
+            (self._post_row(p) for p in store.posts.values()),
+        )
+        self.conn.executemany("INSERT OR REPLACE INTO imported VALUES (?)", ((pid,) for pid in store._imported))
+        for uid, user in store.user_state.items():
+            st = user.to_json()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO votes VALUES (?, ?, ?)",
+                ((uid, int(pid), int(v)) for pid, v in st.get("votes", {}).items()),
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO reactions VALUES (?, ?, ?, ?)",
+                (
+                    (uid, int(pid), int(bool(r.get("learned"))), int(bool(r.get("surprised"))))
+                    for pid, r in st.get("reactions", {}).items()
+                ),
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO power VALUES (?, ?, ?)",
+                ((uid, int(pid), int(bool(v))) for pid, v in st.get("power", {}).items()),
+            )
+        self.conn.commit()
+        self._last_counters = store.counters.snapshot()
+
+    def record(self, store: Any, rec: Dict[str, Any]) -> None:
+        op = rec.get("op")
+        if op == "import":
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO posts ({_POST_COLUMNS}) VALUES ({', '.join('?' * 13)})",
+                (self._post_row(store.posts[pid]) for pid in rec["ids"]),
+            )
+            self.conn.executemany("INSERT OR REPLACE INTO imported VALUES (?)", ((pid,) for pid in rec["ids"] if pid in store._imported))
+            return
+        p = store.posts.get(rec.get("p"))
+        if p is None:
+            return
+
+        if op == "vote":
+            self.conn.execute(
+                "INSERT INTO votes VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id, post_id) DO UPDATE SET value = excluded.value",
+                (rec["u"], p.id, int(rec["v"])),
+            )
+        elif op == "react":
+            col = "learned" if rec.get("k") == "learned" else "surprised"
+            self.conn.execute(
+                f"INSERT INTO reactions (user_id, post_id, {col}) VALUES (?, ?, ?) "
+                f"ON CONFLICT (user_id, post_id) DO UPDATE SET {col} = excluded.{col}",
+                (rec["u"], p.id, int(bool(rec["v"]))),
+            )
+        elif op == "power":
+            self.conn.execute(
+                "INSERT INTO power VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id, post_id) DO UPDATE SET enabled = excluded.enabled",
+                (rec["u"], p.id, int(bool(rec["v"]))),
+            )
+
+        if op in ("vote", "react", "power"):
+            if store.persist_mode != "sync":
+                return  # counters go out with the next checkpoint's diff
+            self.conn.execute(
+                _COUNTER_UPDATE,
+                (p.upvotes, p.downvotes, p.learned_count, p.surprised_count, p.power_count, p.id),
+            )
+        else:
+            # expand / spawn touch text and metadata; rewrite the row (and the parent's lineage flag).
+            self._upsert_post(p)
+            parent = store.posts.get(rec.get("parent"))
+            if parent is not None:
+                self._upsert_post(parent)
+
+    def checkpoint(self, store: Any) -> Optional[Callable[[], None]]:
+        if store.persist_mode != "sync":
+            cols = store.counters
+            changed = cols.changed_slots(self._last_counters)
+            if changed:
+                self.conn.executemany(
+                    _COUNTER_UPDATE,
+                    ((*cols.row(slot), cols.post_ids[slot]) for slot in changed),
+                )
+                self._last_counters = cols.snapshot()
+        self.conn.commit()
+        return None
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+        if self.posts is not None:
+            self.posts.close()
+
+
+# -------------------------
+# Binary snapshot
+# -------------------------
+
+class BinaryBackend(StorageBackend):
+    """
+    Whole-store binary snapshot, rewritten at every checkpoint like state.json.
+
+    load() maps the file and hands it to Store.load_snapshot, which copies the
+    counter and index columns and leaves each post's text and metadata in the
+    file until first read. A checkpoint copies those untouched records byte for
+    byte. On first start the snapshot is written from the seed file plus any
+    existing state.json / journal (`migrate_from`).
+    """
+
+    name = "binary"
+
+    def __init__(self, snapshot_path: Path, migrate_from: Optional[Any] = None) -> None:
+        self.snapshot_path = snapshot_path
+        self.migrate_from = migrate_from
+        self._write_lock = threading.Lock()
+        self._snapshot_seq = 0
+        self._written_seq = 0
+
+    def load(self, store: Any) -> int:
+        if not self.snapshot_path.exists():
+            if self.migrate_from is not None:
+                self.migrate_from.load(store)
+            else:
+                store.load_seed()
+            self.checkpoint(store)()
+            return 0
+        store.load_snapshot(Snapshot(self.snapshot_path))
+        return 0
+
+    def checkpoint(self, store: Any) -> Optional[Callable[[], None]]:
+        # Everything is copied here, under the store lock; encoding and I/O happen in write().
+        cols = store.counters
+        ids = array("q", cols.post_ids)
+        posts = [store.posts[pid] for pid in ids]
+        topics = sorted({p.topic for p in posts})
+        index = {t: i for i, t in enumerate(topics)}
+        columns = dict(zip(COUNTER_FIELDS, cols.snapshot()))
+        columns.update({
+            "id": ids,
+            "ts": array("q", store.ranker.ts),
+            "depth": array("q", store.ranker.depth),
+            "parent": array("q", (p.parent_id or 0 for p in posts)),
+            "topic": array("i", (index[p.topic] for p in posts)),
+        })
+        records = [p.record_bytes() for p in posts]
+        users = [(uid, dict(st.items())) for uid, st in list(store.user_state.items())]
+        imported = list(store._imported)
+        # A store being migrated has not derived next_id from its posts yet.
+        next_id = max(store.next_id, max(ids, default=0) + 1)
+        meta = {"next_id": next_id, "saved_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat()}
+        self._snapshot_seq += 1
+        seq = self._snapshot_seq
+
+        def write() -> None:
+            with self._write_lock:
+                if seq > self._written_seq:
+                    self.bytes_written += write_snapshot(self.snapshot_path, columns, topics, records, users, meta, imported)
+                    self._written_seq = seq
+
+        return write
@@ -0,0 +1,66 @@
+"""
+Shared fixtures. Every Store is built on files under pytest's tmp_path, so
+the tests never touch state next to main.py. Posts come from the real
+posts_seed.json.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+os.environ["FATHOM_METRICS"] = "0"
+os.environ.pop("FATHOM_STATE_SERVER", None)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+from storage import JsonBackend, StorageBackend  # noqa: E402
+
+
+@pytest.fixture
+def make_store(tmp_path: Path) -> Callable[..., Any]:
+    """make_store(backend, persist_mode) -> a loaded Store, closed after the test."""
+    stores: List[Any] = []
+
+    def make(backend: StorageBackend, persist_mode: str = "sync") -> Any:
+        store = main.Store(backend=backend, persist_mode=persist_mode, expansions_path=tmp_path / "expansions.jsonl")
+        store.load()
+        assert store.wait_search_index(30)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+@pytest.fixture
+def json_backend(tmp_path: Path) -> Callable[..., JsonBackend]:
+    """json_backend(journal=False) -> a JsonBackend on tmp_path/state.json."""
+
+    def make(journal: bool = False) -> JsonBackend:
+        return JsonBackend(tmp_path / "state.json", tmp_path / "state.journal", journal=journal)
+
+    return make
+
+
+def crash(store: Any) -> None:
+    """Stop `store` the way a killed process would: no final checkpoint."""
+    store._closed = True
+    store._flush_wake.set()
+    if store._flusher is not None:
+        store._flusher.join()
+    store.expander.close()
+    store.backend.close()
+    store.expansions.close()
+
+
+def state_of(store: Any) -> Dict[str, Any]:
+    """Everything a checkpoint would persist, minus timestamps."""
+    state = store.snapshot_state()
+    state.pop("meta")
+    return state
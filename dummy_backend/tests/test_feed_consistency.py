@@ -0,0 +1,116 @@
+"""Feed cursors and ETags while other threads keep adding posts and voting."""
+
+from __future__ import annotations
+
+import itertools
+import json
+import random
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+from feed import cursor_key, decode_cursor
+
+
+def old_timestamp(rng: random.Random) -> str:
+    # Inside the seed's time range, so new posts land between existing ones.
+    return f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z"
+
+
+class Writer(threading.Thread):
+    """Imports posts with past timestamps and votes on random posts until stopped."""
+
+    def __init__(self, store, seed: int) -> None:
+        super().__init__(daemon=True)
+        self.store = store
+        self.rng = random.Random(seed)
+        self.stop = threading.Event()
+        self.error: Optional[BaseException] = None
+        self.rounds = 0
+
+    def run(self) -> None:
+        rng = self.rng
+        try:
+            while not self.stop.wait(0.001):  # throttled, so the walks finish
+                topic = rng.choice(self.store.recency.topics())
+                rows = [(i, {"topic": topic, "text": f"late post {i}", "timestamp": old_timestamp(rng)}) for i in range(3)]
+                self.store.import_posts(rows)
+                self.store.set_vote(f"w{rng.randrange(20)}", rng.choice(list(self.store.posts)), rng.choice((-1, 0, 1)))
+                self.rounds += 1
+        except BaseException as exc:  # surfaced by the test
+            self.error = exc
+
+    def __enter__(self) -> "Writer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop.set()
+        self.join()
+        assert self.error is None, self.error
+
+
+def walk(store, topic: Optional[str], limit: int) -> List[int]:
+    """Every id a client sees by following next_cursor from the first page."""
+    seen: List[int] = []
+    after = None
+    for _ in range(len(store.posts) + 1000):  # a cursor that never advances fails instead of hanging
+        page = json.loads(store.feed_page("reader", topic, limit, after=after, paged=True))
+        seen += [p["id"] for p in page["posts"]]
+        if page["next_cursor"] is None:
+            return seen
+        after = cursor_key(decode_cursor(page["next_cursor"]))
+    raise AssertionError("next_cursor never ran out")
+
+
+@pytest.mark.parametrize("topic", [None, "space"])
+def test_cursor_walk_never_repeats_or_skips(make_store, json_backend, topic):
+    store = make_store(json_backend(), "write_behind")
+    present = [p.id for p in store.list_posts(topic, len(store.posts))]
+    keys = {pid: store.recency_key(store.posts[pid]) for pid in present}
+
+    with Writer(store, seed=1) as writer:
+        for limit in (1, 7, 25):
+            start = writer.rounds
+            while writer.rounds < start + 10:  # walk again until the writer has really interleaved
+                seen = walk(store, topic, limit)
+                assert len(seen) == len(set(seen)), "a post was served twice"
+                assert set(present) <= set(seen), "a post that existed before the walk was skipped"
+                # Posts from before the walk keep their relative (newest-first) order.
+                ordered = [pid for pid in seen if pid in keys]
+                assert ordered == sorted(ordered, key=keys.__getitem__, reverse=True)
+
+
+def test_etag_always_names_one_body(make_store, json_backend):
+    store = make_store(json_backend(), "write_behind")
+    pages = [(None, 10, 0), (None, 10, 30), ("space", 5, 0), ("space", 5, 10)]
+    bodies: Dict[Tuple, Dict[str, bytes]] = {page: {} for page in pages}
+
+    with Writer(store, seed=2) as writer:
+        for i in itertools.count():
+            if i >= 300 and writer.rounds >= 50:
+                break
+            for page in pages:
+                topic, limit, offset = page
+                etag, body = store.conditional_feed_page(None, "reader", topic, limit, offset)
+                previous = bodies[page].setdefault(etag, body)
+                assert previous == body, f"ETag {etag} was reused for a different body of {page}"
+                # Revalidating with the tag just issued only answers 304 if nothing moved.
+                again, fresh = store.conditional_feed_page(etag, "reader", topic, limit, offset)
+                if fresh is not None:
+                    assert again != etag
+    assert sum(len(tags) for tags in bodies.values()) > len(pages), "the writer never changed a page"
+
+
+def test_votes_off_the_page_keep_the_etag(make_store, json_backend):
+    store = make_store(json_backend())
+    etag, body = store.conditional_feed_page(None, "reader", None, 5, 0)
+    listed = {p["id"] for p in json.loads(body)}
+    elsewhere = next(pid for pid in store.posts if pid not in listed)
+
+    store.set_vote("someone-else", elsewhere, 1)
+    assert store.conditional_feed_page(etag, "reader", None, 5, 0)[1] is None
+
+    store.set_vote("someone-else", min(listed), 1)
+    assert store.conditional_feed_page(etag, "reader", None, 5, 0)[1] is not None
@@ -0,0 +1,103 @@
+"""Journal replay and compaction (FATHOM_PERSIST_MODE=journal)."""
+
+from __future__ import annotations
+
+import shutil
+
+from conftest import crash, state_of
+
+
+def mutate(store, tag: str) -> None:
+    """A bit of every journaled op: votes, reactions, power (with a spawn) and an import."""
+    store.power_threshold = 2
+    store.set_vote(f"{tag}-a", 1, 1)
+    store.set_vote(f"{tag}-b", 1, -1)
+    store.set_vote(f"{tag}-a", 2, 1)
+    store.toggle_react(f"{tag}-a", 3, learned=True, surprised=None)
+    store.toggle_react(f"{tag}-b", 3, learned=None, surprised=True)
+    store.set_power(f"{tag}-a", 4, True)
+    store.set_power(f"{tag}-b", 4, True)  # reaches the threshold: spawns a child of 4
+    store.import_posts([(1, {"topic": "imported", "text": f"imported by {tag}"})])
+
+
+def test_replay_after_crash(make_store, json_backend):
+    store = make_store(json_backend(journal=True), "journal")
+    mutate(store, "x")
+    before = state_of(store)
+    assert before["spawned_posts"] and before["imported_posts"]
+    crash(store)
+
+    assert not json_backend().state_path.exists()  # nothing but the journal on disk
+    assert state_of(make_store(json_backend(journal=True), "journal")) == before
+
+
+def test_compaction_then_more_records(make_store, json_backend):
+    store = make_store(json_backend(journal=True), "journal")
+    mutate(store, "x")
+    store.save()  # compaction: snapshot written, journal folded in
+    backend = store.backend
+    rotated, live = backend._journal_paths()
+    assert backend.state_path.exists() and not rotated.exists() and not live.exists()
+
+    mutate(store, "y")
+    before = state_of(store)
+    crash(store)
+
+    assert state_of(make_store(json_backend(journal=True), "journal")) == before
+
+
+def test_crash_between_rotation_and_snapshot(make_store, json_backend):
+    # checkpoint() rotates the journal under the lock; the snapshot is written later.
+    store = make_store(json_backend(journal=True), "journal")
+    mutate(store, "x")
+    store.save()
+    mutate(store, "y")
+    before = state_of(store)
+    store.backend.checkpoint(store)  # rotated, but write() never runs
+    crash(store)
+
+    rotated, _ = store.backend._journal_paths()
+    assert rotated.exists()
+    assert state_of(make_store(json_backend(journal=True), "journal")) == before
+
+
+def test_records_already_in_snapshot_are_skipped(make_store, json_backend, tmp_path):
+    # Crash after the snapshot was written but before the rotated journal was deleted.
+    store = make_store(json_backend(journal=True), "journal")
+    mutate(store, "x")
+    live = store.backend.journal_path
+    kept = tmp_path / "journal.copy"
+    store.backend._fh.flush()
+    shutil.copyfile(live, kept)
+    store.save()
+    before = state_of(store)
+    crash(store)
+
+    rotated, _ = store.backend._journal_paths()
+    shutil.copyfile(kept, rotated)
+    reloaded = make_store(json_backend(journal=True), "journal")
+    assert reloaded._dirty == 0  # every record was at or below meta.journal_seq
+    assert state_of(reloaded) == before
+
+
+def test_torn_final_line_is_ignored(make_store, json_backend):
+    store = make_store(json_backend(journal=True), "journal")
+    mutate(store, "x")
+    before = state_of(store)
+    crash(store)
+    with store.backend.journal_path.open("a", encoding="utf-8") as fh:
+        fh.write('{"s": 999999, "op": "vote", "u": "torn", "p": 1, "v"')
+
+    assert state_of(make_store(json_backend(journal=True), "journal")) == before
+
+
+def test_leftover_journal_is_folded_in_other_modes(make_store, json_backend):
+    store = make_store(json_backend(journal=True), "journal")
+    mutate(store, "x")
+    before = state_of(store)
+    crash(store)
+
+    store = make_store(json_backend(), "sync")
+    assert state_of(store) == before
+    rotated, live = store.backend._journal_paths()
+    assert not rotated.exists() and not live.exists()
@@ -0,0 +1,128 @@
+"""
+Compact per-user interaction state.
+
+One small int per (user, post) instead of three nested dicts keyed by
+stringified post ids. The bit layout keeps "explicitly set" markers so the
+conversion to and from the historical JSON shape is loss-free:
+
+    {"votes":     {"<pid>": -1 | 0 | 1},
+     "reactions": {"<pid>": {"learned": bool, "surprised": bool}},
+     "power":     {"<pid>": bool}}
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, Tuple
+
+VOTE_UP = 0x01
+VOTE_DOWN = 0x02
+VOTE_SET = 0x04  # a vote entry exists (possibly 0 after an un-vote)
+LEARNED = 0x08
+SURPRISED = 0x10
+REACT_SET = 0x20  # a reactions entry exists
+POWER = 0x40
+POWER_SET = 0x80  # a power entry exists
+
+_VOTE_BITS = VOTE_UP | VOTE_DOWN
+
+
+def _pid_key(pid: Any) -> int:
+    return int(pid)
+
+
+class UserState:
+    """Per-user votes / reactions / power flags packed into {post_id: bitfield}."""
+
+    __slots__ = ("flags",)
+
+    def __init__(self) -> None:
+        self.flags: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        """Number of posts this user has interacted with."""
+        return len(self.flags)
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        return iter(self.flags.items())
+
+    # -- reads --------------------------------------------------------------
+
+    def vote(self, pid: int) -> int:
+        f = self.flags.get(pid, 0)
+        if f & VOTE_UP:
+            return 1
+        if f & VOTE_DOWN:
+            return -1
+        return 0
+
+    def learned(self, pid: int) -> bool:
+        return bool(self.flags.get(pid, 0) & LEARNED)
+
+    def surprised(self, pid: int) -> bool:
+        return bool(self.flags.get(pid, 0) & SURPRISED)
+
+    def powered(self, pid: int) -> bool:
+        return bool(self.flags.get(pid, 0) & POWER)
+
+    # -- writes -------------------------------------------------------------
+
+    def set_vote(self, pid: int, value: int) -> None:
+        f = self.flags.get(pid, 0) & ~_VOTE_BITS
+        if value > 0:
+            f |= VOTE_UP
+        elif value < 0:
+            f |= VOTE_DOWN
+        self.flags[pid] = f | VOTE_SET
+
+    def set_reaction(self, pid: int, kind: str, value: bool) -> None:
+        bit = LEARNED if kind == "learned" else SURPRISED
+        f = self.flags.get(pid, 0)
+        f = (f | bit) if value else (f & ~bit)
+        self.flags[pid] = f | REACT_SET
+
+    def set_power(self, pid: int, value: bool) -> None:
+        f = self.flags.get(pid, 0)
+        f = (f | POWER) if value else (f & ~POWER)
+        self.flags[pid] = f | POWER_SET
+
+    # -- JSON shape -----------------------------------------------------------
+
+    def to_json(self) -> Dict[str, Any]:
+        votes: Dict[str, int] = {}
+        reactions: Dict[str, Dict[str, bool]] = {}
+        power: Dict[str, bool] = {}
+        for pid, f in self.flags.items():
+            key = str(pid)
+            if f & VOTE_SET:
+                votes[key] = 1 if f & VOTE_UP else (-1 if f & VOTE_DOWN else 0)
+            if f & REACT_SET:
+                reactions[key] = {"learned": bool(f & LEARNED), "surprised": bool(f & SURPRISED)}
+            if f & POWER_SET:
+                power[key] = bool(f & POWER)
+        return {"votes": votes, "reactions": reactions, "power": power}
+
+    @classmethod
+    def from_json(cls, data: Any) -> "UserState":
+        st = cls()
+        if not isinstance(data, dict):
+            return st
+        for key, v in (data.get("votes") or {}).items():
+            try:
+                st.set_vote(_pid_key(key), int(v))
+            except Exception:
+                continue
+        for key, r in (data.get("reactions") or {}).items():
+            if not isinstance(r, dict):
+                continue
+            try:
+                pid = _pid_key(key)
+            except Exception:
+                continue
+            st.set_reaction(pid, "learned", bool(r.get("learned", False)))
+            st.set_reaction(pid, "surprised", bool(r.get("surprised", False)))
+        for key, v in (data.get("power") or {}).items():
+            try:
+                st.set_power(_pid_key(key), bool(v))
+            except Exception:
+                continue
+        return st
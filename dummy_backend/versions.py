@@ -0,0 +1,86 @@
+"""
+Version counters for HTTP conditional requests.
+
+Every change the Store makes to a post (counters, expansion, lineage marker)
+or a user's interaction state draws the next number of one store-wide
+sequence and records it as that post's or that user's version. A response
+body is fully determined by the posts it lists, their versions and the
+viewer's version, so an ETag made of them can be compared with If-None-Match
+before any post is serialised.
+
+Numbers are only meaningful within one process lifetime; `epoch` (random per
+VersionClock) goes into every tag so a restart never revalidates a stale body.
+"""
+
+from __future__ import annotations
+
+import os
+import zlib
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+
+class VersionClock:
+    """
+    Monotonic versions per post and per user. Not thread-safe by itself: the
+    Store bumps under its write lock and reads under its read lock.
+    """
+
+    def __init__(self) -> None:
+        self.epoch = os.urandom(4).hex()
+        self.current = 0
+        self._posts: Dict[int, int] = {}
+        self._users: Dict[str, int] = {}
+
+    def post_changed(self, post_id: int) -> int:
+        """A post's public form changed (which also changes every page listing it)."""
+        self.current += 1
+        self._posts[post_id] = self.current
+        return self.current
+
+    def user_changed(self, user_id: str) -> int:
+        """A user's interaction flags changed (their my_* fields)."""
+        self.current += 1
+        self._users[user_id] = self.current
+        return self.current
+
+    def post(self, post_id: int) -> int:
+        return self._posts.get(post_id, 0)
+
+    def page(self, post_ids: Sequence[int]) -> Tuple[int, Tuple[int, ...]]:
+        """
+        (scope, key) for a page listing `post_ids` in this order: the newest
+        version among them, and the (ids, versions) pair for etag()'s `page`.
+        Votes on posts elsewhere in the feed leave both unchanged.
+        """
+        posts = self._posts
+        versions = tuple(posts.get(pid, 0) for pid in post_ids)
+        return max(versions, default=0), tuple(post_ids) + versions
+
+    def user(self, user_id: str) -> int:
+        return self._users.get(user_id, 0)
+
+    def etag(self, scope: int, user_id: str, page: Any = None) -> str:
+        """
+        Strong ETag for a body built from `scope` (a post or page version)
+        as seen by `user_id`. User versions are drawn from the shared
+        sequence, so two users only share one when neither has any state and
+        they would get identical bodies anyway.
+
+        `page` is whatever else selects the body (topic, limit, cursor, ...):
+        its hash goes into the tag, so one page's tag never revalidates another.
+        """
+        tag = f"{self.epoch}.{scope}.{self.user(user_id)}"
+        if page is not None:
+            tag += "." + format(zlib.crc32(repr(page).encode("utf-8")), "08x")
+        return f'"{tag}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match semantics (weak comparison): `*` or any listed tag matches."""
+    if not if_none_match:
+        return False
+    candidates: Iterable[str] = (t.strip() for t in if_none_match.split(","))
+    for tag in candidates:
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False